@@ -0,0 +1,74 @@
+"""
+Mesure du rendu des PDF de la liste du matériel (services/pdf_reports.py) sur des lignes
+synthétiques, sans base de données, selon le nombre de processus du pool de rendu.
+
+    python scripts/benchmark_pdf_reports.py                      # 10k, 50k, 100k lignes ; 1 à N processus
+    python scripts/benchmark_pdf_reports.py --rows 20000 --processes 1,4
+
+Le pool est démarré avant la mesure (il est créé une fois par worker puis réutilisé) ; la
+durée de son démarrage est affichée à part. Résultats reportés dans docs/documentation_technique.md.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from itertools import repeat
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services import pdf_reports  # noqa: E402
+from src.services.pdf_layout import render_rows  # noqa: E402
+
+WORDS = ['Tournevis', 'cruciforme', 'Clé', 'plate', 'Câble', 'USB', 'rallonge', 'multiprise', 'Perceuse',
+         'foret', 'béton', 'Scie', 'cloche', 'Pince', 'coupante']
+ZONES = 10
+
+
+def synthetic_rows(count):
+    """Lignes de la liste du matériel triées par zone, et titre de section de chaque ligne"""
+    random.seed(count)
+    rows = []
+    sections = []
+    for index in range(count):
+        zone = index * ZONES // count
+        name = ' '.join(random.choice(WORDS) for _ in range(random.randint(2, 9)))
+        rows.append((str(index + 1), f'{name} {index}', f'Zone {zone} > Armoire {index % 5} > Tiroir {index % 7}',
+                     'Permanent', '18/10/26'))
+        sections.append(f'Zone {zone}')
+    return rows, sections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', default='10000,50000,100000', help='nombres de lignes, séparés par des virgules')
+    parser.add_argument('--processes', default=','.join(str(n) for n in range(1, (os.cpu_count() or 1) + 1)),
+                        help='tailles du pool, séparées par des virgules (défaut : 1 à nombre de cœurs)')
+    args = parser.parse_args()
+
+    print(f'{os.cpu_count()} cœur(s)')
+    print('| lignes | processus | durée (s) | pages | taille (Mo) |')
+    print('|---|---|---|---|---|')
+    for count in (int(value) for value in args.rows.split(',')):
+        rows, sections = synthetic_rows(count)
+        for processes in (int(value) for value in args.processes.split(',')):
+            pdf_reports.shutdown_render_pool()
+            pdf_reports.PROCESSES = processes
+            pool = pdf_reports.render_pool()
+            if pool is not None:
+                started = time.perf_counter()
+                # Processus démarrés et module de rendu importé
+                list(pool.map(render_rows, repeat(pdf_reports.ITEM_COLUMNS, processes), [rows[:1]] * processes))
+                print(f'  (démarrage du pool de {processes} processus : {time.perf_counter() - started:.2f} s)',
+                      file=sys.stderr)
+            started = time.perf_counter()
+            data = pdf_reports.render_table('Liste de tout le matériel', 'Benchmark', pdf_reports.ITEM_COLUMNS,
+                                            rows, sections=sections)
+            elapsed = time.perf_counter() - started
+            print(f'| {count} | {processes} | {elapsed:.2f} | {data.count(b"/Type /Page") - 1} '
+                  f'| {len(data) / 1e6:.1f} |')
+    pdf_reports.shutdown_render_pool()
+
+
+if __name__ == '__main__':
+    main()
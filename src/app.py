@@ -1,4 +1,4 @@
-from flask import Flask, redirect, url_for, request
+from flask import Flask, redirect, url_for, request, flash, jsonify
 import os
 import sys
 from dotenv import load_dotenv
@@ -8,6 +8,10 @@ from config.database import get_connection_string
 from config.logging_config import setup_logging
 from src.models import db 
 from src.routes import blueprints 
+from src.cli import register_commands
+from src import migrations
+from src.routes.admin_routes import stock_conflict_response
+from sqlalchemy.orm.exc import StaleDataError
 
 # Load environment variables
 load_dotenv()
@@ -35,6 +39,9 @@ if os.getenv('RENDER'):
 # Initialize extensions
 db.init_app(app)
 
+# Commandes CLI (flask --app src.app db upgrade, ...)
+register_commands(app)
+
 # Rendre le mode debug accessible dans les templates
 @app.context_processor
 def inject_debug_mode():
@@ -47,6 +54,30 @@ for blueprint in blueprints:
     else: # Pour tous les autres blueprints, y compris ai_bp (qui a son propre url_prefix)
         app.register_blueprint(blueprint)
 
+# Routes hors /api/ appelées par fetch depuis les pages d'administration : réponses JSON
+JSON_ENDPOINTS = {'admin.delete_item', 'admin.update_item_stock'}
+
+def wants_json_response():
+    """Vrai si la requête vient d'un appel JavaScript plutôt que d'une page (formulaire, lien)"""
+    if request.is_json or '/api/' in request.path or request.endpoint in JSON_ENDPOINTS:
+        return True
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return True
+    return request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+
+# Verrouillage optimiste (Item.version_id) : une ligne modifiée entre sa lecture et son écriture
+# donne un 409 avec l'état courant de l'article (API) ou un message et un retour au formulaire (pages)
+@app.errorhandler(StaleDataError)
+def stale_data_conflict(error):
+    db.session.rollback()
+    if wants_json_response():
+        item_id = (request.view_args or {}).get('item_id')
+        if item_id is not None:
+            return stock_conflict_response(item_id)
+        return jsonify({'success': False, 'error': 'Les données ont été modifiées entre-temps, veuillez réessayer'}), 409
+    flash("L'article a été modifié entre-temps, veuillez réessayer.", "warning")
+    return redirect(request.referrer or url_for('main.dashboard'))
+
 # Ces routes ont été migrées vers main_routes.py et admin_routes.py
 # Pour assurer la compatibilité avec les anciens liens, nous gardons temporairement des redirections
 
@@ -155,18 +186,19 @@ def db_config_redirect():
 
 
 def init_db():
+    """Applique les migrations en attente (équivalent de `flask --app src.app db upgrade`)"""
     with app.app_context():
-        db.create_all()
-        print("INFO: Tables de la base de données créées/vérifiées")
-
-# Initialiser la base de données à chaque démarrage (important pour la production)
-with app.app_context():
-    init_db()
+        applied = migrations.upgrade(db.engine)
+        print(f"INFO: Schéma de la base de données à jour ({len(applied)} migration(s) appliquée(s))")
 
 if __name__ == '__main__':
     # Configure logging
     setup_logging(app)
     
+    # Lancement direct (développement, Docker) : mettre le schéma à jour avant de démarrer.
+    # En production derrière gunicorn, lancer `flask --app src.app db upgrade` au déploiement.
+    init_db()
+    
     # Configuration différente selon l'environnement
     if os.getenv('RENDER'):
         # Sur Render, utiliser le port fourni par la plateforme
@@ -0,0 +1,86 @@
+"""
+Commandes en ligne de commande de l'application (flask --app src.app <commande>)
+"""
+import click
+from flask.cli import AppGroup
+from src.models import db
+from src.models.data_version import DataVersion
+from src.models.item import Item
+from src.models.stock_movement import StockSnapshot
+from src.services.item_import import IMPORT_FORMATS, ItemImportError, import_items
+from src import migrations
+
+# Groupe de commandes pour la base de données
+db_cli = AppGroup('db', help="Gestion du schéma de la base de données")
+
+
+@db_cli.command('upgrade')
+@click.option('--target', type=int, default=None, help="Version maximale à appliquer")
+def db_upgrade(target):
+    """Applique les migrations en attente"""
+    applied = migrations.upgrade(db.engine, target=target)
+    if applied:
+        click.echo(f"Migrations appliquées: {', '.join(str(v) for v in applied)}")
+    else:
+        click.echo("Base de données à jour, aucune migration à appliquer")
+
+
+@db_cli.command('status')
+def db_status():
+    """Affiche les migrations appliquées et en attente"""
+    applied = migrations.applied_versions(db.engine)
+    pending = migrations.pending_migrations(db.engine)
+    click.echo(f"Versions appliquées: {', '.join(str(v) for v in sorted(applied)) or 'aucune'}")
+    for version, description in pending:
+        click.echo(f"  En attente: {version:04d} - {description}")
+
+
+@db_cli.command('reconcile-loans')
+def db_reconcile_loans():
+    """Recalcule les compteurs d'emprunts en cours des articles à partir des emprunts"""
+    result = db.session.execute(
+        Item.loan_counters_update().execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        DataVersion.touch(DataVersion.INVENTORY)
+    db.session.commit()
+    click.echo(f"Compteurs d'emprunts corrigés pour {result.rowcount} article(s)")
+
+
+@db_cli.command('rollup-stock')
+def db_rollup_stock():
+    """Agrège les mouvements de stock des jours complets en instantanés journaliers"""
+    count = StockSnapshot.rollup()
+    db.session.commit()
+    click.echo(f"{count} instantané(s) de stock créé(s) (jusqu'au {StockSnapshot.rolled_until() or '-'})")
+
+
+# Groupe de commandes pour les articles
+items_cli = AppGroup('items', help="Gestion des articles")
+
+
+@items_cli.command('import')
+@click.argument('file', type=click.File('rb'))
+@click.option('--format', 'file_format', type=click.Choice(IMPORT_FORMATS), default=None,
+              help="Format du fichier (déduit de l'extension par défaut)")
+@click.option('--dry-run', is_flag=True, help="Valide le fichier sans rien enregistrer")
+def items_import(file, file_format, dry_run):
+    """Importe des articles depuis un fichier CSV ou NDJSON (- : entrée standard)"""
+    if file_format is None:
+        file_format = 'ndjson' if file.name.endswith(('.ndjson', '.jsonl')) else 'csv'
+    try:
+        report = import_items(file, file_format, dry_run=dry_run)
+    except ItemImportError as e:
+        raise click.ClickException(str(e))
+    for error in report.errors:
+        click.echo(f"Ligne {error.line}: {error.error}", err=True)
+    if report.error_count > len(report.errors):
+        click.echo(f"... {report.error_count - len(report.errors)} autre(s) erreur(s)", err=True)
+    verb = 'valide(s)' if dry_run else 'importé(s)'
+    click.echo(f"{report.imported} article(s) {verb} sur {report.total} ligne(s), {report.error_count} erreur(s)")
+
+
+def register_commands(app):
+    """Enregistre les groupes de commandes sur l'application"""
+    app.cli.add_command(db_cli)
+    app.cli.add_command(items_cli)
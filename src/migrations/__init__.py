@@ -0,0 +1,109 @@
+"""
+Migrations versionnées du schéma de la base de données.
+
+Chaque migration est une fonction `upgrade(conn)` enregistrée avec un numéro de version
+croissant (voir versions.py). Les versions appliquées sont mémorisées dans la table
+`schema_migrations`. Les migrations sont lancées explicitement :
+
+    flask --app src.app db upgrade
+    flask --app src.app db status
+"""
+import logging
+from datetime import datetime
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+# Migrations enregistrées : version -> (description, fonction)
+MIGRATIONS = {}
+
+
+def migration(version, description):
+    """Décorateur enregistrant une fonction upgrade(conn) comme migration"""
+    def decorator(func):
+        if version in MIGRATIONS:
+            raise ValueError(f"Migration {version} déjà enregistrée")
+        MIGRATIONS[version] = (description, func)
+        return func
+    return decorator
+
+
+# --- Utilitaires pour écrire des migrations portables (PostgreSQL / SQLite) ---
+
+def column_exists(conn, table_name, column_name):
+    """Vérifie si une colonne existe déjà (bases créées par db.create_all avant les migrations)"""
+    return column_name in [c['name'] for c in inspect(conn).get_columns(table_name)]
+
+
+def add_column(conn, table_name, column_name, ddl):
+    """Ajoute une colonne si elle n'existe pas encore"""
+    if not column_exists(conn, table_name, column_name):
+        conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl}"))
+
+
+def create_index(conn, name, table_name, columns, where=None, unique=False):
+    """
+    Crée un index (éventuellement partiel) s'il n'existe pas.
+
+    Args:
+        where: condition de l'index partiel, soit une chaîne, soit un dict {dialecte: condition}
+    """
+    if isinstance(where, dict):
+        where = where[conn.dialect.name]
+    statement = f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table_name} ({columns})"
+    if where:
+        statement += f" WHERE {where}"
+    conn.execute(text(statement))
+
+
+# --- Exécution ---
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, "
+        "description VARCHAR(255) NOT NULL, "
+        "applied_at TIMESTAMP NOT NULL)"
+    ))
+
+
+def applied_versions(engine):
+    """Retourne l'ensemble des versions déjà appliquées"""
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def pending_migrations(engine):
+    """Retourne la liste [(version, description)] des migrations restant à appliquer"""
+    from . import versions  # noqa: F401  (enregistre les migrations)
+    done = applied_versions(engine)
+    return [(version, MIGRATIONS[version][0]) for version in sorted(MIGRATIONS) if version not in done]
+
+
+def upgrade(engine, target=None):
+    """
+    Applique les migrations en attente, chacune dans sa propre transaction.
+
+    Args:
+        engine: moteur SQLAlchemy
+        target (int): version maximale à appliquer (toutes par défaut)
+
+    Returns:
+        list: versions appliquées
+    """
+    applied = []
+    for version, description in pending_migrations(engine):
+        if target is not None and version > target:
+            break
+        _, func = MIGRATIONS[version]
+        logger.info(f"Migration {version:04d}: {description}")
+        with engine.begin() as conn:
+            func(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, description, applied_at) "
+                     "VALUES (:version, :description, :applied_at)"),
+                {'version': version, 'description': description, 'applied_at': datetime.utcnow()}
+            )
+        applied.append(version)
+    return applied
@@ -0,0 +1,366 @@
+"""
+Liste des migrations du schéma, dans l'ordre des versions.
+
+Chaque migration est figée : elle n'utilise ni les modèles ni les services de l'application,
+mais du SQL explicite ou des tables déclarées dans la migration elle-même (état du schéma à
+cette version). Rejouer les migrations 1 à N produit donc toujours le schéma N, même après
+l'évolution des modèles. La migration 1 crée le schéma des bases antérieures aux migrations
+(créées par db.create_all) ; les migrations restent idempotentes (add_column, create_index et
+checkfirst vérifient l'existence) pour ces bases.
+"""
+import logging
+import unicodedata
+from datetime import datetime
+from sqlalchemy import (Boolean, Column, Date, DateTime, ForeignKey, Index, Integer, MetaData, String, Table,
+                        Text, UniqueConstraint, text)
+from . import migration, add_column, create_index
+
+logger = logging.getLogger(__name__)
+
+
+@migration(1, "Schéma initial (tables des modèles)")
+def initial_schema(conn):
+    metadata = MetaData()
+    Table(
+        'user', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('name', String(100), nullable=False),
+        Column('email', String(120), unique=True, nullable=True),
+        Column('password_hash', String(255), nullable=True),
+        Column('is_admin', Boolean),
+        Column('is_super_admin', Boolean),
+        Column('created_at', DateTime),
+    )
+    Table(
+        'zone', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('name', String(100), nullable=False, unique=True),
+        Column('description', String(255)),
+        Column('created_at', DateTime),
+    )
+    Table(
+        'furniture', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('name', String(100), nullable=False),
+        Column('description', String(255)),
+        Column('zone_id', Integer, ForeignKey('zone.id'), nullable=False),
+        Column('created_at', DateTime),
+        UniqueConstraint('name', 'zone_id', name='unique_furniture_per_zone'),
+    )
+    Table(
+        'drawer', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('name', String(100), nullable=False),
+        Column('description', String(255)),
+        Column('furniture_id', Integer, ForeignKey('furniture.id'), nullable=False),
+        Column('created_at', DateTime),
+        UniqueConstraint('name', 'furniture_id', name='unique_drawer_per_furniture'),
+    )
+    Table(
+        'item', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('name', String(200), nullable=False),
+        Column('stock', Integer, nullable=False),
+        Column('is_temporary', Boolean, nullable=False),
+        Column('zone_id', Integer, ForeignKey('zone.id'), nullable=True),
+        Column('furniture_id', Integer, ForeignKey('furniture.id'), nullable=True),
+        Column('drawer_id', Integer, ForeignKey('drawer.id'), nullable=True),
+        Column('zone', String(100), nullable=True),
+        Column('mobilier', String(100), nullable=True),
+        Column('niveau_tiroir', String(100), nullable=True),
+        Column('created_at', DateTime),
+    )
+    Table(
+        'borrow', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+        Column('item_id', Integer, ForeignKey('item.id'), nullable=False),
+        Column('quantity', Integer, nullable=False),
+        Column('borrow_date', DateTime, nullable=False),
+        Column('expected_return_date', DateTime, nullable=False),
+        Column('return_date', DateTime),
+        Column('returned', Boolean),
+    )
+    Table(
+        'notification', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('message', String(300), nullable=False),
+        Column('type', String(50), nullable=False),
+        Column('item_id', Integer, ForeignKey('item.id'), nullable=True),
+        Column('created_at', DateTime),
+        Column('is_active', Boolean),
+        Column('auto_dismiss', Boolean),
+    )
+    metadata.create_all(bind=conn)
+
+
+def _normalize_search_text_v2(value):
+    """Nom normalisé de la migration 2 (copie figée de models.item.normalize_search_text)"""
+    if not value:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', value)
+    without_accents = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(without_accents.casefold().split())
+
+
+@migration(2, "Nom normalisé des articles et index de recherche")
+def item_search_index(conn):
+    add_column(conn, 'item', 'search_name', 'VARCHAR(200)')
+    rows = conn.execute(text("SELECT id, name FROM item WHERE search_name IS NULL")).fetchall()
+    if rows:
+        conn.execute(
+            text("UPDATE item SET search_name = :search_name WHERE id = :id"),
+            [{'id': row.id, 'search_name': _normalize_search_text_v2(row.name)} for row in rows]
+        )
+
+    # Index de recherche (services/search_service.py) ; en cas d'échec (extension non autorisée,
+    # FTS5 absent...) la recherche retombe sur LIKE sans interrompre la migration
+    statements = {
+        'postgresql': [
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            "CREATE INDEX IF NOT EXISTS ix_item_search_name_trgm ON item USING gin (search_name gin_trgm_ops)",
+        ],
+        'sqlite': [
+            "CREATE VIRTUAL TABLE IF NOT EXISTS item_search USING fts5("
+            "search_name, content='item', content_rowid='id', tokenize='trigram')",
+            "CREATE TRIGGER IF NOT EXISTS item_search_ai AFTER INSERT ON item BEGIN "
+            "INSERT INTO item_search(rowid, search_name) VALUES (new.id, new.search_name); END",
+            "CREATE TRIGGER IF NOT EXISTS item_search_ad AFTER DELETE ON item BEGIN "
+            "INSERT INTO item_search(item_search, rowid, search_name) VALUES ('delete', old.id, old.search_name); END",
+            "CREATE TRIGGER IF NOT EXISTS item_search_au AFTER UPDATE OF search_name ON item BEGIN "
+            "INSERT INTO item_search(item_search, rowid, search_name) VALUES ('delete', old.id, old.search_name); "
+            "INSERT INTO item_search(rowid, search_name) VALUES (new.id, new.search_name); END",
+            "INSERT INTO item_search(item_search) VALUES ('rebuild')",
+        ],
+    }.get(conn.dialect.name, [])
+    try:
+        with conn.begin_nested():
+            for statement in statements:
+                conn.execute(text(statement))
+    except Exception as e:
+        logger.warning(f"Index de recherche indisponible, recherche par LIKE: {e}")
+
+
+@migration(3, "Index des requêtes fréquentes (emprunts, articles, notifications)")
+def hot_path_indexes(conn):
+    # Emprunts en cours d'un article : "cet article est-il emprunté ?"
+    # (agrégat de item_views, sous-requête de admin.items_list, admin.delete_item,
+    # sous-requête NOT IN du tableau de bord)
+    #   SELECT item_id FROM borrow WHERE return_date IS NULL AND item_id IN (...)
+    create_index(conn, 'ix_borrow_item_active', 'borrow', 'item_id', where='return_date IS NULL')
+
+    # Emprunts en cours d'un utilisateur (main.my_borrows, loans_api.get_loans?active_only=true,
+    # compteurs de admin.user_list)
+    #   SELECT ... FROM borrow WHERE user_id = ? AND return_date IS NULL
+    create_index(conn, 'ix_borrow_user_active', 'borrow', 'user_id, expected_return_date',
+                 where='return_date IS NULL')
+
+    # Historique des emprunts d'un utilisateur trié par date (loans_api.get_loans)
+    #   SELECT ... FROM borrow WHERE user_id = ? ORDER BY borrow_date DESC
+    create_index(conn, 'ix_borrow_user_borrow_date', 'borrow', 'user_id, borrow_date')
+
+    # Clé étrangère item_id : suppression en cascade des emprunts d'un article
+    #   DELETE FROM borrow WHERE item_id = ?
+    create_index(conn, 'ix_borrow_item_id', 'borrow', 'item_id')
+
+    # Pagination par curseur et tri par nom (GET /api/items, admin.items_list)
+    #   SELECT ... FROM item WHERE (name, id) > (?, ?) ORDER BY name, id LIMIT ?
+    create_index(conn, 'ix_item_name_id', 'item', 'name, id')
+
+    # Filtre articles temporaires / conventionnels trié par nom
+    # (GET /api/items?is_temporary=..., admin.items_list?filter=...)
+    #   SELECT ... FROM item WHERE is_temporary = ? ORDER BY name, id
+    create_index(conn, 'ix_item_temporary_name', 'item', 'is_temporary, name, id')
+
+    # Articles en stock faible ou épuisés (admin.out_of_stock)
+    #   SELECT ... FROM item WHERE stock <= 2
+    create_index(conn, 'ix_item_low_stock', 'item', 'stock', where='stock <= 2')
+
+    # Articles créés dans un intervalle (items_api.count_items_today)
+    #   SELECT count(*) FROM item WHERE created_at BETWEEN ? AND ?
+    create_index(conn, 'ix_item_created_at', 'item', 'created_at')
+
+    # Alertes de stock actives d'un article (Notification.create_stock_alert,
+    # create_low_stock_alert, dismiss_stock_alerts)
+    #   SELECT ... FROM notification WHERE item_id = ? AND type = ? AND is_active
+    create_index(conn, 'ix_notification_item_active_type', 'notification', 'item_id, type',
+                 where={'postgresql': 'is_active', 'sqlite': 'is_active = 1'})
+
+
+@migration(4, "Compteurs d'emprunts en cours sur les articles")
+def item_loan_counters(conn):
+    add_column(conn, 'item', 'active_loan_count', 'INTEGER NOT NULL DEFAULT 0')
+    add_column(conn, 'item', 'borrowed_quantity', 'INTEGER NOT NULL DEFAULT 0')
+    conn.execute(text(
+        "UPDATE item SET "
+        "active_loan_count = (SELECT count(borrow.id) FROM borrow "
+        "WHERE borrow.item_id = item.id AND borrow.return_date IS NULL), "
+        "borrowed_quantity = (SELECT coalesce(sum(borrow.quantity), 0) FROM borrow "
+        "WHERE borrow.item_id = item.id AND borrow.return_date IS NULL)"
+    ))
+
+    # Articles disponibles triés par nom (main.dashboard), articles temporaires non empruntés
+    # (admin.delete_unborrowed_temporary_items), tri "emprunté" de admin.items_list
+    #   SELECT ... FROM item WHERE active_loan_count = 0 ORDER BY name
+    create_index(conn, 'ix_item_active_loans_name', 'item', 'active_loan_count, name')
+
+
+@migration(5, "Compteurs de version des données (ETag, caches)")
+def data_versions(conn):
+    data_version = Table(
+        'data_version', MetaData(),
+        Column('name', String(50), primary_key=True),
+        Column('version', Integer, nullable=False),
+    )
+    data_version.create(bind=conn, checkfirst=True)
+    conn.execute(text(
+        "INSERT INTO data_version (name, version) "
+        "SELECT 'locations', 1 WHERE NOT EXISTS (SELECT 1 FROM data_version WHERE name = 'locations')"
+    ))
+
+
+@migration(6, "Chemin d'emplacement stocké sur les articles")
+def item_location_path(conn):
+    add_column(conn, 'item', 'location_path', 'VARCHAR(320)')
+    # Remplit location_path et réaligne les champs texte de compatibilité (zone, mobilier, niveau_tiroir)
+    # (libellés de models/item.py à cette version)
+    zone_name = "(SELECT zone.name FROM zone WHERE zone.id = item.zone_id)"
+    furniture_name = "(SELECT furniture.name FROM furniture WHERE furniture.id = item.furniture_id)"
+    drawer_name = "(SELECT drawer.name FROM drawer WHERE drawer.id = item.drawer_id)"
+    path = " || :separator || ".join(f"coalesce({name}, :unknown)"
+                                     for name in (zone_name, furniture_name, drawer_name))
+    temporary = "CASE WHEN item.is_temporary = :true THEN {} ELSE {} END"
+    conn.execute(text(
+        "UPDATE item SET "
+        f"location_path = {temporary.format(':temporary', path)}, "
+        f"zone = {temporary.format('NULL', zone_name)}, "
+        f"mobilier = {temporary.format('NULL', furniture_name)}, "
+        f"niveau_tiroir = {temporary.format('NULL', drawer_name)}"
+    ), {'true': True, 'separator': ' > ', 'unknown': 'Non spécifié',
+        'temporary': 'Article temporaire (sans emplacement)'})
+
+
+@migration(7, "Index des emprunts par échéance")
+def borrow_due_date_index(conn):
+    # Emprunts en cours / en retard triés par échéance (loans_api.get_loans?overdue_only,
+    # due_before, sort=due_date, tous utilisateurs confondus)
+    #   SELECT ... FROM borrow WHERE return_date IS NULL AND expected_return_date < ?
+    #   ORDER BY expected_return_date
+    create_index(conn, 'ix_borrow_return_expected', 'borrow', 'return_date, expected_return_date')
+
+
+@migration(8, "Unicité des alertes actives par article et par type")
+def unique_active_alerts(conn):
+    # Désactiver les doublons existants (on garde l'alerte la plus ancienne)
+    conn.execute(text(
+        "UPDATE notification SET is_active = :false "
+        "WHERE is_active = :true AND item_id IS NOT NULL AND id NOT IN ("
+        "SELECT min(id) FROM notification WHERE is_active = :true AND item_id IS NOT NULL "
+        "GROUP BY item_id, type)"
+    ), {'true': True, 'false': False})
+
+    # L'index unique partiel remplace l'index simple de la migration 3
+    # (Notification.create_stock_alerts : INSERT ... ON CONFLICT DO NOTHING / INSERT OR IGNORE)
+    conn.execute(text("DROP INDEX IF EXISTS ix_notification_item_active_type"))
+    create_index(conn, 'ux_notification_active_item_type', 'notification', 'item_id, type', unique=True,
+                 where={'postgresql': 'is_active', 'sqlite': 'is_active = 1'})
+
+
+@migration(9, "Journal des changements diffusés en direct (/api/events)")
+def change_events(conn):
+    # Lecture incrémentale par identifiant (EventHub.events_since) et purge par date
+    #   SELECT ... FROM change_event WHERE id > ? ORDER BY id
+    #   DELETE FROM change_event WHERE created_at < ?
+    change_event = Table(
+        'change_event', MetaData(),
+        Column('id', Integer, primary_key=True),
+        Column('topic', String(30), nullable=False),
+        Column('payload', Text, nullable=False),
+        Column('created_at', DateTime, nullable=False, index=True),
+    )
+    change_event.create(bind=conn, checkfirst=True)
+
+
+@migration(10, "Journal des mouvements de stock et instantanés journaliers")
+def stock_movements(conn):
+    metadata = MetaData()
+    Table(
+        'stock_movement', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('item_id', Integer, nullable=False),
+        Column('zone_id', Integer, nullable=True),
+        Column('delta', Integer, nullable=False),
+        Column('stock_after', Integer, nullable=True),
+        Column('reason', String(20), nullable=False),
+        Column('user_id', Integer, nullable=True),
+        Column('borrow_id', Integer, nullable=True),
+        Column('created_at', DateTime, nullable=False),
+        # Stock d'un article à une date (mouvements postérieurs au dernier instantané)
+        Index('ix_stock_movement_item_created', 'item_id', 'created_at'),
+        # Agrégation journalière (StockSnapshot.rollup) et consommation récente par zone
+        Index('ix_stock_movement_created_at', 'created_at'),
+    )
+    Table(
+        'stock_snapshot', metadata,
+        Column('item_id', Integer, primary_key=True),
+        Column('day', Date, primary_key=True),
+        Column('zone_id', Integer, nullable=True),
+        Column('stock', Integer, nullable=False),
+        Column('loaned', Integer, nullable=False),
+        Column('returned', Integer, nullable=False),
+        Column('adjusted', Integer, nullable=False),
+        # Consommation par zone sur une période
+        Index('ix_stock_snapshot_day_zone', 'day', 'zone_id'),
+    )
+    metadata.create_all(bind=conn)
+
+    # Stock existant : un mouvement initial par article, pour que la somme des deltas égale le stock
+    conn.execute(text(
+        "INSERT INTO stock_movement (item_id, zone_id, delta, stock_after, reason, created_at) "
+        "SELECT item.id, item.zone_id, item.stock, item.stock, 'initial', :created_at FROM item "
+        "WHERE item.stock != 0 AND NOT EXISTS (SELECT 1 FROM stock_movement WHERE stock_movement.item_id = item.id)"
+    ), {'created_at': datetime.utcnow()})
+
+
+@migration(11, "Version des articles (verrouillage optimiste)")
+def item_version(conn):
+    add_column(conn, 'item', 'version_id', 'INTEGER NOT NULL DEFAULT 1')
+
+
+@migration(12, "Compteur de version de l'inventaire (cache des rapports)")
+def inventory_data_version(conn):
+    conn.execute(text(
+        "INSERT INTO data_version (name, version) "
+        "SELECT 'inventory', 1 WHERE NOT EXISTS (SELECT 1 FROM data_version WHERE name = 'inventory')"
+    ))
+
+
+@migration(13, "Tâches de génération de rapports en arrière-plan")
+def report_jobs(conn):
+    # Purge des tâches expirées (ReportJobRunner.purge_expired)
+    #   SELECT id FROM report_job WHERE expires_at < ?
+    report_job = Table(
+        'report_job', MetaData(),
+        Column('id', String(32), primary_key=True),
+        Column('kind', String(30), nullable=False),
+        Column('params', Text, nullable=False),
+        Column('user_id', Integer, nullable=False),
+        Column('status', String(20), nullable=False),
+        Column('progress', Integer, nullable=False),
+        Column('error', Text, nullable=True),
+        Column('file_name', String(200), nullable=True),
+        Column('file_size', Integer, nullable=True),
+        Column('created_at', DateTime, nullable=False),
+        Column('updated_at', DateTime, nullable=False),
+        Column('finished_at', DateTime, nullable=True),
+        Column('expires_at', DateTime, nullable=True, index=True),
+    )
+    report_job.create(bind=conn, checkfirst=True)
+
+
+@migration(14, "Compteur de version des noms d'articles (index d'autocomplétion)")
+def item_names_data_version(conn):
+    conn.execute(text(
+        "INSERT INTO data_version (name, version) "
+        "SELECT 'item_names', 1 WHERE NOT EXISTS (SELECT 1 FROM data_version WHERE name = 'item_names')"
+    ))
@@ -8,3 +8,7 @@ from .borrow import Borrow
 from .location import Zone, Furniture, Drawer
 from .user import User
 from .notification import Notification  # NOUVEAU
+from .data_version import DataVersion
+from .change_event import ChangeEvent
+from .stock_movement import StockMovement, StockSnapshot
+from .report_job import ReportJob
@@ -1,5 +1,6 @@
 from . import db
 from datetime import datetime
+from .stock_movement import StockMovement
 
 class Borrow(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -22,10 +23,16 @@ class Borrow(db.Model):
             self.return_date = datetime.utcnow()
             # Remettre la quantité en stock
             if self.item:
-                self.item.increase_stock(self.quantity)
+                self.item.increase_stock(self.quantity, StockMovement.RETURN, user_id=self.user_id, borrow=self)
+                self.item.release_loan(self.quantity)
             return True
         return False
     
+    @staticmethod
+    def overdue_clause(now=None):
+        """Condition SQL équivalente à is_overdue (emprunt en cours dont la date de retour est dépassée)"""
+        return (Borrow.return_date == None) & (Borrow.expected_return_date < (now or datetime.utcnow()))
+    
     @property
     def is_overdue(self):
         """Vérifier si l'emprunt est en retard"""
@@ -0,0 +1,18 @@
+from . import db
+from datetime import datetime
+
+
+class ChangeEvent(db.Model):
+    """
+    Journal des changements diffusés en direct aux clients (/api/events).
+    Les lignes sont écrites dans la transaction du changement et lues par le hub
+    d'événements de chaque worker ; elles sont purgées après EVENTS_RETENTION secondes.
+    """
+    __tablename__ = 'change_event'
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(30), nullable=False)  # stock, loan, alert, location
+    payload = db.Column(db.Text, nullable=False)  # JSON compact
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<ChangeEvent {self.id} {self.topic}>'
@@ -0,0 +1,147 @@
+import threading
+from collections import Counter
+from . import db
+from .item import Item
+from .location import Zone, Furniture, Drawer
+from sqlalchemy import event, inspect, update
+from sqlalchemy.orm import Session
+
+
+class DataVersion(db.Model):
+    """
+    Compteurs de version des données, incrémentés dans la transaction de chaque écriture.
+    Permettent aux caches (ETag, caches en mémoire par worker) de vérifier en une lecture
+    par clé primaire si les données ont changé.
+    """
+    __tablename__ = 'data_version'
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+
+    # Noms des compteurs
+    LOCATIONS = 'locations'
+    INVENTORY = 'inventory'  # articles et emplacements (exports, cache des rapports)
+    # Noms et emplacements des articles seulement (index d'autocomplétion) : pas incrémenté par
+    # les emprunts, retours et corrections de stock
+    ITEM_NAMES = 'item_names'
+    
+    def __repr__(self):
+        return f'<DataVersion {self.name}={self.version}>'
+    
+    @staticmethod
+    def get(name):
+        """Retourne la version courante d'un compteur (0 s'il n'existe pas encore)"""
+        version = db.session.query(DataVersion.version).filter(DataVersion.name == name).scalar()
+        return version or 0
+    
+    @staticmethod
+    def bump(name, session=None):
+        """Incrémente un compteur dans la transaction courante (UPDATE atomique)"""
+        session = session or db.session
+        result = session.execute(
+            update(DataVersion)
+            .where(DataVersion.name == name)
+            .values(version=DataVersion.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            session.add(DataVersion(name=name, version=1))
+    
+    @staticmethod
+    def touch(name, session=None):
+        """
+        Marque un compteur à incrémenter au commit de la transaction courante (une seule fois) :
+        à appeler après les UPDATE en masse, qui ne passent pas par la détection des objets
+        modifiés de la session
+        """
+        session = session or db.session
+        session.info.setdefault('bumped_versions', set()).add(name)
+
+
+# Attributs d'un article qui changent son nom ou son emplacement affichés
+ITEM_NAME_ATTRIBUTES = ('name', 'is_temporary', 'zone_id', 'furniture_id', 'drawer_id')
+
+# Modèles dont les écritures via la session incrémentent chaque compteur : modèle -> attributs
+# suivis (None : toute modification). Les INSERT/UPDATE/DELETE en masse doivent appeler
+# DataVersion.touch explicitement.
+TRACKED_MODELS = {
+    DataVersion.LOCATIONS: {Zone: None, Furniture: None, Drawer: None},
+    DataVersion.INVENTORY: {Item: None, Zone: None, Furniture: None, Drawer: None},
+    DataVersion.ITEM_NAMES: {Item: ITEM_NAME_ATTRIBUTES, Zone: None, Furniture: None, Drawer: None},
+}
+
+
+def _is_changed(session, obj, attributes):
+    if obj in session.new or obj in session.deleted:
+        return True
+    if attributes is None:
+        return session.is_modified(obj)
+    state = inspect(obj)
+    return any(state.attrs[attribute].history.has_changes() for attribute in attributes)
+
+
+@event.listens_for(Session, 'before_flush')
+def _bump_versions(session, flush_context, instances):
+    changed = list(session.new) + list(session.dirty) + list(session.deleted)
+    bumped = session.info.setdefault('bumped_versions', set())
+    for name, models in TRACKED_MODELS.items():
+        if name in bumped:
+            continue
+        if any(type(obj) in models and _is_changed(session, obj, models[type(obj)]) for obj in changed):
+            DataVersion.touch(name, session)
+
+
+@event.listens_for(Session, 'before_commit')
+def _write_versions(session):
+    # Les compteurs sont incrémentés en dernier, juste avant le COMMIT et toujours dans le même
+    # ordre : le verrou sur leur ligne n'est tenu que le temps du commit et n'est jamais pris
+    # avant un verrou sur un article (pas d'interblocage entre écrivains)
+    session.flush()
+    written = session.info.setdefault('written_versions', set())
+    for name in sorted(session.info.get('bumped_versions', ())):
+        if name not in written:
+            DataVersion.bump(name, session)
+            written.add(name)
+
+
+# Rappels locaux (caches de ce worker) appelés à la fin d'une transaction ayant incrémenté un compteur
+_subscribers = {}
+
+
+def on_version_change(name, callback):
+    """Enregistre un rappel sans argument appelé après commit (ou rollback) d'une écriture sur `name`"""
+    _subscribers.setdefault(name, []).append(callback)
+
+
+# Nombre de transactions validées par ce processus ayant incrémenté chaque compteur : un cache
+# compare la progression du compteur en base à ce nombre pour détecter les écritures des autres workers
+_local_writes = Counter()
+_local_writes_lock = threading.Lock()
+
+
+def local_writes(name):
+    """Retourne le nombre d'incréments de `name` validés par ce processus"""
+    return _local_writes[name]
+
+
+def _notify_subscribers(session):
+    for name in session.info.pop('bumped_versions', ()):
+        for callback in _subscribers.get(name, ()):
+            callback()
+
+
+def _after_commit(session):
+    written = session.info.pop('written_versions', ())
+    if written:
+        with _local_writes_lock:
+            _local_writes.update(written)
+    _notify_subscribers(session)
+
+
+def _after_rollback(session):
+    session.info.pop('written_versions', None)
+    _notify_subscribers(session)
+
+
+# Après un rollback aussi : ce worker a pu lire ses propres écritures non validées
+event.listen(Session, 'after_commit', _after_commit)
+event.listen(Session, 'after_rollback', _after_rollback)
@@ -1,10 +1,37 @@
 from . import db
 from datetime import datetime
+import unicodedata
+from sqlalchemy import case, event, func, inspect, null, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.sql import ClauseElement
+from .borrow import Borrow
+from .location import Zone, Furniture, Drawer
+from .stock_movement import StockMovement
+
+# Libellés utilisés dans le chemin d'emplacement
+TEMPORARY_LOCATION = "Article temporaire (sans emplacement)"
+UNKNOWN_LOCATION_PART = "Non spécifié"
+LOCATION_SEPARATOR = " > "
+
+# Attributs d'un article dont dépend son chemin d'emplacement
+LOCATION_ATTRIBUTES = ('is_temporary', 'zone_id', 'furniture_id', 'drawer_id')
+
+
+def normalize_search_text(text):
+    """Normalise un texte pour la recherche : minuscules, sans accents ni espaces superflus"""
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text)
+    without_accents = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(without_accents.casefold().split())
+
 
 class Item(db.Model):
     __tablename__ = 'item'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
+    # Nom normalisé (minuscules, sans accents) utilisé par le moteur de recherche
+    search_name = db.Column(db.String(200), nullable=True)
     stock = db.Column(db.Integer, default=1, nullable=False)  # NOUVEAU: Quantité en stock
     
     # Flag pour distinguer les articles temporaires et permanents
@@ -20,7 +47,22 @@ class Item(db.Model):
     mobilier = db.Column(db.String(100), nullable=True)
     niveau_tiroir = db.Column(db.String(100), nullable=True)
     
+    # Chemin d'emplacement formaté ("Zone > Meuble > Tiroir"), maintenu à chaque création ou
+    # déplacement d'article et à chaque renommage ou déplacement d'emplacement
+    location_path = db.Column(db.String(320), nullable=True)
+    
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Compteurs dénormalisés des emprunts en cours (maintenus avec chaque emprunt/retour,
+    # reconstructibles par `flask --app src.app db reconcile-loans`)
+    active_loan_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    borrowed_quantity = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    
+    # Version de la ligne (verrouillage optimiste) : incrémentée par chaque UPDATE de l'ORM, qui
+    # échoue (StaleDataError) si la ligne a changé depuis sa lecture, et par chaque changement de stock
+    version_id = db.Column(db.Integer, default=1, server_default='1', nullable=False)
+    __mapper_args__ = {'version_id_col': version_id}
+    
     borrows = db.relationship('Borrow', backref='item', lazy=True, cascade="all, delete-orphan")
     
     # Relations avec les tables de localisation
@@ -48,25 +90,244 @@ class Item(db.Model):
         """Vérifie si l'article est en rupture de stock"""
         return self.stock <= 0
     
-    def decrease_stock(self, quantity=1):
-        """Diminue le stock de la quantité spécifiée"""
-        if self.stock >= quantity:
+    def _update_stock(self, stock, *conditions):
+        """
+        Modifie le stock côté serveur en une requête atomique qui incrémente aussi version_id :
+        UPDATE item SET stock = <expression>, version_id = version_id + 1
+        WHERE id = ? [AND conditions] RETURNING stock, version_id
+        L'objet reçoit le nouvel état (ou l'état courant si les conditions ne sont pas remplies)
+        sans être marqué modifié.
+        
+        Returns:
+            bool: True si la ligne a été modifiée
+        """
+        row = db.session.execute(
+            update(Item)
+            .where(Item.id == self.id, *conditions)
+            .values(stock=stock, version_id=Item.version_id + 1)
+            .returning(Item.stock, Item.version_id)
+            .execution_options(synchronize_session=False)
+        ).first()
+        updated = row is not None
+        if not updated:
+            row = db.session.execute(select(Item.stock, Item.version_id).where(Item.id == self.id)).first()
+            if row is None:
+                return False
+        set_committed_value(self, 'stock', row.stock)
+        set_committed_value(self, 'version_id', row.version_id)
+        if updated:
+            # Les UPDATE hors ORM ne sont détectés ni par le flux d'événements ni par les compteurs de version
+            from src.services.event_hub import publish, STOCK
+            from .data_version import DataVersion
+            publish(STOCK, item_id=self.id, stock=row.stock)
+            DataVersion.touch(DataVersion.INVENTORY)
+        return updated
+    
+    def decrease_stock(self, quantity=1, reason=StockMovement.ADJUST, user_id=None, borrow=None):
+        """Diminue le stock de la quantité spécifiée s'il est suffisant (mouvement enregistré dans le journal)"""
+        if not inspect(self).persistent:
+            if self.stock < quantity:
+                return False
             self.stock -= quantity
             return True
-        return False
+        if not self._update_stock(Item.stock - quantity, Item.stock >= quantity):
+            return False
+        StockMovement.record(self, -quantity, reason, user_id=user_id, borrow=borrow)
+        return True
     
-    def increase_stock(self, quantity=1):
-        """Augmente le stock de la quantité spécifiée"""
-        self.stock += quantity
+    def increase_stock(self, quantity=1, reason=StockMovement.ADJUST, user_id=None, borrow=None):
+        """Augmente le stock de la quantité spécifiée (mouvement enregistré dans le journal)"""
+        if not inspect(self).persistent:
+            # Article pas encore inséré : le stock de départ est journalisé à l'insertion
+            self.stock = (self.stock or 0) + quantity
+            return
+        self._update_stock(Item.stock + quantity)
+        StockMovement.record(self, quantity, reason, user_id=user_id, borrow=borrow)
+    
+    def reserve_stock(self, quantity):
+        """
+        Décrémente le stock de manière atomique s'il est suffisant :
+        UPDATE item SET stock = stock - q, version_id = version_id + 1 WHERE id = ? AND stock >= q
+        L'appelant enregistre le mouvement (StockMovement.record) une fois l'emprunt créé.
+        La condition est évaluée par la base, deux emprunts concurrents ne peuvent pas
+        faire passer le stock sous zéro.
         
+        Returns:
+            bool: True si le stock a été réservé (self.stock contient alors le nouveau stock,
+            sinon le stock courant)
+        """
+        return self._update_stock(Item.stock - quantity, Item.stock >= quantity)
+    
     @property
-    def location_info(self):
-        """Retourne les informations de localisation formatées"""
-        if self.is_temporary:
-            return "Article temporaire (sans emplacement)"
+    def is_borrowed(self):
+        """Vérifie si l'article a au moins un emprunt en cours"""
+        return self.active_loan_count > 0
+    
+    def _increment(self, attribute, delta):
+        """
+        Incrémente un compteur côté serveur (UPDATE ... SET col = col + delta) pour ne pas
+        perdre de mise à jour entre workers. Un article pas encore inséré est incrémenté en Python.
+        """
+        current = self.__dict__.get(attribute)
+        if isinstance(current, ClauseElement):
+            setattr(self, attribute, current + delta)
+        elif inspect(self).persistent:
+            setattr(self, attribute, getattr(Item, attribute) + delta)
+        else:
+            setattr(self, attribute, (current or 0) + delta)
+    
+    def register_loan(self, quantity=1):
+        """Met à jour les compteurs d'emprunts en cours après la création d'un emprunt"""
+        self._increment('active_loan_count', 1)
+        self._increment('borrowed_quantity', quantity)
+    
+    def release_loan(self, quantity=1):
+        """Met à jour les compteurs d'emprunts en cours après un retour"""
+        self._increment('active_loan_count', -1)
+        self._increment('borrowed_quantity', -quantity)
+    
+    @staticmethod
+    def loan_counters_update():
+        """
+        Requête UPDATE recalculant les compteurs d'emprunts de tous les articles à partir de Borrow
+        (seuls les articles dont les compteurs sont faux sont modifiés)
+        """
+        active = (Borrow.item_id == Item.id) & (Borrow.return_date == None)
+        count = select(func.count(Borrow.id)).where(active).scalar_subquery()
+        quantity = select(func.coalesce(func.sum(Borrow.quantity), 0)).where(active).scalar_subquery()
+        return update(Item).where(
+            (Item.active_loan_count != count) | (Item.borrowed_quantity != quantity)
+        ).values(active_loan_count=count, borrowed_quantity=quantity)
         
-        zone_name = self.zone_rel.name if self.zone_rel else "Non spécifié"
-        furniture_name = self.furniture_rel.name if self.furniture_rel else "Non spécifié"
-        drawer_name = self.drawer_rel.name if self.drawer_rel else "Non spécifié"
+    @staticmethod
+    def format_location(is_temporary, zone_name, furniture_name, drawer_name):
+        """Formate un emplacement à partir des noms de zone, meuble et tiroir"""
+        if is_temporary:
+            return TEMPORARY_LOCATION
+        
+        return LOCATION_SEPARATOR.join(name or UNKNOWN_LOCATION_PART for name in (zone_name, furniture_name, drawer_name))
+    
+    @staticmethod
+    def location_columns_update():
+        """
+        Requête UPDATE recalculant location_path et les champs texte de compatibilité
+        à partir des tables d'emplacement (à restreindre avec .where())
+        """
+        zone_name = select(Zone.name).where(Zone.id == Item.zone_id).scalar_subquery()
+        furniture_name = select(Furniture.name).where(Furniture.id == Item.furniture_id).scalar_subquery()
+        drawer_name = select(Drawer.name).where(Drawer.id == Item.drawer_id).scalar_subquery()
+        path = func.coalesce(zone_name, UNKNOWN_LOCATION_PART) + LOCATION_SEPARATOR \
+            + func.coalesce(furniture_name, UNKNOWN_LOCATION_PART) + LOCATION_SEPARATOR \
+            + func.coalesce(drawer_name, UNKNOWN_LOCATION_PART)
+        temporary = Item.is_temporary == True
+        return update(Item).values(
+            location_path=case((temporary, TEMPORARY_LOCATION), else_=path),
+            zone=case((temporary, null()), else_=zone_name),
+            mobilier=case((temporary, null()), else_=furniture_name),
+            niveau_tiroir=case((temporary, null()), else_=drawer_name)
+        )
         
-        return f"{zone_name} > {furniture_name} > {drawer_name}"
\ No newline at end of file
+    @property
+    def location_info(self):
+        """Retourne les informations de localisation formatées"""
+        if self.location_path is not None:
+            return self.location_path
+        # Article pas encore enregistré : noms lus dans le cache des emplacements
+        from src.services.location_cache import location_cache
+        return location_cache.location_info(self.is_temporary, self.zone_id, self.furniture_id, self.drawer_id)
+
+@event.listens_for(Item, 'before_insert')
+@event.listens_for(Item, 'before_update')
+def _sync_search_name(mapper, connection, target):
+    """Maintient search_name à jour à chaque écriture d'un article"""
+    target.search_name = normalize_search_text(target.name)
+
+
+def _location_names(connection, target):
+    """Noms de la zone, du meuble et du tiroir d'un article (cache, puis base si absents du cache)"""
+    from src.services.location_cache import location_cache
+    ids = (target.zone_id, target.furniture_id, target.drawer_id)
+    names = location_cache.names(*ids)
+    if all(name is not None or location_id is None for name, location_id in zip(names, ids)):
+        return names
+    # Emplacement créé dans la transaction en cours : lecture sur la connexion du flush
+    return (
+        connection.execute(select(Zone.name).where(Zone.id == target.zone_id)).scalar(),
+        connection.execute(select(Furniture.name).where(Furniture.id == target.furniture_id)).scalar(),
+        connection.execute(select(Drawer.name).where(Drawer.id == target.drawer_id)).scalar()
+    )
+
+
+@event.listens_for(Item, 'before_insert')
+@event.listens_for(Item, 'before_update')
+def _sync_location_path(mapper, connection, target):
+    """Maintient location_path et les champs texte de compatibilité à la création et au déplacement"""
+    if inspect(target).persistent and target.location_path is not None \
+            and not any(inspect(target).attrs[attr].history.has_changes() for attr in LOCATION_ATTRIBUTES):
+        return
+    if target.is_temporary:
+        target.zone = target.mobilier = target.niveau_tiroir = None
+        target.location_path = TEMPORARY_LOCATION
+        return
+    zone_name, furniture_name, drawer_name = _location_names(connection, target)
+    target.zone, target.mobilier, target.niveau_tiroir = zone_name, furniture_name, drawer_name
+    target.location_path = Item.format_location(False, zone_name, furniture_name, drawer_name)
+
+
+@event.listens_for(Item, 'after_insert')
+def _record_initial_stock(mapper, connection, target):
+    """Stock de départ d'un nouvel article dans le journal des mouvements"""
+    if target.stock:
+        connection.execute(StockMovement.__table__.insert().values(
+            item_id=target.id, zone_id=target.zone_id, delta=target.stock, stock_after=target.stock,
+            reason=StockMovement.CREATE, created_at=datetime.utcnow()
+        ))
+
+
+@event.listens_for(Item, 'after_delete')
+def _record_deleted_stock(mapper, connection, target):
+    """Stock restant d'un article supprimé, sorti du journal des mouvements"""
+    if target.stock:
+        connection.execute(StockMovement.__table__.insert().values(
+            item_id=target.id, zone_id=target.zone_id, delta=-target.stock, stock_after=0,
+            reason=StockMovement.DELETE, created_at=datetime.utcnow()
+        ))
+
+
+# --- Propagation des renommages et déplacements d'emplacements (une requête UPDATE par changement) ---
+
+def _refresh_item_locations(connection, condition):
+    # version_id incrémenté comme pour un flush ORM : une édition concurrente de l'article
+    # basée sur l'ancien emplacement est refusée (StaleDataError)
+    connection.execute(Item.location_columns_update().where(condition)
+                       .values(version_id=Item.version_id + 1))
+
+
+@event.listens_for(Zone, 'after_update')
+def _propagate_zone_update(mapper, connection, target):
+    if inspect(target).attrs.name.history.has_changes():
+        _refresh_item_locations(connection, Item.zone_id == target.id)
+
+
+@event.listens_for(Furniture, 'after_update')
+def _propagate_furniture_update(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.zone_id.history.has_changes():
+        connection.execute(update(Item).where(Item.furniture_id == target.id)
+                           .values(zone_id=target.zone_id, version_id=Item.version_id + 1))
+    elif not state.attrs.name.history.has_changes():
+        return
+    _refresh_item_locations(connection, Item.furniture_id == target.id)
+
+
+@event.listens_for(Drawer, 'after_update')
+def _propagate_drawer_update(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.furniture_id.history.has_changes():
+        zone_id = select(Furniture.zone_id).where(Furniture.id == target.furniture_id).scalar_subquery()
+        connection.execute(update(Item).where(Item.drawer_id == target.id)
+                           .values(furniture_id=target.furniture_id, zone_id=zone_id,
+                                   version_id=Item.version_id + 1))
+    elif not state.attrs.name.history.has_changes():
+        return
+    _refresh_item_locations(connection, Item.drawer_id == target.id)
@@ -1,5 +1,10 @@
 from . import db
 from datetime import datetime
+from sqlalchemy import case, cast, insert, literal, select, text, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+
+# Types des alertes de stock
+STOCK_ALERT_TYPES = ('danger', 'warning')
 
 class Notification(db.Model):
     __tablename__ = 'notification'
@@ -13,61 +18,94 @@ class Notification(db.Model):
     
     # Relation avec l'article
     item = db.relationship('Item', backref='notifications', lazy=True)
+    
+    # Une seule alerte active par article et par type
+    __table_args__ = (
+        db.Index('ux_notification_active_item_type', 'item_id', 'type', unique=True,
+                 postgresql_where=text('is_active'), sqlite_where=text('is_active = 1')),
+    )
 
     def __repr__(self):
         return f'<Notification {self.type}: {self.message[:30]}...>'
     
     @staticmethod
-    def create_stock_alert(item):
-        """Créer une notification de stock épuisé"""
-        if item.stock <= 0:
-            # Vérifier si une alerte existe déjà pour cet article
-            existing = Notification.query.filter_by(
-                item_id=item.id,
-                type='danger',
-                is_active=True
-            ).first()
-            
-            if not existing:
-                notification = Notification(
-                    message=f"Stock épuisé pour l'article '{item.name}'",
-                    type='danger',
-                    item_id=item.id,
-                    is_active=True
-                )
-                db.session.add(notification)
-                return notification
-        return None
+    def create_stock_alerts(item_ids, threshold=2):
+        """
+        Crée en une requête les alertes de stock d'un lot d'articles d'après leur stock courant :
+        'danger' pour un stock épuisé, 'warning' pour un stock faible (0 < stock <= threshold).
+        Les alertes déjà actives sont ignorées par l'index unique partiel
+        (INSERT ... ON CONFLICT DO NOTHING sous PostgreSQL, INSERT OR IGNORE sous SQLite).
+        
+        Args:
+            item_ids: identifiants des articles à vérifier
+            threshold (int): seuil de stock faible
+        
+        Returns:
+            list: lignes (item_id, type) des alertes créées
+        """
+        from .item import Item
+        
+        item_ids = list(item_ids)
+        if not item_ids:
+            return []
+        
+        alert_type = case((Item.stock <= 0, literal('danger')), else_=literal('warning'))
+        message = case(
+            (Item.stock <= 0, literal("Stock épuisé pour l'article '") + Item.name + literal("'")),
+            else_=literal("Stock faible pour l'article '") + Item.name + literal("' (reste ")
+            + cast(Item.stock, db.String) + literal(")")
+        )
+        candidates = select(
+            message, alert_type, Item.id, literal(datetime.utcnow()), literal(True), literal(False)
+        ).where(Item.id.in_(item_ids), Item.stock <= threshold)
+        columns = ['message', 'type', 'item_id', 'created_at', 'is_active', 'auto_dismiss']
+        
+        if db.session.get_bind().dialect.name == 'postgresql':
+            statement = postgresql_insert(Notification).from_select(columns, candidates).on_conflict_do_nothing()
+        else:
+            statement = insert(Notification).prefix_with('OR IGNORE').from_select(columns, candidates)
+        
+        return db.session.execute(statement.returning(Notification.item_id, Notification.type)).all()
     
     @staticmethod
-    def create_low_stock_alert(item, threshold=2):
-        """Créer une notification de stock faible"""
-        if 0 < item.stock <= threshold:
-            # Vérifier si une alerte existe déjà
-            existing = Notification.query.filter_by(
-                item_id=item.id,
-                type='warning',
-                is_active=True
-            ).first()
-            
-            if not existing:
-                notification = Notification(
-                    message=f"Stock faible pour l'article '{item.name}' (reste {item.stock})",
-                    type='warning',
-                    item_id=item.id,
-                    is_active=True
-                )
-                db.session.add(notification)
-                return notification
-        return None
+    def dismiss_stock_alerts(item):
+        """
+        Supprimer les alertes de stock pour un article (quand le stock est rechargé)
+        
+        Returns:
+            list: lignes (item_id, type) des alertes désactivées
+        """
+        return db.session.execute(
+            update(Notification)
+            .where(
+                Notification.item_id == item.id,
+                Notification.is_active == True,
+                Notification.type.in_(STOCK_ALERT_TYPES)
+            )
+            .values(is_active=False)
+            .returning(Notification.item_id, Notification.type)
+            .execution_options(synchronize_session=False)
+        ).all()
     
     @staticmethod
-    def dismiss_stock_alerts(item):
-        """Supprimer les alertes de stock pour un article (quand le stock est rechargé)"""
-        alerts = Notification.query.filter_by(
-            item_id=item.id,
-            is_active=True
-        ).filter(Notification.type.in_(['danger', 'warning'])).all()
+    def dismiss_restocked_alerts(item_ids):
+        """
+        Désactive en une requête les alertes de stock des articles du lot de nouveau en stock
+        
+        Returns:
+            list: lignes (item_id, type) des alertes désactivées
+        """
+        from .item import Item
         
-        for alert in alerts:
-            alert.is_active = False
\ No newline at end of file
+        restocked = select(Item.id).where(Item.id.in_(list(item_ids)), Item.stock > 0)
+        return db.session.execute(
+            update(Notification)
+            .where(
+                Notification.item_id.in_(restocked),
+                Notification.is_active == True,
+                Notification.type.in_(STOCK_ALERT_TYPES)
+            )
+            .values(is_active=False)
+            .returning(Notification.item_id, Notification.type)
+            .execution_options(synchronize_session=False)
+        ).all()
@@ -0,0 +1,33 @@
+from . import db
+from datetime import datetime
+
+
+class ReportJob(db.Model):
+    """
+    Génération d'un rapport en tâche de fond (services/report_jobs.py).
+    L'identifiant, aléatoire, sert dans les URL de suivi et de téléchargement ; le fichier
+    produit est supprimé avec la ligne après expires_at.
+    """
+    __tablename__ = 'report_job'
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hexadécimal
+    kind = db.Column(db.String(30), nullable=False)  # all-items-pdf, user-loans-pdf
+    params = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    user_id = db.Column(db.Integer, nullable=False)  # demandeur
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    progress = db.Column(db.Integer, nullable=False, default=0)  # pourcentage
+    error = db.Column(db.Text, nullable=True)
+    file_name = db.Column(db.String(200), nullable=True)  # nom proposé au téléchargement
+    file_size = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    # États
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __repr__(self):
+        return f'<ReportJob {self.id} {self.kind} {self.status}>'
@@ -0,0 +1,218 @@
+from . import db
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import case, func, insert, select
+
+
+class StockMovement(db.Model):
+    """
+    Journal des mouvements de stock (ajout seul, jamais modifié ni supprimé).
+    Chaque changement de Item.stock écrit une ligne dans la même transaction : la somme des
+    deltas d'un article est égale à son stock. Pas de clé étrangère vers item/borrow/user :
+    l'historique survit à la suppression des articles et des emprunts.
+    """
+    __tablename__ = 'stock_movement'
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, nullable=False)
+    zone_id = db.Column(db.Integer, nullable=True)  # zone de l'article au moment du mouvement
+    delta = db.Column(db.Integer, nullable=False)
+    stock_after = db.Column(db.Integer, nullable=True)
+    reason = db.Column(db.String(20), nullable=False)
+    user_id = db.Column(db.Integer, nullable=True)
+    borrow_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # Stock d'un article à une date (mouvements postérieurs au dernier instantané)
+        db.Index('ix_stock_movement_item_created', 'item_id', 'created_at'),
+        # Agrégation journalière (StockSnapshot.rollup) et consommation récente par zone
+        db.Index('ix_stock_movement_created_at', 'created_at'),
+    )
+
+    # Emprunt à l'origine du mouvement (l'identifiant est renseigné au flush s'il est nouveau)
+    borrow = db.relationship('Borrow', primaryjoin='foreign(StockMovement.borrow_id) == Borrow.id')
+
+    # Motifs
+    INITIAL = 'initial'  # stock existant lors de la création du journal
+    CREATE = 'create'    # création de l'article
+    DELETE = 'delete'    # suppression de l'article
+    LOAN = 'loan'        # sortie pour un emprunt
+    RETURN = 'return'    # retour d'un emprunt
+    ADJUST = 'adjust'    # ajustement manuel (+/- n)
+    COUNT = 'count'      # correction après inventaire (stock saisi)
+
+    def __repr__(self):
+        return f'<StockMovement item={self.item_id} {self.delta:+d} ({self.reason})>'
+
+    @staticmethod
+    def record(item, delta, reason, user_id=None, borrow=None):
+        """
+        Ajoute à la session le mouvement d'un article existant dont le stock vient de changer
+        (item.stock contient déjà le nouveau stock)
+        """
+        movement = StockMovement(
+            item_id=item.id,
+            zone_id=item.zone_id,
+            delta=delta,
+            stock_after=item.stock,
+            reason=reason,
+            user_id=user_id,
+            borrow=borrow,
+            created_at=datetime.utcnow()
+        )
+        db.session.add(movement)
+        return movement
+
+    @staticmethod
+    def record_many(rows):
+        """Insère plusieurs mouvements en une requête (chemins UPDATE en masse sans objet ORM)"""
+        if rows:
+            now = datetime.utcnow()
+            db.session.execute(insert(StockMovement), [dict(row, created_at=now) for row in rows])
+
+    @staticmethod
+    def stock_at(item_id, at):
+        """
+        Stock d'un article à une date : dernier instantané journalier antérieur au jour de `at`,
+        plus les mouvements postérieurs à cet instantané (au plus ceux des jours non agrégés).
+        """
+        snapshot = db.session.execute(
+            select(StockSnapshot.day, StockSnapshot.stock)
+            .where(StockSnapshot.item_id == item_id, StockSnapshot.day < at.date())
+            .order_by(StockSnapshot.day.desc())
+            .limit(1)
+        ).first()
+
+        movements = select(func.coalesce(func.sum(StockMovement.delta), 0)) \
+            .where(StockMovement.item_id == item_id, StockMovement.created_at <= at)
+        if snapshot:
+            movements = movements.where(StockMovement.created_at >= _day_start(snapshot.day + timedelta(days=1)))
+        return (snapshot.stock if snapshot else 0) + db.session.execute(movements).scalar()
+
+    @staticmethod
+    def consumption_by_zone(start, end):
+        """
+        Quantités empruntées et retournées par zone sur les jours [start, end[ :
+        instantanés pour les jours agrégés, mouvements pour les jours suivants.
+
+        Returns:
+            dict: {zone_id: {'loaned': n, 'returned': n}} (zone_id None pour les articles sans zone)
+        """
+        totals = {}
+
+        def add(rows):
+            for row in rows:
+                zone = totals.setdefault(row.zone_id, {'loaned': 0, 'returned': 0})
+                zone['loaned'] += row.loaned or 0
+                zone['returned'] += row.returned or 0
+
+        rolled_until = StockSnapshot.rolled_until()
+        recent_start = start
+        if rolled_until and rolled_until >= start:
+            add(db.session.execute(
+                select(StockSnapshot.zone_id,
+                       func.sum(StockSnapshot.loaned).label('loaned'),
+                       func.sum(StockSnapshot.returned).label('returned'))
+                .where(StockSnapshot.day >= start, StockSnapshot.day < end)
+                .group_by(StockSnapshot.zone_id)
+            ))
+            recent_start = rolled_until + timedelta(days=1)
+
+        if recent_start < end:
+            add(db.session.execute(
+                select(StockMovement.zone_id,
+                       func.sum(case((StockMovement.reason == StockMovement.LOAN, -StockMovement.delta),
+                                     else_=0)).label('loaned'),
+                       func.sum(case((StockMovement.reason == StockMovement.RETURN, StockMovement.delta),
+                                     else_=0)).label('returned'))
+                .where(StockMovement.created_at >= _day_start(recent_start),
+                       StockMovement.created_at < _day_start(end))
+                .group_by(StockMovement.zone_id)
+            ))
+        return totals
+
+
+class StockSnapshot(db.Model):
+    """
+    Agrégat journalier des mouvements de stock, par article (une ligne par article et par jour
+    ayant eu au moins un mouvement) : stock en fin de journée et quantités par motif.
+    Alimenté par StockSnapshot.rollup (`flask --app src.app db rollup-stock`).
+    """
+    __tablename__ = 'stock_snapshot'
+    item_id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    zone_id = db.Column(db.Integer, nullable=True)
+    stock = db.Column(db.Integer, nullable=False)  # stock en fin de journée
+    loaned = db.Column(db.Integer, default=0, nullable=False)
+    returned = db.Column(db.Integer, default=0, nullable=False)
+    adjusted = db.Column(db.Integer, default=0, nullable=False)  # autres motifs (net)
+
+    __table_args__ = (
+        # Consommation par zone sur une période
+        db.Index('ix_stock_snapshot_day_zone', 'day', 'zone_id'),
+    )
+
+    def __repr__(self):
+        return f'<StockSnapshot item={self.item_id} {self.day} stock={self.stock}>'
+
+    @staticmethod
+    def rolled_until():
+        """Dernier jour agrégé (None si aucun)"""
+        return db.session.query(func.max(StockSnapshot.day)).scalar()
+
+    @staticmethod
+    def rollup(until=None):
+        """
+        Agrège les mouvements des jours complets non encore agrégés, jusqu'à la veille de
+        `until` (aujourd'hui, UTC, par défaut). Une requête groupée pour les mouvements, une pour
+        le stock précédent des articles concernés, une insertion groupée.
+
+        Returns:
+            int: nombre d'instantanés créés
+        """
+        until = until or datetime.utcnow().date()
+        last_day = StockSnapshot.rolled_until()
+        query = select(
+            func.date(StockMovement.created_at).label('day'),
+            StockMovement.item_id,
+            func.max(StockMovement.zone_id).label('zone_id'),
+            func.sum(StockMovement.delta).label('delta'),
+            func.sum(case((StockMovement.reason == StockMovement.LOAN, -StockMovement.delta), else_=0)).label('loaned'),
+            func.sum(case((StockMovement.reason == StockMovement.RETURN, StockMovement.delta), else_=0)).label('returned'),
+        ).where(StockMovement.created_at < _day_start(until)) \
+            .group_by(func.date(StockMovement.created_at), StockMovement.item_id) \
+            .order_by(func.date(StockMovement.created_at))
+        if last_day:
+            query = query.where(StockMovement.created_at >= _day_start(last_day + timedelta(days=1)))
+        rows = db.session.execute(query).all()
+        if not rows:
+            return 0
+
+        # Stock en fin du dernier jour agrégé des articles concernés
+        item_ids = {row.item_id for row in rows}
+        latest = select(StockSnapshot.item_id, func.max(StockSnapshot.day).label('day')) \
+            .where(StockSnapshot.item_id.in_(item_ids)) \
+            .group_by(StockSnapshot.item_id).subquery()
+        stocks = dict(db.session.execute(
+            select(StockSnapshot.item_id, StockSnapshot.stock)
+            .join(latest, (StockSnapshot.item_id == latest.c.item_id) & (StockSnapshot.day == latest.c.day))
+        ).all())
+
+        snapshots = []
+        for row in rows:
+            stocks[row.item_id] = stocks.get(row.item_id, 0) + row.delta
+            snapshots.append({
+                'item_id': row.item_id,
+                # date() renvoie une chaîne sous SQLite
+                'day': row.day if isinstance(row.day, date) else date.fromisoformat(row.day),
+                'zone_id': row.zone_id,
+                'stock': stocks[row.item_id],
+                'loaned': row.loaned,
+                'returned': row.returned,
+                'adjusted': row.delta + row.loaned - row.returned,
+            })
+        db.session.execute(insert(StockSnapshot), snapshots)
+        return len(snapshots)
+
+
+def _day_start(day):
+    return datetime.combine(day, time.min)
@@ -7,6 +7,7 @@ from .items_api import items_api_bp
 from .loans_api import loans_api_bp
 from .reports_routes import reports_bp
 from .utils_routes import utils_bp
+from .events_api import events_api_bp
 
 # Liste des blueprints à enregistrer dans l'application
 blueprints = [
@@ -18,4 +19,5 @@ blueprints = [
     loans_api_bp,
     reports_bp,
     utils_bp,
+    events_api_bp,
 ]
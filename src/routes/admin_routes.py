@@ -1,10 +1,16 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
+from sqlalchemy import func, select
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.exc import StaleDataError
 from src.models import db
 from src.models.user import User
 from src.models.item import Item
 from src.models.borrow import Borrow
 from src.models.location import Zone, Furniture, Drawer
+from src.models.stock_movement import StockMovement
+from src.services.location_cache import location_cache
+from src.services.search_service import search_items
+from datetime import date, datetime, timedelta
 import os
 import sys
 
@@ -209,14 +215,48 @@ def delete_user(user_id):
         return redirect(url_for('admin.user_list'))
 
 # Gestion des articles
+ITEMS_PER_PAGE = 50
+MAX_ITEMS_PER_PAGE = 200
+
+# Colonnes de tri disponibles pour la liste des articles
+ITEMS_SORT_COLUMNS = {
+    'name': Item.name,
+    'stock': Item.stock,
+    'zone': Zone.name,
+    'borrowed': Item.active_loan_count,
+}
+
 @admin_bp.route('/items')
 def items_list():
     # Récupérer le paramètre de filtre s'il existe
     filter_type = request.args.get('filter', 'all')  # Par défaut : afficher tous les articles
     search_term = request.args.get('search', '').strip()
-    
-    # Construire la requête de base
-    query = db.session.query(Item)
+    sort = request.args.get('sort', 'name')
+    if sort not in ITEMS_SORT_COLUMNS:
+        sort = 'name'
+    direction = 'desc' if request.args.get('dir') == 'desc' else 'asc'
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', ITEMS_PER_PAGE, type=int), 1), MAX_ITEMS_PER_PAGE)
+    
+    # Premier emprunt en cours de chaque article (un seul par article pour la jointure)
+    active_borrow = db.session.query(
+        Borrow.item_id.label('item_id'),
+        func.min(Borrow.id).label('borrow_id')
+    ).filter(Borrow.return_date == None).group_by(Borrow.item_id).subquery()
+    
+    # Une seule requête : article, emplacement, emprunt en cours et emprunteur
+    query = db.session.query(
+        Item.id, Item.name, Item.stock, Item.version_id, Item.is_temporary, Item.active_loan_count,
+        Zone.name.label('zone_name'),
+        Furniture.name.label('furniture_name'),
+        Drawer.name.label('drawer_name'),
+        User.name.label('borrower_name')
+    ).outerjoin(Zone, Item.zone_id == Zone.id) \
+        .outerjoin(Furniture, Item.furniture_id == Furniture.id) \
+        .outerjoin(Drawer, Item.drawer_id == Drawer.id) \
+        .outerjoin(active_borrow, active_borrow.c.item_id == Item.id) \
+        .outerjoin(Borrow, Borrow.id == active_borrow.c.borrow_id) \
+        .outerjoin(User, User.id == Borrow.user_id)
     
     # Appliquer le filtre si nécessaire
     if filter_type == 'temporary':
@@ -226,39 +266,38 @@ def items_list():
 
     # Appliquer le filtre de recherche si un terme est fourni
     if search_term:
-        query = query.filter(Item.name.ilike(f'%{search_term}%'))
+        query = search_items(query, search_term, ranked=False)
     
-    # Trier les résultats par nom
-    items = query.order_by(Item.name).all()
+    items_count = query.order_by(None).count()
+    total_pages = max((items_count + per_page - 1) // per_page, 1)
+    page = min(page, total_pages)
+    
+    # Trier côté serveur (l'id garantit un ordre stable entre les pages)
+    sort_column = ITEMS_SORT_COLUMNS[sort]
+    order = sort_column.desc() if direction == 'desc' else sort_column.asc()
+    rows = query.order_by(order, Item.name, Item.id) \
+        .offset((page - 1) * per_page).limit(per_page).all()
     
     items_list = []
-    for item in items:
-        # Vérifier si l'article est emprunté et récupérer l'emprunteur
-        borrow_record = db.session.query(Borrow).filter(Borrow.item_id == item.id, Borrow.return_date == None).first()
-        is_borrowed = borrow_record is not None
-        borrower_name = None
-        if borrow_record:
-            user = db.session.get(User, borrow_record.user_id)
-            if user:
-                borrower_name = user.name
-        
+    for row in rows:
         # Créer un dictionnaire avec les informations de l'article
         item_dict = {
-            'id': item.id,
-            'name': item.name,
-            'stock': item.stock,  # NOUVEAU: ajouter le stock
-            'is_available': item.is_available,  # NOUVEAU: disponibilité
-            'is_borrowed': is_borrowed,
-            'is_temporary': item.is_temporary,
-            'borrower_name': borrower_name  # Ajouter le nom de l'emprunteur
+            'id': row.id,
+            'name': row.name,
+            'stock': row.stock,  # NOUVEAU: ajouter le stock
+            'version': row.version_id,  # version lue, renvoyée avec la correction de stock
+            'is_available': row.stock > 0,  # NOUVEAU: disponibilité
+            'is_borrowed': row.active_loan_count > 0,
+            'is_temporary': row.is_temporary,
+            'borrower_name': row.borrower_name  # Ajouter le nom de l'emprunteur
         }
         
         # Ajouter les informations de localisation pour les articles non temporaires
-        if not item.is_temporary:
+        if not row.is_temporary:
             item_dict.update({
-                'zone_name': item.zone_rel.name if item.zone_rel else 'Non spécifié',
-                'furniture_name': item.furniture_rel.name if item.furniture_rel else 'Non spécifié',
-                'drawer_name': item.drawer_rel.name if item.drawer_rel else 'Non spécifié'
+                'zone_name': row.zone_name or 'Non spécifié',
+                'furniture_name': row.furniture_name or 'Non spécifié',
+                'drawer_name': row.drawer_name or 'Non spécifié'
             })
         else:
             item_dict.update({
@@ -272,14 +311,19 @@ def items_list():
     return render_template('admin/items_list.html', 
                            items=items_list, 
                            current_filter=filter_type,
-                           items_count=len(items_list),
-                           search_term=search_term)  # Passer le terme de recherche au template
+                           items_count=items_count,
+                           search_term=search_term,  # Passer le terme de recherche au template
+                           sort=sort,
+                           direction=direction,
+                           page=page,
+                           per_page=per_page,
+                           total_pages=total_pages)
 
 @admin_bp.route('/add-item', methods=['GET', 'POST'])
 def add_item():
-    zones_query = db.session.query(Zone).order_by(Zone.name).all()
-    furnitures_query = db.session.query(Furniture).order_by(Furniture.name).all()
-    drawers_query = db.session.query(Drawer).order_by(Drawer.name).all()
+    zones_query = location_cache.zones()
+    furnitures_query = location_cache.furniture()
+    drawers_query = location_cache.drawers()
 
     form_data = {'name': '', 'selected_zone': None, 'selected_furniture': None, 'selected_drawer': None}
 
@@ -322,6 +366,11 @@ def add_item():
             flash("Les identifiants de localisation (Zone, Mobilier, Tiroir) doivent être des nombres valides.", "danger")
             return render_template('admin/add_item.html', zones=zones_query, furnitures=furnitures_query, drawers=drawers_query, **form_data)
         
+        location_error = location_cache.validate(zone_id, furniture_id, drawer_id)
+        if location_error:
+            flash(location_error, "danger")
+            return render_template('admin/add_item.html', zones=zones_query, furnitures=furnitures_query, drawers=drawers_query, **form_data)
+        
         try:
             existing_item = Item.query.filter_by(
                 name=name,
@@ -381,6 +430,28 @@ def edit_item(item_id):
             flash("Toutes les informations de localisation sont requises.", "danger")
             return redirect(url_for('admin.edit_item', item_id=item_id))
         
+        # Verrouillage optimiste : version de l'article affichée dans le formulaire
+        expected_version = parse_int(request.form.get('version'))
+        if expected_version is None:
+            flash("Formulaire incomplet, veuillez recharger la page.", "danger")
+            return redirect(url_for('admin.edit_item', item_id=item_id))
+        if expected_version != item.version_id:
+            flash("L'article a été modifié entre-temps : vérifiez ses nouvelles valeurs puis enregistrez à nouveau.", "warning")
+            return redirect(url_for('admin.edit_item', item_id=item_id))
+        
+        try:
+            zone_id = int(zone_id)
+            furniture_id = int(furniture_id)
+            drawer_id = int(drawer_id)
+        except ValueError:
+            flash("Les identifiants de localisation (Zone, Mobilier, Tiroir) doivent être des nombres valides.", "danger")
+            return redirect(url_for('admin.edit_item', item_id=item_id))
+        
+        location_error = location_cache.validate(zone_id, furniture_id, drawer_id)
+        if location_error:
+            flash(location_error, "danger")
+            return redirect(url_for('admin.edit_item', item_id=item_id))
+        
         try:
             item.name = name
             item.zone_id = zone_id
@@ -391,15 +462,19 @@ def edit_item(item_id):
             
             flash("Article modifié avec succès.", "success")
             return redirect(url_for('admin.items_list'))
+        except StaleDataError:
+            # L'article a changé entre sa lecture et l'enregistrement (version_id) :
+            # message et retour au formulaire par le gestionnaire d'erreurs de l'application
+            raise
         except Exception as e:
             db.session.rollback()
             flash(f"Erreur lors de la modification de l'article: {str(e)}", "danger")
             return redirect(url_for('admin.edit_item', item_id=item_id))
     
     # GET request - afficher le formulaire
-    zones = db.session.query(Zone).order_by(Zone.name).all()
-    furnitures = db.session.query(Furniture).order_by(Furniture.name).all()
-    drawers = db.session.query(Drawer).order_by(Drawer.name).all()
+    zones = location_cache.zones()
+    furnitures = location_cache.furniture()
+    drawers = location_cache.drawers()
     
     return render_template('admin/edit_item.html', item=item, zones=zones, furnitures=furnitures, drawers=drawers)
 
@@ -411,12 +486,7 @@ def delete_item(item_id):
             return jsonify(success=False, error="Article non trouvé."), 404
 
         # Vérifier si l'article est emprunté
-        is_borrowed = db.session.query(Borrow).filter(
-            Borrow.item_id == item.id,
-            Borrow.return_date == None
-        ).first() is not None
-        
-        if is_borrowed:
+        if item.is_borrowed:
             return jsonify(success=False, error=f"Impossible de supprimer l'article '{item.name}' car il est actuellement emprunté."), 400
         
         item_name = item.name # Sauvegarder le nom avant la suppression
@@ -424,6 +494,8 @@ def delete_item(item_id):
         db.session.commit()
         return jsonify(success=True, message=f"Article '{item_name}' supprimé avec succès.")
 
+    except StaleDataError:
+        raise  # 409 (gestionnaire d'erreurs de l'application)
     except SQLAlchemyError as e: # Être plus spécifique sur l'exception si possible
         db.session.rollback()
         return jsonify(success=False, error="Erreur de base de données lors de la suppression."), 500
@@ -434,14 +506,10 @@ def delete_item(item_id):
 @admin_bp.route('/items/delete-unborrowed-temporary', methods=['POST'])
 def delete_unborrowed_temporary_items():
     try:
-        # Lister les IDs des articles actuellement empruntés
-        borrowed_item_ids = db.session.query(Borrow.item_id).filter(Borrow.return_date == None).distinct().all()
-        borrowed_item_ids = [item_id for (item_id,) in borrowed_item_ids]
-
-        # Sélectionner les articles temporaires qui ne sont PAS dans la liste des empruntés
+        # Sélectionner les articles temporaires sans emprunt en cours
         items_to_delete = db.session.query(Item).filter(
             Item.is_temporary == True,
-            ~Item.id.in_(borrowed_item_ids) # Le tilde ~ signifie NOT IN
+            Item.active_loan_count == 0
         ).all()
         
         count_deleted = len(items_to_delete)
@@ -547,9 +615,40 @@ def demote_user(user_id):
     
     return redirect(url_for('admin.user_list'))
 
+def parse_int(value):
+    """Entier d'un champ JSON ou de formulaire (nombre entier ou texte), None si la valeur n'en est pas un"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            return None
+    return None
+
+def stock_conflict_response(item_id):
+    """Réponse 409 avec l'état courant d'un article modifié entre sa lecture et sa mise à jour"""
+    current = db.session.execute(
+        select(Item.stock, Item.version_id).where(Item.id == item_id)
+    ).first()
+    if current is None:
+        return jsonify({'success': False, 'error': 'Article non trouvé'}), 404
+    return jsonify({
+        'success': False,
+        'error': f'Le stock a été modifié entre-temps (stock actuel: {current.stock})',
+        'current': {'stock': current.stock, 'version': current.version_id}
+    }), 409
+
 @admin_bp.route('/items/<int:item_id>/update-stock', methods=['POST'])
 def update_item_stock(item_id):
-    """Mettre à jour le stock d'un article"""
+    """
+    Mettre à jour le stock d'un article (correction après inventaire).
+    Verrouillage optimiste : si le corps contient la version lue par le client (`version`),
+    ou si l'article change entre sa lecture et l'UPDATE (version_id de l'ORM), la mise à jour
+    est refusée avec un 409 contenant le stock et la version actuels.
+    """
     if 'user_id' not in session:
         return jsonify({'success': False, 'error': 'Non authentifié'}), 401
     
@@ -557,28 +656,45 @@ def update_item_stock(item_id):
     if not current_user or not current_user.is_admin:
         return jsonify({'success': False, 'error': 'Droits administrateur requis'}), 403
     
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Données invalides'}), 400
+    
+    new_stock = parse_int(data.get('stock'))
+    if new_stock is None or new_stock < 0:
+        return jsonify({'success': False, 'error': 'Stock invalide'}), 400
+    
+    expected_version = data.get('version')
+    if expected_version is not None:
+        expected_version = parse_int(expected_version)
+        if expected_version is None:
+            return jsonify({'success': False, 'error': 'Version invalide'}), 400
+    
     try:
-        data = request.get_json()
-        new_stock = data.get('stock')
-        
-        if new_stock is None or new_stock < 0:
-            return jsonify({'success': False, 'error': 'Stock invalide'}), 400
-        
         item = db.session.get(Item, item_id)
         if not item:
             return jsonify({'success': False, 'error': 'Article non trouvé'}), 404
         
+        if expected_version is not None and expected_version != item.version_id:
+            return stock_conflict_response(item_id)
+        
         old_stock = item.stock
         item.stock = new_stock
+        if new_stock != old_stock:
+            StockMovement.record(item, new_stock - old_stock, StockMovement.COUNT, user_id=current_user.id)
+        # UPDATE ... WHERE id = ? AND version_id = <version lue> (StaleDataError si modifié entre-temps)
         db.session.commit()
         
         return jsonify({
             'success': True, 
             'message': f'Stock mis à jour: {old_stock} → {new_stock}',
             'old_stock': old_stock,
-            'new_stock': new_stock
+            'new_stock': new_stock,
+            'version': item.version_id
         })
         
+    except StaleDataError:
+        raise  # 409 avec le stock et la version actuels (gestionnaire d'erreurs de l'application)
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -590,11 +706,14 @@ def out_of_stock():
     """Page des articles épuisés"""
     from src.models.item import Item
     
+    # Une seule requête (index partiel ix_item_low_stock) pour les articles épuisés et en stock faible
+    alert_items = Item.query.filter(Item.stock <= 2).order_by(Item.name).all()
+    
     # Articles épuisés (stock = 0)
-    out_of_stock_items = Item.query.filter_by(stock=0).all()
+    out_of_stock_items = [item for item in alert_items if item.stock == 0]
     
     # Articles en stock faible (stock 1-2)
-    low_stock_items = Item.query.filter(Item.stock.between(1, 2)).all()
+    low_stock_items = [item for item in alert_items if item.stock >= 1]
     
     # Total des articles
     total_items = Item.query.count()
@@ -604,11 +723,50 @@ def out_of_stock():
                          low_stock_items=low_stock_items,
                          total_items=total_items)
 
+# Consommation par zone (journal des mouvements de stock)
+@admin_bp.route('/api/consumption')
+@login_required
+def consumption_by_zone():
+    """
+    Quantités empruntées et retournées par zone entre `start` (inclus) et `end` (exclu),
+    dates au format AAAA-MM-JJ. Par défaut : le mois précédent.
+    """
+    today = datetime.utcnow().date()
+    first_of_month = today.replace(day=1)
+    try:
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') \
+            else (first_of_month - timedelta(days=1)).replace(day=1)
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else first_of_month
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Date invalide (format AAAA-MM-JJ attendu)'}), 400
+    
+    zone_names = {zone.id: zone.name for zone in location_cache.zones()}
+    totals = StockMovement.consumption_by_zone(start, end)
+    zones = [{
+        'zone_id': zone_id,
+        'zone_name': zone_names.get(zone_id, 'Sans zone' if zone_id is None else f'Zone {zone_id} (supprimée)'),
+        'loaned': values['loaned'],
+        'returned': values['returned'],
+        'net': values['loaned'] - values['returned']
+    } for zone_id, values in totals.items() if values['loaned'] or values['returned']]
+    zones.sort(key=lambda zone: zone['loaned'], reverse=True)
+    
+    return jsonify({
+        'success': True,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'zones': zones
+    })
+
 # NOUVELLE ROUTE API : Ajustement rapide de stock
 @admin_bp.route('/api/adjust-stock', methods=['POST'])
 @login_required
 def adjust_stock():
-    """API pour ajuster rapidement le stock d'un article"""
+    """
+    API pour ajuster rapidement le stock d'un article.
+    L'ajout est un incrément côté serveur (UPDATE item SET stock = stock + n), sans perte de mise à jour
+    face aux emprunts et retours concurrents.
+    """
     try:
         data = request.get_json()
         item_id = data.get('item_id')
@@ -617,6 +775,11 @@ def adjust_stock():
         if not item_id or adjustment is None:
             return jsonify({'success': False, 'error': 'Paramètres manquants'}), 400
         
+        try:
+            adjustment = int(adjustment)
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'Quantité invalide'}), 400
+        
         if adjustment < 1:
             return jsonify({'success': False, 'error': 'La quantité doit être positive'}), 400
         
@@ -624,15 +787,17 @@ def adjust_stock():
         if not item:
             return jsonify({'success': False, 'error': 'Article non trouvé'}), 404
         
-        old_stock = item.stock
-        item.stock += adjustment
+        item.increase_stock(adjustment, StockMovement.ADJUST, user_id=session['user_id'])
         db.session.commit()
         
+        # Stock précédent déduit du résultat de l'incrément (un retour concurrent a pu le modifier)
+        old_stock = item.stock - adjustment
         return jsonify({
             'success': True, 
             'message': f'Stock de "{item.name}" mis à jour: {old_stock} → {item.stock}',
             'old_stock': old_stock,
             'new_stock': item.stock,
+            'version': item.version_id,
             'item_name': item.name
         })
         
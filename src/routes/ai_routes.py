@@ -115,7 +115,8 @@ def handle_inventory_chat():
 
     # ai_service est déjà l'instance de AIService importée au niveau du module
     try:
-        all_items = Item.query.all() # Item est déjà importé
+        # Seuls le nom et le chemin d'emplacement stocké sont utilisés dans le contexte
+        all_items = db.session.query(Item.name, Item.location_path).all()
         ai_response_text = ai_service.get_inventory_chat_response(all_items, user_query)
         return jsonify({'response': ai_response_text})
 
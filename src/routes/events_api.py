@@ -0,0 +1,78 @@
+import queue
+import time
+from flask import Blueprint, Response, current_app, jsonify, request, session, stream_with_context
+from src.models import db
+from src.services.event_hub import event_hub
+
+# Création du blueprint
+events_api_bp = Blueprint('events_api', __name__, url_prefix='/api/events')
+
+# Commentaire envoyé périodiquement pour garder la connexion ouverte (secondes)
+HEARTBEAT_INTERVAL = 15
+# Durée maximale d'un flux ; le navigateur se reconnecte ensuite avec Last-Event-ID (secondes)
+STREAM_DURATION = 300
+# Délai de reconnexion conseillé au navigateur (millisecondes)
+RETRY_DELAY = 3000
+
+
+def format_event(event):
+    """Formate un événement au format text/event-stream"""
+    return f"id: {event.id}\nevent: {event.topic}\ndata: {event.data}\n\n"
+
+
+# Flux des changements d'inventaire
+@events_api_bp.route('', methods=['GET'])
+def stream_events():
+    """
+    Flux Server-Sent Events des changements : stock modifié, emprunt créé ou retourné,
+    alerte de stock créée ou désactivée, emplacement modifié.
+    Les données de chaque événement sont un objet JSON compact (voir services/event_hub.py).
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Non authentifié'}), 401
+    
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', 0))
+    except ValueError:
+        last_event_id = 0
+    
+    app = current_app._get_current_object()
+    
+    def generate():
+        # S'abonner avant de rejouer les événements manqués pour ne rien perdre entre les deux
+        subscriber, cursor = event_hub.subscribe(app)
+        try:
+            last_sent = last_event_id
+            yield f"retry: {RETRY_DELAY}\n\n"
+            if last_event_id:
+                # Au-delà du curseur, les événements arrivent par la file (dans l'ordre, sans trou)
+                for event in event_hub.events_since(last_event_id, until=cursor):
+                    yield format_event(event)
+                    last_sent = event.id
+            # Ne pas garder de connexion à la base pendant toute la durée du flux
+            db.session.remove()
+            
+            deadline = time.monotonic() + STREAM_DURATION
+            while time.monotonic() < deadline:
+                try:
+                    event = subscriber.get(timeout=HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    break
+                if event.id <= last_sent:
+                    continue
+                yield format_event(event)
+                last_sent = event.id
+        finally:
+            event_hub.unsubscribe(subscriber)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # désactiver la mise en tampon des proxys (nginx)
+        }
+    )
@@ -1,47 +1,162 @@
+import base64
+import json
+from datetime import datetime
 from flask import Blueprint, request, jsonify, session
+from sqlalchemy import insert, tuple_
 from src.models import db
+from src.models.data_version import DataVersion
 from src.models.item import Item
-from src.models.location import Zone, Furniture, Drawer
+from src.models.stock_movement import StockMovement
+from src.models.user import User
+from src.services.autocomplete_index import autocomplete_index
+from src.services.event_hub import publish, STOCK
+from src.services.item_import import (IMPORT_FORMATS, ItemImportError, LocationMap, build_row, existing_items,
+                                      import_items, item_key, record_initial_stock)
+from src.services.location_cache import location_cache
+from src.services.search_service import search_items
+from src.services.item_views import get_item_view, location_rows
 
 # Création du blueprint
 items_api_bp = Blueprint('items_api', __name__, url_prefix='/api/items')
 
+# Pagination de la liste des articles
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Nombre maximal d'articles par requête /batch (un seul INSERT multi-lignes)
+MAX_BATCH_SIZE = 1000
+
+# Champs sélectionnables via le paramètre `fields` (colonnes simples)
+ITEM_FIELDS = {
+    'id': Item.id,
+    'name': Item.name,
+    'stock': Item.stock,
+    'zone_id': Item.zone_id,
+    'furniture_id': Item.furniture_id,
+    'drawer_id': Item.drawer_id,
+    'is_temporary': Item.is_temporary,
+    'location_info': Item.location_path.label('location_info'),
+}
+# Champs dérivés nécessitant une jointure sur les emplacements
+LOCATION_FIELDS = ('zone_name', 'furniture_name', 'drawer_name')
+DEFAULT_ITEM_FIELDS = ('id', 'name', 'zone_id', 'furniture_id', 'drawer_id', 'location_info', 'is_temporary')
+
+
+def encode_cursor(name, item_id):
+    """Encode la position (name, id) du dernier article d'une page"""
+    raw = json.dumps([name, item_id], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Décode un curseur de pagination, lève ValueError s'il est invalide"""
+    try:
+        name, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError('Curseur de pagination invalide')
+    if not isinstance(name, str) or not isinstance(item_id, int):
+        raise ValueError('Curseur de pagination invalide')
+    return name, item_id
+
+
 # Liste des articles
 @items_api_bp.route('', methods=['GET'])
 def get_items():
     """
-    Retourne la liste des articles (filtrable)
+    Retourne la liste des articles (filtrable), paginée par curseur sur (name, id).
+
+    Paramètres :
+    - search : filtre sur le nom
+    - ids : identifiants séparés par des virgules (MAX_PAGE_SIZE au plus)
+    - is_temporary : 'true' ou 'false' pour filtrer par type d'article
+    - limit : taille de page (défaut 100, max 500)
+    - cursor : valeur 'next_cursor' renvoyée par la page précédente
+    - fields : liste de champs séparés par des virgules (ex: id,name,location_info)
+    - include_total : 'true' pour ajouter le nombre total d'articles filtrés
     """
     if 'user_id' not in session:
         return jsonify({'error': 'Non authentifié'}), 401
     
     # Récupérer les paramètres de filtrage
     search = request.args.get('search', '')
+    is_temporary = request.args.get('is_temporary')
+    include_total = request.args.get('include_total', 'false').lower() == 'true'
+    
+    ids_param = request.args.get('ids')
+    if ids_param:
+        try:
+            ids = [int(value) for value in ids_param.split(',') if value.strip()]
+        except ValueError:
+            return jsonify({'error': 'Le paramètre ids doit être une liste d\'entiers'}), 400
+        if len(ids) > MAX_PAGE_SIZE:
+            return jsonify({'error': f'{MAX_PAGE_SIZE} identifiants au plus par requête'}), 400
+    
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'Le paramètre limit doit être un entier'}), 400
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_name, cursor_id = decode_cursor(cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    
+    # Champs demandés (projection)
+    fields_param = request.args.get('fields')
+    if fields_param:
+        fields = [f.strip() for f in fields_param.split(',') if f.strip()]
+        unknown = [f for f in fields if f not in ITEM_FIELDS and f not in LOCATION_FIELDS]
+        if unknown:
+            return jsonify({'error': f"Champ(s) inconnu(s): {', '.join(unknown)}"}), 400
+    else:
+        fields = list(DEFAULT_ITEM_FIELDS)
+    
+    # Le curseur a toujours besoin du nom et de l'id, même s'ils ne sont pas demandés
+    columns = [Item.id, Item.name]
+    columns += [ITEM_FIELDS[f] for f in fields if f in ITEM_FIELDS and f not in ('id', 'name')]
+    needs_location = any(f in LOCATION_FIELDS for f in fields)
     
     # Construire la requête de base
-    query = db.session.query(Item)
+    query = db.session.query(*columns)
+    if needs_location:
+        query = location_rows(query)
     
     # Appliquer les filtres
     if search:
-        query = query.filter(Item.name.ilike(f'%{search}%'))
+        query = search_items(query, search, ranked=False)
+    if ids_param:
+        query = query.filter(Item.id.in_(ids))
+    if is_temporary is not None:
+        query = query.filter(Item.is_temporary == (is_temporary.lower() == 'true'))
+    
+    total = query.order_by(None).count() if include_total else None
+    
+    if cursor:
+        query = query.filter(tuple_(Item.name, Item.id) > tuple_(cursor_name, cursor_id))
     
-    # Récupérer les résultats
-    items = query.order_by(Item.name).all()
+    # Une ligne de plus que la limite pour savoir s'il reste une page
+    rows = query.order_by(Item.name, Item.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
     
     # Formater les résultats
     results = []
-    for item in items:
-        results.append({
-            'id': item.id,
-            'name': item.name,
-            'zone_id': item.zone_id,
-            'furniture_id': item.furniture_id,
-            'drawer_id': item.drawer_id,
-            'location_info': item.location_info,
-            'is_temporary': item.is_temporary
-        })
-    
-    return jsonify(results)
+    for row in rows:
+        data = row._asdict()
+        results.append({field: data[field] for field in fields})
+    
+    response = {
+        'items': results,
+        'next_cursor': encode_cursor(rows[-1].name, rows[-1].id) if has_more else None,
+        'has_more': has_more
+    }
+    if include_total:
+        response['total'] = total
+    
+    return jsonify(response)
 
 # Détails d'un article
 @items_api_bp.route('/<int:item_id>', methods=['GET'])
@@ -52,78 +167,211 @@ def get_item(item_id):
     if 'user_id' not in session:
         return jsonify({'error': 'Non authentifié'}), 401
     
-    item = db.session.get(Item, item_id)
-    if not item:
+    view = get_item_view(item_id)
+    if not view:
         return jsonify({'error': 'Article non trouvé'}), 404
     
+    item = view.item
     result = {
         'id': item.id,
         'name': item.name,
         'zone_id': item.zone_id,
         'furniture_id': item.furniture_id,
         'drawer_id': item.drawer_id,
-        'location_info': item.location_info,
-        'is_temporary': item.is_temporary
+        'location_info': view.location_info,
+        'is_temporary': item.is_temporary,
+        'stock': item.stock,
+        'is_borrowed': view.is_borrowed
     }
 
     # Ajouter les noms de zone/mobilier/tiroir pour la cohérence avec l'API d'ajout
     # et pour faciliter l'affichage côté client.
-    if item.zone_rel:
-        result['zone_name'] = item.zone_rel.name
-    if item.furniture_rel:
-        result['furniture_name'] = item.furniture_rel.name
-    if item.drawer_rel:
-        result['drawer_name'] = item.drawer_rel.name
+    if view.zone_name:
+        result['zone_name'] = view.zone_name
+    if view.furniture_name:
+        result['furniture_name'] = view.furniture_name
+    if view.drawer_name:
+        result['drawer_name'] = view.drawer_name
             
     return jsonify({'item': result}) # Renvoyer l'objet sous la clé 'item'
 
+# Stock d'un article à une date passée
+@items_api_bp.route('/<int:item_id>/stock-at', methods=['GET'])
+def get_item_stock_at(item_id):
+    """
+    Retourne le stock d'un article à une date (paramètre `at`, ISO 8601, UTC),
+    reconstitué à partir du journal des mouvements de stock
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Non authentifié'}), 401
+    
+    try:
+        at = datetime.fromisoformat(request.args['at']) if request.args.get('at') else datetime.utcnow()
+    except ValueError:
+        return jsonify({'error': 'Date invalide (format ISO attendu)'}), 400
+    
+    return jsonify({
+        'item_id': item_id,
+        'at': at.isoformat(),
+        'stock': StockMovement.stock_at(item_id, at)
+    })
+
+# Import en masse (CSV ou NDJSON)
+@items_api_bp.route('/import', methods=['POST'])
+def import_items_file():
+    """
+    Importe des articles depuis un fichier CSV ou NDJSON lu en flux (voir services/item_import.py).
+
+    Le fichier est le corps de la requête (Content-Type text/csv ou application/x-ndjson) ou le
+    champ `file` d'un formulaire multipart.
+
+    Paramètres :
+    - format : 'csv' ou 'ndjson' (déduit du Content-Type ou de l'extension du fichier sinon)
+    - dry_run : 'true' pour valider le fichier sans rien enregistrer
+
+    Réponse : nombre de lignes lues et importées, erreurs par numéro de ligne.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Non authentifié'}), 401
+    
+    current_user = db.session.get(User, session['user_id'])
+    if not current_user or not current_user.is_admin:
+        return jsonify({'error': 'Droits administrateur requis'}), 403
+    
+    upload = request.files.get('file')
+    if upload:
+        stream, file_name, content_type = upload.stream, upload.filename or '', upload.mimetype
+    else:
+        stream, file_name, content_type = request.stream, '', request.mimetype
+    
+    file_format = request.args.get('format')
+    if not file_format:
+        if 'ndjson' in content_type or 'jsonl' in content_type or file_name.endswith(('.ndjson', '.jsonl')):
+            file_format = 'ndjson'
+        elif 'csv' in content_type or file_name.endswith('.csv'):
+            file_format = 'csv'
+    if file_format not in IMPORT_FORMATS:
+        return jsonify({'error': "Format d'import requis: csv ou ndjson (paramètre format)"}), 400
+    
+    dry_run = request.args.get('dry_run', 'false').lower() == 'true'
+    try:
+        report = import_items(stream, file_format, dry_run=dry_run, user_id=current_user.id)
+    except ItemImportError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify(dict(report.to_dict(), success=report.error_count == 0))
+
 # Ajout d'articles en batch
 @items_api_bp.route('/batch', methods=['POST'])
 def add_items_batch():
     """
-    Endpoint pour ajouter plusieurs articles à l'inventaire en une seule requête
+    Endpoint pour ajouter plusieurs articles permanents à l'inventaire en une seule requête
+    (articles dictés par la saisie vocale).
+
+    Traitement ensembliste, indépendant du nombre d'articles :
+    - emplacements vérifiés avec le cache des emplacements (existence et hiérarchie) ;
+    - doublons (même nom au même emplacement, comme /add) cherchés en une requête sur les noms
+      du lot, et entre articles du lot ;
+    - un INSERT multi-lignes pour les articles valides.
+
+    Réponse : statut de chaque article dans l'ordre du lot ('created', 'duplicate' ou 'invalid').
     """
-    data = request.json
+    if 'user_id' not in session:
+        return jsonify({'error': 'Non authentifié'}), 401
+    
+    data = request.get_json(silent=True)
     
     if not data or 'items' not in data or not isinstance(data['items'], list):
         return jsonify({'error': 'Données invalides'}), 400
     
     items = data['items']
-    added_count = 0
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Au plus {MAX_BATCH_SIZE} articles par lot'}), 400
+    
+    locations = LocationMap()
+    created_at = datetime.utcnow()
+    results = []
+    candidates = {}  # (nom, zone, meuble, tiroir) -> (index dans results, valeurs)
+    
+    for index, item_data in enumerate(items):
+        result = {'index': index, 'name': item_data.get('name') if isinstance(item_data, dict) else None}
+        results.append(result)
+        try:
+            if not isinstance(item_data, dict):
+                raise ValueError('Article invalide')
+            # Articles ajoutés par batch : toujours permanents, emplacement donné par identifiants
+            values = build_row({
+                'name': item_data.get('name'),
+                'stock': item_data.get('stock'),
+                'zone_id': item_data.get('zone_id'),
+                'furniture_id': item_data.get('furniture_id'),
+                'drawer_id': item_data.get('drawer_id'),
+            }, locations, created_at)
+        except ValueError as e:
+            result.update(status='invalid', error=str(e))
+            continue
+        
+        result['name'] = values['name']
+        key = item_key(values)
+        if key in candidates:
+            result.update(status='duplicate', error='Article présent plusieurs fois dans le lot',
+                          duplicate_of=candidates[key][0])
+            continue
+        candidates[key] = (index, values)
     
     try:
-        for item_data in items:
-            # Vérifier que toutes les informations requises sont présentes
-            if not all(key in item_data for key in ['name', 'zone_id', 'furniture_id', 'drawer_id']):
-                continue
-            
-            # Créer un nouvel article
-            new_item = Item(
-                name=item_data['name'],
-                is_temporary=False,  # Articles ajoutés par batch sont toujours permanents
-                zone_id=item_data['zone_id'],
-                furniture_id=item_data['furniture_id'],
-                drawer_id=item_data['drawer_id'],
-                # Champs texte pour la compatibilité
-                zone=item_data.get('zone_name', ''),
-                mobilier=item_data.get('furniture_name', ''),
-                niveau_tiroir=item_data.get('drawer_name', '')
+        # Doublons avec les articles existants : une requête sur les noms du lot
+        for key, item_id in existing_items(candidates).items():
+            index, _ = candidates.pop(key)
+            results[index].update(
+                status='duplicate', id=item_id,
+                error=f"Un article nommé '{key[0]}' existe déjà à cet emplacement."
             )
-            
-            db.session.add(new_item)
-            added_count += 1
         
+        if candidates:
+            # executemany de SQLAlchemy : un INSERT ... VALUES (...), (...) ... RETURNING par lot de
+            # 1000 lignes, compilé une fois et mis en cache (insert().values([...]) serait recompilé
+            # à chaque requête, pour chaque taille de lot)
+            created = db.session.execute(
+                insert(Item.__table__)
+                .returning(Item.id, Item.name, Item.zone_id, Item.furniture_id, Item.drawer_id),
+                [values for _, values in candidates.values()]
+            ).all()
+            record_initial_stock([row.id for row in created], session['user_id'], created_at)
+            for row in created:
+                index, _ = candidates[(row.name, row.zone_id, row.furniture_id, row.drawer_id)]
+                results[index].update(status='created', id=row.id)
+            # Un événement pour le lot, comme un bloc de l'import (pas un message par article)
+            publish(STOCK, action='imported', item_ids=[row.id for row in created])
+            DataVersion.touch(DataVersion.INVENTORY)
+            DataVersion.touch(DataVersion.ITEM_NAMES)
         db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': f'{added_count} article(s) ajouté(s) avec succès',
-            'added_count': added_count
-        })
-    
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
+    
+    if candidates:
+        autocomplete_index.notify_changes([result['id'] for result in results if result['status'] == 'created'], ())
+    
+    # Doublons internes au lot : identifiant de l'article retenu
+    for result in results:
+        if 'duplicate_of' in result:
+            result['id'] = results[result.pop('duplicate_of')].get('id')
+    
+    counts = {status: sum(1 for result in results if result['status'] == status)
+              for status in ('created', 'duplicate', 'invalid')}
+    return jsonify({
+        'success': True,
+        'message': f"{counts['created']} article(s) ajouté(s) avec succès",
+        'added_count': counts['created'],
+        'duplicate_count': counts['duplicate'],
+        'invalid_count': counts['invalid'],
+        'items': results
+    })
 
 # Route principale pour ajouter des articles
 @items_api_bp.route('/add', methods=['POST'])
@@ -201,18 +449,10 @@ def add_item():
                     }
                 }), 409 # HTTP 409 Conflict
 
-            # Vérifier que les entités de localisation existent
-            zone_obj = db.session.get(Zone, zone_id)
-            if not zone_obj:
-                return jsonify({'error': f'La zone avec l\'ID {zone_id} n\'existe pas'}), 400
-            
-            furniture_obj = db.session.get(Furniture, furniture_id)
-            if not furniture_obj:
-                return jsonify({'error': f'Le meuble avec l\'ID {furniture_id} n\'existe pas'}), 400
-            
-            drawer_obj = db.session.get(Drawer, drawer_id)
-            if not drawer_obj:
-                return jsonify({'error': f'Le tiroir avec l\'ID {drawer_id} n\'existe pas'}), 400
+            # Vérifier que les entités de localisation existent (cache des emplacements)
+            location_error = location_cache.validate(zone_id, furniture_id, drawer_id)
+            if location_error:
+                return jsonify({'error': location_error}), 400
             
             # Créer l'article permanent avec le modèle unifié
             new_item = Item(
@@ -220,11 +460,7 @@ def add_item():
                 is_temporary=False,
                 zone_id=zone_id,
                 furniture_id=furniture_id,
-                drawer_id=drawer_id,
-                # Champs texte pour la compatibilité
-                zone=zone_obj.name,
-                mobilier=furniture_obj.name,
-                niveau_tiroir=drawer_obj.name
+                drawer_id=drawer_id
             )
             
             db.session.add(new_item)
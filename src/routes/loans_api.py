@@ -1,18 +1,38 @@
 from flask import Blueprint, request, jsonify, session
+from sqlalchemy import case, insert, update
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.exc import StaleDataError
 from src.models import db
 from src.models.borrow import Borrow
+from src.models.data_version import DataVersion
 from src.models.item import Item
+from src.models.notification import Notification
+from src.models.stock_movement import StockMovement
 from src.models.user import User
+from src.services.event_hub import publish, STOCK, LOAN, ALERT
 from datetime import datetime
 
 # Création du blueprint
 loans_api_bp = Blueprint('loans_api', __name__, url_prefix='/api/loans')
 
+# Pagination de la liste des emprunts
+LOANS_PER_PAGE = 50
+MAX_LOANS_PER_PAGE = 200
+
+# Tris disponibles pour la liste des emprunts (l'id départage les égalités)
+LOANS_SORTS = {
+    'borrow_date': (Borrow.borrow_date.desc(), Borrow.id.desc()),
+    'due_date': (Borrow.expected_return_date.asc(), Borrow.id.asc()),
+}
+
 # Créer un emprunt (ancienne version - conservée pour compatibilité)
 @loans_api_bp.route('/create', methods=['POST'])
 def create_loan():
     """
     API pour créer un nouvel emprunt (ancienne version)
+    Le nombre de requêtes est constant quel que soit le nombre d'articles : une requête IN
+    pour les articles, une pour les emprunts en cours, un INSERT groupé des emprunts (executemany),
+    une lecture de leurs identifiants et un UPDATE des compteurs d'emprunts des articles.
     """
     if 'user_id' not in session:
         return jsonify({'error': 'Non authentifié'}), 401
@@ -49,20 +69,36 @@ def create_loan():
     }
     
     try:
+        # Articles demandés et emprunts en cours : deux requêtes IN pour tout le lot
+        requested_ids = []
         for item_data in items:
-            item_id = item_data.get('id')
-            
+            try:
+                requested_ids.append(int(item_data.get('id')))
+            except (TypeError, ValueError):
+                continue  # Ignorer les identifiants invalides
+        
+        items_by_id = {}
+        active_borrows = {}
+        if requested_ids:
+            items_by_id = {item.id: item for item in Item.query.filter(Item.id.in_(set(requested_ids)))}
+            for borrow in Borrow.query.options(joinedload(Borrow.user)).filter(
+                    Borrow.item_id.in_(items_by_id), Borrow.return_date == None).order_by(Borrow.id):
+                active_borrows.setdefault(borrow.item_id, {
+                    'user_id': borrow.user_id,
+                    'user_name': borrow.user.name,
+                    'borrow_date': borrow.borrow_date.isoformat()
+                })
+        
+        borrow_date = datetime.now()
+        new_borrows = {}
+        for item_id in requested_ids:
             # Vérifier que l'article existe
-            item = db.session.get(Item, item_id)
+            item = items_by_id.get(item_id)
             if not item:
                 continue  # Ignorer les articles inexistants
             
-            # Vérifier que l'article n'est pas déjà emprunté
-            existing_borrow = db.session.query(Borrow).filter(
-                Borrow.item_id == item_id,
-                Borrow.return_date == None
-            ).first()
-            
+            # Vérifier que l'article n'est pas déjà emprunté (y compris plus haut dans ce lot)
+            existing_borrow = active_borrows.get(item_id)
             if existing_borrow:
                 # Ajouter à la liste des articles déjà empruntés
                 results['loans'].append({
@@ -70,40 +106,58 @@ def create_loan():
                     'error': 'Déjà emprunté',
                     'item_id': item_id,
                     'item_name': item.name,
-                    'borrowed_by': {
-                        'user_id': existing_borrow.user_id,
-                        'user_name': existing_borrow.user.name,
-                        'borrow_date': existing_borrow.borrow_date.isoformat()
-                    }
+                    'borrowed_by': existing_borrow
                 })
                 continue
             
-            # Créer le nouvel emprunt
-            new_borrow = Borrow(
-                user_id=user_id,
-                item_id=item_id,
-                quantity=1,  # Ancienne version = toujours 1
-                borrow_date=datetime.now(),
-                expected_return_date=expected_return_date
-            )
-            
-            db.session.add(new_borrow)
-            db.session.flush()  # Pour obtenir l'ID sans commit immédiat
+            # Préparer le nouvel emprunt (inséré avec ceux du lot après la boucle)
+            new_borrows[item_id] = {
+                'user_id': user_id,
+                'item_id': item_id,
+                'quantity': 1,  # Ancienne version = toujours 1
+                'borrow_date': borrow_date,
+                'expected_return_date': expected_return_date,
+                'returned': False
+            }
+            active_borrows[item_id] = {
+                'user_id': user_id,
+                'user_name': user.name,
+                'borrow_date': borrow_date.isoformat()
+            }
             
-            # Ajouter à la liste des emprunts réussis
+            # Ajouter à la liste des emprunts réussis (identifiant renseigné après l'insertion)
             results['loans'].append({
                 'status': 'success',
-                'id': new_borrow.id,
-                'user_id': new_borrow.user_id,
+                'id': None,
+                'user_id': user_id,
                 'user_name': user.name,
-                'item_id': new_borrow.item_id,
+                'item_id': item_id,
                 'item_name': item.name,
-                'borrow_date': new_borrow.borrow_date.isoformat(),
+                'borrow_date': borrow_date.isoformat(),
                 'expected_return_date': expected_return_date.strftime('%d/%m/%Y')
             })
         
         # Commit des changements si au moins un emprunt a réussi
-        if any(loan.get('status') == 'success' for loan in results['loans']):
+        if new_borrows:
+            # INSERT groupé (executemany, sans objets ORM) ; RETURNING fournit les identifiants
+            borrow_ids = {row.item_id: row.id for row in db.session.execute(
+                insert(Borrow).returning(Borrow.id, Borrow.item_id), list(new_borrows.values())
+            )}
+            db.session.execute(
+                update(Item)
+                .where(Item.id.in_(new_borrows))
+                .values(
+                    active_loan_count=Item.active_loan_count + 1,
+                    borrowed_quantity=Item.borrowed_quantity + 1
+                )
+                .execution_options(synchronize_session=False)
+            )
+            DataVersion.touch(DataVersion.INVENTORY)
+            for loan in results['loans']:
+                if loan['status'] == 'success':
+                    loan['id'] = borrow_ids.get(loan['item_id'])
+                    publish(LOAN, action='created', loan_id=loan['id'], item_id=loan['item_id'],
+                            user_id=user_id, quantity=1)
             db.session.commit()
         else:
             db.session.rollback()
@@ -145,9 +199,6 @@ def create_loan_with_quantities():
     if not user:
         return jsonify({'error': 'Utilisateur non trouvé'}), 404
     
-    # Import local pour éviter problème d'import circulaire
-    from src.models.notification import Notification
-
     # Résultats de l'opération
     results = {
         'success': True,
@@ -156,12 +207,33 @@ def create_loan_with_quantities():
     }
     
     try:
+        # Charger tous les articles demandés en une seule requête
+        requested_ids = set()
+        for item_data in items:
+            if not item_data.get('isTemporary', False):
+                try:
+                    requested_ids.add(int(item_data.get('id')))
+                except (TypeError, ValueError):
+                    pass
+        items_by_id = {}
+        if requested_ids:
+            items_by_id = {item.id: item for item in Item.query.filter(Item.id.in_(requested_ids))}
+        reserved_ids = set()
+        
         for item_data in items:
             item_id = item_data.get('id')
             quantity = int(item_data.get('quantity', 1))
             is_temporary = item_data.get('isTemporary', False)
             item_name = item_data.get('name', '')
             
+            if quantity < 1:
+                results['loans'].append({
+                    'status': 'error',
+                    'error': f'Quantité invalide ({quantity})',
+                    'item_name': item_name
+                })
+                continue
+            
             if is_temporary:
                 # Créer un article temporaire
                 new_temp_item = Item(
@@ -174,7 +246,10 @@ def create_loan_with_quantities():
                 item = new_temp_item
             else:
                 # Vérifier que l'article existe
-                item = db.session.get(Item, item_id)
+                try:
+                    item = items_by_id.get(int(item_id))
+                except (TypeError, ValueError):
+                    item = None
                 if not item:
                     results['loans'].append({
                         'status': 'error',
@@ -183,8 +258,8 @@ def create_loan_with_quantities():
                     })
                     continue
                 
-                # Vérifier que le stock est suffisant
-                if item.stock < quantity:
+                # Réserver le stock (UPDATE conditionnel atomique)
+                if not item.reserve_stock(quantity):
                     results['loans'].append({
                         'status': 'error',
                         'error': f'Stock insuffisant (disponible: {item.stock}, demandé: {quantity})',
@@ -202,20 +277,12 @@ def create_loan_with_quantities():
             )
             
             db.session.add(new_borrow)
+            item.register_loan(quantity)
             
-            # Décrémenter le stock
+            # Le stock a déjà été décrémenté par reserve_stock ; alertes créées après la boucle
             if not is_temporary:
-                item.decrease_stock(quantity)
-                
-                # Créer des notifications si nécessaire
-                if item.stock == 0:
-                    notification = Notification.create_stock_alert(item)
-                    if notification:
-                        results['notifications'].append(f"Stock épuisé pour '{item.name}'")
-                elif item.stock <= 2:
-                    notification = Notification.create_low_stock_alert(item)
-                    if notification:
-                        results['notifications'].append(f"Stock faible pour '{item.name}' (reste {item.stock})")
+                StockMovement.record(item, -quantity, StockMovement.LOAN, user_id=user_id, borrow=new_borrow)
+                reserved_ids.add(item.id)
             
             # Ajouter à la liste des emprunts réussis
             results['loans'].append({
@@ -229,6 +296,14 @@ def create_loan_with_quantities():
         # Commit des changements si au moins un emprunt a réussi
         successful_loans = [loan for loan in results['loans'] if loan.get('status') == 'success']
         if successful_loans:
+            # Alertes de stock épuisé / faible de tout le lot en une requête (sans doublon)
+            for alert in Notification.create_stock_alerts(reserved_ids):
+                publish(ALERT, action='created', item_id=alert.item_id, type=alert.type)
+                item = items_by_id[alert.item_id]
+                if alert.type == 'danger':
+                    results['notifications'].append(f"Stock épuisé pour '{item.name}'")
+                else:
+                    results['notifications'].append(f"Stock faible pour '{item.name}' (reste {item.stock})")
             db.session.commit()
             results['message'] = f"{len(successful_loans)} emprunt(s) créé(s) avec succès"
         else:
@@ -238,6 +313,8 @@ def create_loan_with_quantities():
         
         return jsonify(results)
         
+    except StaleDataError:
+        raise  # 409 (gestionnaire d'erreurs de l'application)
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -267,8 +344,8 @@ def return_loan(loan_id):
         if success:
             # Supprimer les alertes de stock si le stock est rechargé
             if borrow.item and borrow.item.stock > 0:
-                from src.models.notification import Notification
-                Notification.dismiss_stock_alerts(borrow.item)
+                for alert in Notification.dismiss_stock_alerts(borrow.item):
+                    publish(ALERT, action='dismissed', item_id=alert.item_id, type=alert.type)
             
             db.session.commit()
             
@@ -288,6 +365,112 @@ def return_loan(loan_id):
         else:
             return jsonify({'error': 'L\'article était déjà retourné'}), 400
             
+    except StaleDataError:
+        raise  # 409 (gestionnaire d'erreurs de l'application)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+# Retourner plusieurs emprunts en une fois
+@loans_api_bp.route('/return-batch', methods=['POST'])
+def return_loans_batch():
+    """
+    API pour retourner plusieurs emprunts dans une seule transaction.
+    Le nombre de requêtes est constant quel que soit le nombre d'emprunts
+    (plus l'écriture groupée des événements diffusés sur /api/events) :
+    - un UPDATE marquant les emprunts comme retournés (seuls ceux encore en cours)
+    - un UPDATE remettant en stock chaque article (quantités agrégées par article)
+    - un INSERT des mouvements de stock (un par emprunt)
+    - un UPDATE désactivant les alertes de stock des articles de nouveau disponibles
+    
+    Corps JSON : {"loan_ids": [1, 2, 3]}
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Non authentifié'}), 401
+    
+    data = request.json or {}
+    try:
+        loan_ids = {int(loan_id) for loan_id in data.get('loan_ids', [])}
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Les identifiants d\'emprunt doivent être des entiers'}), 400
+    
+    if not loan_ids:
+        return jsonify({'error': 'Aucun emprunt à retourner'}), 400
+    
+    try:
+        # Marquer les emprunts comme retournés ; la condition return_date IS NULL rend
+        # l'opération sûre face à un retour concurrent du même emprunt
+        returned_rows = db.session.execute(
+            update(Borrow)
+            .where(Borrow.id.in_(loan_ids), Borrow.return_date == None)
+            .values(returned=True, return_date=datetime.utcnow())
+            .returning(Borrow.id, Borrow.item_id, Borrow.user_id, Borrow.quantity)
+            .execution_options(synchronize_session=False)
+        ).all()
+        
+        # Agréger les quantités et le nombre d'emprunts par article
+        quantities = {}
+        loan_counts = {}
+        for row in returned_rows:
+            quantities[row.item_id] = quantities.get(row.item_id, 0) + row.quantity
+            loan_counts[row.item_id] = loan_counts.get(row.item_id, 0) + 1
+            publish(LOAN, action='returned', loan_id=row.id, item_id=row.item_id,
+                    user_id=row.user_id, quantity=row.quantity)
+        
+        if quantities:
+            restocked_items = db.session.execute(
+                update(Item)
+                .where(Item.id.in_(quantities))
+                .values(
+                    stock=Item.stock + case(quantities, value=Item.id, else_=0),
+                    version_id=Item.version_id + 1,
+                    borrowed_quantity=Item.borrowed_quantity - case(quantities, value=Item.id, else_=0),
+                    active_loan_count=Item.active_loan_count - case(loan_counts, value=Item.id, else_=0)
+                )
+                .returning(Item.id, Item.stock, Item.zone_id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            
+            # Journal des mouvements : stock reconstitué emprunt par emprunt à partir du stock final
+            items_after = {row.id: row for row in restocked_items}
+            running_stock = {item_id: row.stock - quantities[item_id] for item_id, row in items_after.items()}
+            movements = []
+            for row in returned_rows:
+                running_stock[row.item_id] += row.quantity
+                movements.append({
+                    'item_id': row.item_id,
+                    'zone_id': items_after[row.item_id].zone_id,
+                    'delta': row.quantity,
+                    'stock_after': running_stock[row.item_id],
+                    'reason': StockMovement.RETURN,
+                    'user_id': row.user_id,
+                    'borrow_id': row.id
+                })
+            StockMovement.record_many(movements)
+            DataVersion.touch(DataVersion.INVENTORY)
+            
+            for row in restocked_items:
+                publish(STOCK, item_id=row.id, stock=row.stock)
+            
+            # Désactiver les alertes de stock des articles de nouveau en stock
+            for alert in Notification.dismiss_restocked_alerts(quantities):
+                publish(ALERT, action='dismissed', item_id=alert.item_id, type=alert.type)
+        
+        db.session.commit()
+        
+        returned_ids = [row.id for row in returned_rows]
+        not_returned = sorted(loan_ids - set(returned_ids))
+        return jsonify({
+            'success': bool(returned_ids),
+            'returned': returned_ids,
+            'returned_count': len(returned_ids),
+            'errors': [{
+                'id': loan_id,
+                'error': 'Emprunt non trouvé ou déjà retourné'
+            } for loan_id in not_returned]
+        })
+    except StaleDataError:
+        raise  # 409 (gestionnaire d'erreurs de l'application)
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -296,7 +479,16 @@ def return_loan(loan_id):
 @loans_api_bp.route('', methods=['GET'])
 def get_loans():
     """
-    API pour récupérer la liste des emprunts
+    API pour récupérer la liste des emprunts, paginée.
+    Les filtres et le tri sont appliqués en SQL (index sur return_date, expected_return_date).
+
+    Paramètres :
+    - user_id : emprunts d'un utilisateur (par défaut l'utilisateur connecté)
+    - active_only : 'true' pour les emprunts en cours uniquement
+    - overdue_only : 'true' pour les emprunts en cours dont la date de retour est dépassée
+    - due_before : date ISO, emprunts en cours à rendre avant cette date
+    - sort : 'borrow_date' (défaut, plus récents d'abord) ou 'due_date' (échéance la plus proche d'abord)
+    - page, per_page : pagination (défaut 1 et 50, per_page max 200)
     """
     if 'user_id' not in session:
         return jsonify({'error': 'Non authentifié'}), 401
@@ -304,24 +496,54 @@ def get_loans():
     # Récupérer les paramètres de filtrage
     user_id = request.args.get('user_id') or session['user_id']  # Utiliser l'ID de l'utilisateur connecté par défaut
     active_only = request.args.get('active_only', 'false').lower() == 'true'
+    overdue_only = request.args.get('overdue_only', 'false').lower() == 'true'
+    due_before_str = request.args.get('due_before')
+    sort = request.args.get('sort', 'borrow_date')
+    
+    if sort not in LOANS_SORTS:
+        return jsonify({'error': f"Tri inconnu: {sort}"}), 400
+    
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = max(1, min(int(request.args.get('per_page', LOANS_PER_PAGE)), MAX_LOANS_PER_PAGE))
+    except ValueError:
+        return jsonify({'error': 'Les paramètres page et per_page doivent être des entiers'}), 400
+    
+    due_before = None
+    if due_before_str:
+        try:
+            due_before = datetime.fromisoformat(due_before_str)
+        except ValueError:
+            return jsonify({'error': f'Format de date invalide: {due_before_str}'}), 400
     
-    # Construire la requête de base
-    query = db.session.query(Borrow)
+    # Construire la requête de base (article et utilisateur chargés par jointure)
+    query = db.session.query(Borrow).options(joinedload(Borrow.item), joinedload(Borrow.user))
     
     # Appliquer les filtres
     if user_id:
         query = query.filter(Borrow.user_id == user_id)
     
-    if active_only:
+    now = datetime.utcnow()
+    if overdue_only:
+        query = query.filter(Borrow.overdue_clause(now))
+    elif active_only or due_before:
         query = query.filter(Borrow.return_date == None)
+    if due_before:
+        query = query.filter(Borrow.expected_return_date < due_before)
     
-    # Récupérer les résultats
-    borrows = query.order_by(Borrow.borrow_date.desc()).all()
+    # Une ligne de plus que la taille de page pour savoir s'il reste une page
+    borrows = query.order_by(*LOANS_SORTS[sort]) \
+        .offset((page - 1) * per_page) \
+        .limit(per_page + 1) \
+        .all()
+    has_more = len(borrows) > per_page
+    borrows = borrows[:per_page]
     
     # Formater les résultats
     results = []
     for borrow in borrows:
         item = borrow.item
+        is_active = borrow.return_date is None
         
         # Construire le résultat avec toutes les informations attendues par le frontend
         loan_data = {
@@ -335,8 +557,8 @@ def get_loans():
             'expected_return_date': borrow.expected_return_date.isoformat() if borrow.expected_return_date else None,
             'return_date': borrow.return_date.isoformat() if borrow.return_date else None,
             'is_temporary': item.is_temporary,
-            'is_overdue': borrow.is_overdue,  # NOUVEAU: En retard
-            'days_until_return': borrow.days_until_return  # NOUVEAU: Jours restants
+            'is_overdue': is_active and borrow.expected_return_date < now,  # NOUVEAU: En retard
+            'days_until_return': (borrow.expected_return_date - now).days if is_active else 0  # NOUVEAU: Jours restants
         }
         
         # Ajouter les informations de localisation pour les articles conventionnels
@@ -345,9 +567,14 @@ def get_loans():
                 'item_zone': item.zone,
                 'item_mobilier': item.mobilier,
                 'item_niveau_tiroir': item.niveau_tiroir,
-                'item_location_info': item.location_info
+                'item_location_info': item.location_path
             })
         
         results.append(loan_data)
     
-    return jsonify(results)
+    return jsonify({
+        'loans': results,
+        'page': page,
+        'per_page': per_page,
+        'has_more': has_more
+    })
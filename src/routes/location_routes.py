@@ -1,13 +1,85 @@
-from flask import Blueprint, request, jsonify, render_template
+from functools import wraps
+from flask import Blueprint, request, jsonify, render_template, session
 from src.models import db
+from src.models.user import User
 from src.models.location import Zone, Furniture, Drawer
 from src.models.item import Item
+from src.models.data_version import DataVersion
 from sqlalchemy.exc import IntegrityError
 
 location_bp = Blueprint('location', __name__, url_prefix='/api/location')
 
 # Ce blueprint ne contient plus que des APIs pour les emplacements
 
+def admin_api_required(f):
+    """Réserve une API aux administrateurs (réponses JSON 401/403, comme admin_routes)"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({'error': 'Non authentifié'}), 401
+        
+        current_user = db.session.get(User, session['user_id'])
+        if not current_user or not current_user.is_admin:
+            return jsonify({'error': 'Droits administrateur requis'}), 403
+        
+        return f(*args, **kwargs)
+    return decorated_function
+
+# Arborescence complète des emplacements
+@location_bp.route('/tree', methods=['GET'])
+def api_location_tree():
+    """
+    Retourne toute la hiérarchie zone > meuble > tiroir en un seul appel.
+    L'ETag dépend de la version des emplacements : le client reçoit un 304 tant que
+    rien n'a été créé, modifié ou supprimé.
+    """
+    version = DataVersion.get(DataVersion.LOCATIONS)
+    etag = f'locations-{version}'
+    if request.if_none_match.contains(etag):
+        response = jsonify()
+        response.status_code = 304
+        response.set_etag(etag)
+        return response
+    
+    # Trois requêtes à plat, assemblées en mémoire
+    zones = [{
+        'id': zone.id,
+        'name': zone.name,
+        'description': zone.description,
+        'furniture': []
+    } for zone in db.session.query(Zone.id, Zone.name, Zone.description).order_by(Zone.name, Zone.id)]
+    zones_by_id = {zone['id']: zone for zone in zones}
+    
+    furniture_by_id = {}
+    for furniture in db.session.query(Furniture.id, Furniture.name, Furniture.description, Furniture.zone_id) \
+            .order_by(Furniture.name, Furniture.id):
+        node = {
+            'id': furniture.id,
+            'name': furniture.name,
+            'description': furniture.description,
+            'zone_id': furniture.zone_id,
+            'drawers': []
+        }
+        furniture_by_id[furniture.id] = node
+        if furniture.zone_id in zones_by_id:
+            zones_by_id[furniture.zone_id]['furniture'].append(node)
+    
+    for drawer in db.session.query(Drawer.id, Drawer.name, Drawer.description, Drawer.furniture_id) \
+            .order_by(Drawer.name, Drawer.id):
+        if drawer.furniture_id in furniture_by_id:
+            furniture_by_id[drawer.furniture_id]['drawers'].append({
+                'id': drawer.id,
+                'name': drawer.name,
+                'description': drawer.description,
+                'furniture_id': drawer.furniture_id
+            })
+    
+    response = jsonify({'version': version, 'zones': zones})
+    response.set_etag(etag)
+    # Toujours revalider : le navigateur renvoie If-None-Match et obtient un 304 si rien n'a changé
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 # API pour les zones
 @location_bp.route('/zones', methods=['GET', 'POST'])
 def api_zones():
@@ -47,6 +119,38 @@ def api_zones():
             db.session.rollback()
             return jsonify({'error': str(e)}), 500
 
+@location_bp.route('/zones/<int:zone_id>', methods=['PUT'])
+@admin_api_required
+def api_update_zone(zone_id):
+    zone = db.session.get(Zone, zone_id)
+    if not zone:
+        return jsonify({'error': 'Zone non trouvée'}), 404
+    
+    data = request.json or {}
+    name = data.get('name', zone.name)
+    if not name:
+        return jsonify({'error': 'Le nom de la zone est requis'}), 400
+    
+    # Vérifier qu'aucune autre zone ne porte déjà ce nom
+    existing_zone = Zone.query.filter(Zone.name == name, Zone.id != zone_id).first()
+    if existing_zone:
+        return jsonify({'error': 'Une zone avec ce nom existe déjà'}), 400
+    
+    # Le chemin d'emplacement des articles est mis à jour en une requête (voir models/item.py)
+    zone.name = name
+    zone.description = data.get('description', zone.description)
+    
+    try:
+        db.session.commit()
+        return jsonify({
+            'id': zone.id,
+            'name': zone.name,
+            'description': zone.description
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @location_bp.route('/zones/<int:zone_id>', methods=['DELETE'])
 def api_delete_zone(zone_id):
     # Vérifier si des articles utilisent cette zone
@@ -82,20 +186,20 @@ def api_furniture():
     if request.method == 'GET':
         zone_id = request.args.get('zone_id')
         
+        # Nom de la zone récupéré par jointure (une seule requête)
+        query = db.session.query(Furniture, Zone.name.label('zone_name')) \
+            .outerjoin(Zone, Furniture.zone_id == Zone.id)
         if zone_id:
-            furniture_list = Furniture.query.filter_by(zone_id=zone_id).all()
-        else:
-            furniture_list = Furniture.query.all()
+            query = query.filter(Furniture.zone_id == zone_id)
         
         result = []
-        for furniture in furniture_list:
-            zone = db.session.get(Zone, furniture.zone_id)
+        for furniture, zone_name in query.all():
             result.append({
                 'id': furniture.id,
                 'name': furniture.name,
                 'description': furniture.description,
                 'zone_id': furniture.zone_id,
-                'zone_name': zone.name if zone else 'Inconnue'
+                'zone_name': zone_name or 'Inconnue'
             })
         
         return jsonify(result)
@@ -139,6 +243,52 @@ def api_furniture():
             db.session.rollback()
             return jsonify({'error': str(e)}), 500
 
+@location_bp.route('/furniture/<int:furniture_id>', methods=['PUT'])
+@admin_api_required
+def api_update_furniture(furniture_id):
+    furniture = db.session.get(Furniture, furniture_id)
+    if not furniture:
+        return jsonify({'error': 'Meuble non trouvé'}), 404
+    
+    data = request.json or {}
+    name = data.get('name', furniture.name)
+    zone_id = data.get('zone_id', furniture.zone_id)
+    
+    if not name:
+        return jsonify({'error': 'Le nom du meuble est requis'}), 400
+    
+    # Vérifier si la zone existe
+    zone = db.session.get(Zone, zone_id)
+    if not zone:
+        return jsonify({'error': 'Zone non trouvée'}), 404
+    
+    # Vérifier qu'aucun autre meuble de la zone ne porte déjà ce nom
+    existing_furniture = Furniture.query.filter(
+        Furniture.name == name,
+        Furniture.zone_id == zone.id,
+        Furniture.id != furniture_id
+    ).first()
+    if existing_furniture:
+        return jsonify({'error': 'Un meuble avec ce nom existe déjà dans cette zone'}), 400
+    
+    # Les articles du meuble suivent le renommage ou le changement de zone (voir models/item.py)
+    furniture.name = name
+    furniture.description = data.get('description', furniture.description)
+    furniture.zone_id = zone.id
+    
+    try:
+        db.session.commit()
+        return jsonify({
+            'id': furniture.id,
+            'name': furniture.name,
+            'description': furniture.description,
+            'zone_id': furniture.zone_id,
+            'zone_name': zone.name
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @location_bp.route('/furniture/<int:furniture_id>', methods=['DELETE'])
 def api_delete_furniture(furniture_id):
     # Vérifier si des articles utilisent ce meuble
@@ -170,26 +320,27 @@ def api_drawers():
     if request.method == 'GET':
         furniture_id = request.args.get('furniture_id')
         
+        # Meuble et zone récupérés par jointure (une seule requête)
+        query = db.session.query(
+            Drawer,
+            Furniture.name.label('furniture_name'),
+            Furniture.zone_id.label('zone_id'),
+            Zone.name.label('zone_name')
+        ).outerjoin(Furniture, Drawer.furniture_id == Furniture.id) \
+            .outerjoin(Zone, Furniture.zone_id == Zone.id)
         if furniture_id:
-            drawers = Drawer.query.filter_by(furniture_id=furniture_id).all()
-        else:
-            drawers = Drawer.query.all()
+            query = query.filter(Drawer.furniture_id == furniture_id)
         
         result = []
-        for drawer in drawers:
-            furniture = db.session.get(Furniture, drawer.furniture_id)
-            zone = None
-            if furniture:
-                zone = db.session.get(Zone, furniture.zone_id)
-            
+        for drawer, furniture_name, drawer_zone_id, zone_name in query.all():
             result.append({
                 'id': drawer.id,
                 'name': drawer.name,
                 'description': drawer.description,
                 'furniture_id': drawer.furniture_id,
-                'furniture_name': furniture.name if furniture else 'Inconnu',
-                'zone_id': furniture.zone_id if furniture else None,
-                'zone_name': zone.name if zone else 'Inconnu'
+                'furniture_name': furniture_name or 'Inconnu',
+                'zone_id': drawer_zone_id,
+                'zone_name': zone_name or 'Inconnu'
             })
         
         return jsonify(result)
@@ -233,6 +384,52 @@ def api_drawers():
             db.session.rollback()
             return jsonify({'error': str(e)}), 500
 
+@location_bp.route('/drawers/<int:drawer_id>', methods=['PUT'])
+@admin_api_required
+def api_update_drawer(drawer_id):
+    drawer = db.session.get(Drawer, drawer_id)
+    if not drawer:
+        return jsonify({'error': 'Tiroir non trouvé'}), 404
+    
+    data = request.json or {}
+    name = data.get('name', drawer.name)
+    furniture_id = data.get('furniture_id', drawer.furniture_id)
+    
+    if not name:
+        return jsonify({'error': 'Le nom du tiroir est requis'}), 400
+    
+    # Vérifier si le meuble existe
+    furniture = db.session.get(Furniture, furniture_id)
+    if not furniture:
+        return jsonify({'error': 'Meuble non trouvé'}), 404
+    
+    # Vérifier qu'aucun autre tiroir du meuble ne porte déjà ce nom
+    existing_drawer = Drawer.query.filter(
+        Drawer.name == name,
+        Drawer.furniture_id == furniture.id,
+        Drawer.id != drawer_id
+    ).first()
+    if existing_drawer:
+        return jsonify({'error': 'Un tiroir avec ce nom existe déjà dans ce meuble'}), 400
+    
+    # Les articles du tiroir suivent le renommage ou le changement de meuble (voir models/item.py)
+    drawer.name = name
+    drawer.description = data.get('description', drawer.description)
+    drawer.furniture_id = furniture.id
+    
+    try:
+        db.session.commit()
+        return jsonify({
+            'id': drawer.id,
+            'name': drawer.name,
+            'description': drawer.description,
+            'furniture_id': drawer.furniture_id,
+            'furniture_name': furniture.name
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @location_bp.route('/drawers/<int:drawer_id>', methods=['DELETE'])
 def api_delete_drawer(drawer_id):
     # Vérifier si des articles utilisent ce tiroir
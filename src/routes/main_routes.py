@@ -3,6 +3,8 @@ from src.models import db
 from src.models.user import User
 from src.models.item import Item
 from src.models.borrow import Borrow
+from src.services.search_service import search_items
+from src.services.item_views import load_item_views
 from datetime import datetime
 from functools import wraps  # Pour le décorateur login_required
 
@@ -171,9 +173,8 @@ def dashboard():
         return redirect(url_for('main.index'))
     
     # Récupérer les articles disponibles (non empruntés)
-    subquery = db.session.query(Borrow.item_id).filter(Borrow.return_date == None)
     available_items = db.session.query(Item).filter(
-        ~Item.id.in_(subquery)
+        Item.active_loan_count == 0
     ).order_by(Item.name).all()
     
     return render_template('dashboard.html', 
@@ -222,28 +223,21 @@ def api_search_items():
     if not query or len(query) < 2:
         return jsonify({'items': []})
     
-    # Recherche dans les articles
-    items = db.session.query(Item).filter(
-        Item.name.ilike(f'%{query}%')
-    ).order_by(Item.name).limit(20).all()
+    # Recherche dans les articles (triés par pertinence), emplacements et emprunts chargés en lot
+    views = load_item_views(search_items(db.session.query(Item), query).limit(20))
     
     results = []
-    for item in items:
-        # Vérifier si emprunté
-        is_borrowed = db.session.query(Borrow).filter(
-            Borrow.item_id == item.id, 
-            Borrow.return_date == None
-        ).first() is not None
-        
+    for view in views:
+        item = view.item
         results.append({
             'id': item.id,
             'name': item.name,
             'stock': item.stock,
             'is_temporary': item.is_temporary,
-            'is_borrowed': is_borrowed,
-            'zone_name': item.zone_rel.name if item.zone_rel else None,
-            'furniture_name': item.furniture_rel.name if item.furniture_rel else None,
-            'drawer_name': item.drawer_rel.name if item.drawer_rel else None
+            'is_borrowed': view.is_borrowed,
+            'zone_name': view.zone_name,
+            'furniture_name': view.furniture_name,
+            'drawer_name': view.drawer_name
         })
     
     return jsonify({'items': results})
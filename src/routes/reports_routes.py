@@ -1,72 +1,185 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, send_file, Response, current_app
-from functools import wraps
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, send_file, Response, current_app, stream_with_context
 import csv
 import io
 import os
-import tempfile
+import zlib
 from datetime import datetime
-from fpdf import FPDF
 from src.models import db
 from src.models.user import User
 from src.models.item import Item
-from src.models.borrow import Borrow
+from src.models.location import Zone, Furniture, Drawer
+from src.models.report_job import ReportJob
+from src.services.search_service import search_items
+from src.services.report_cache import report_cache
+from src.services.report_jobs import report_jobs, ReportQueueFull
+from src.services.pdf_reports import (ALL_ITEMS_PDF_REPORT, all_items_pdf, all_items_pdf_name,
+                                      user_loans_pdf, user_loans_pdf_name)
 
 # Création du blueprint
 reports_bp = Blueprint('reports', __name__)
 
+# Colonnes disponibles pour l'export CSV : clé -> (en-tête, colonne, formatage)
+CSV_COLUMNS = {
+    'id': ('ID', Item.id, None),
+    'name': ('Nom', Item.name, None),
+    'zone': ('Zone', Zone.name, None),
+    'furniture': ('Meuble', Furniture.name, None),
+    'drawer': ('Tiroir/Niveau', Drawer.name, None),
+    'is_temporary': ('Temporaire', Item.is_temporary, lambda value: 'Oui' if value else 'Non'),
+    'location': ('Emplacement', Item.location_path, None),
+    'stock': ('Stock', Item.stock, None),
+    'borrowed_quantity': ('Quantité empruntée', Item.borrowed_quantity, None),
+    'created_at': ('Créé le', Item.created_at, lambda value: value.strftime('%Y-%m-%d %H:%M:%S')),
+}
+DEFAULT_CSV_COLUMNS = ('id', 'name', 'zone', 'furniture', 'drawer', 'is_temporary', 'location')
+
+# Paramètres de filtre de l'export CSV (avec les colonnes et l'encodage, ils forment la clé du cache)
+CSV_FILTER_PARAMS = ('q', 'is_temporary', 'zone_id', 'furniture_id', 'drawer_id')
+
+# Nombre de lignes lues par aller-retour avec la base (curseur serveur) et écrites par bloc envoyé
+CSV_BATCH_SIZE = 1000
+
+
+def csv_export_query(args):
+    """
+    Requête par colonnes de l'export CSV (emplacements résolus par jointure), filtrée selon les
+    paramètres : columns (liste séparée par des virgules), q, is_temporary, zone_id, furniture_id,
+    drawer_id. Lève ValueError si un paramètre est invalide.
+
+    Returns:
+        tuple: (clés des colonnes, requête)
+    """
+    keys = [key.strip() for key in args.get('columns', '').split(',') if key.strip()] or list(DEFAULT_CSV_COLUMNS)
+    unknown = [key for key in keys if key not in CSV_COLUMNS]
+    if unknown:
+        raise ValueError(f"Colonnes inconnues: {', '.join(unknown)}")
+
+    query = db.session.query(*[CSV_COLUMNS[key][1] for key in keys]) \
+        .select_from(Item) \
+        .outerjoin(Zone, Item.zone_id == Zone.id) \
+        .outerjoin(Furniture, Item.furniture_id == Furniture.id) \
+        .outerjoin(Drawer, Item.drawer_id == Drawer.id)
+
+    if args.get('is_temporary') is not None:
+        query = query.filter(Item.is_temporary == (args.get('is_temporary').lower() == 'true'))
+    for param, column in (('zone_id', Item.zone_id), ('furniture_id', Item.furniture_id), ('drawer_id', Item.drawer_id)):
+        if args.get(param):
+            query = query.filter(column == int(args.get(param)))
+    if args.get('q'):
+        query = search_items(query, args.get('q'), ranked=False)
+
+    return keys, query.order_by(Item.name, Item.id)
+
+
+def stream_csv(keys, query, compress=False):
+    """
+    Générateur des blocs du fichier CSV. Les lignes sont lues par lots sur un curseur serveur
+    (yield_per) : la mémoire utilisée ne dépend pas du nombre d'articles.
+    """
+    formatters = [CSV_COLUMNS[key][2] for key in keys]
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31 : format gzip
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    writer.writerow([CSV_COLUMNS[key][0] for key in keys])
+    for count, row in enumerate(query.execution_options(yield_per=CSV_BATCH_SIZE), 1):
+        writer.writerow([
+            '' if value is None else (formatter(value) if formatter else value)
+            for value, formatter in zip(row, formatters)
+        ])
+        if count % CSV_BATCH_SIZE == 0:
+            chunk = flush()
+            if chunk:
+                yield chunk
+    chunk = flush()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+
+# Les rapports en cache restent dans le cache du navigateur mais sont revalidés à chaque
+# téléchargement (If-None-Match)
+REPORT_CACHE_CONTROL = 'private, no-cache'
+
+
+def send_cached(cached, etag, **kwargs):
+    """Envoie un fichier ouvert par report_cache.get (fermé par send_file après l'envoi)"""
+    response = send_file(cached, etag=etag, conditional=False, **kwargs)
+    response.content_length = os.fstat(cached.fileno()).st_size
+    return response
+
+
+def not_modified(etag):
+    """Réponse 304 pour un rapport dont le client a déjà la version courante"""
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = REPORT_CACHE_CONTROL
+    return response
+
+
 # Export de la liste des articles en CSV
 @reports_bp.route('/export_items_csv')
 def export_items_csv():
     """
-    Exporte la liste des articles au format CSV
+    Exporte la liste des articles au format CSV, en flux (réponse envoyée au fur et à mesure
+    de la lecture des articles), compressé en gzip si le client l'accepte.
+    Le fichier est conservé dans le cache des rapports tant que l'inventaire ne change pas
+    (ETag fort, 304 si If-None-Match correspond).
+    Paramètres optionnels : columns, q, is_temporary, zone_id, furniture_id, drawer_id
     """
     if 'user_id' not in session:
         flash('Veuillez vous connecter', 'danger')
         return redirect(url_for('main.index'))
     
-    # Accès ouvert à tous les utilisateurs
-    # Accès autorisé pour tous les utilisateurs
-    if False:
-        flash('Vous n\'êtes pas autorisé à accéder à cette page', 'danger')
-        return redirect(url_for('main.dashboard'))
-    
-    # Récupérer tous les articles
-    items = db.session.query(Item).order_by(Item.name).all()
+    try:
+        keys, query = csv_export_query(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Créer un fichier CSV en mémoire
-    output = io.StringIO()
-    writer = csv.writer(output)
+    compress = 'gzip' in request.accept_encodings
+    params = {param: request.args[param] for param in CSV_FILTER_PARAMS if request.args.get(param)}
+    params.update(columns=','.join(keys), encoding='gzip' if compress else 'identity')
+    etag = report_cache.key('items-csv', params)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
     
-    # Écrire l'en-tête
-    writer.writerow(['ID', 'Nom', 'Zone', 'Meuble', 'Tiroir/Niveau', 'Temporaire'])
+    headers = {
+        'Content-Disposition': f"attachment;filename=articles_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+        'Vary': 'Accept-Encoding',
+        'Cache-Control': REPORT_CACHE_CONTROL
+    }
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
     
-    # Écrire les lignes de données
-    for item in items:
-        writer.writerow([
-            item.id,
-            item.name,
-            item.zone or '',
-            item.mobilier or '',
-            item.niveau_tiroir or '',
-            'Oui' if item.is_temporary else 'Non'
-        ])
+    cached = report_cache.get(etag)
+    if cached:
+        response = send_cached(cached, etag, mimetype='text/csv')
+        response.headers.update(headers)
+        return response
     
-    # Préparer la réponse
-    output.seek(0)
-    return Response(
-        output,
-        mimetype="text/csv",
-        headers={"Content-Disposition": f"attachment;filename=articles_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"}
+    headers['X-Accel-Buffering'] = 'no'  # ne pas mettre le flux en tampon derrière nginx
+    response = Response(
+        stream_with_context(report_cache.tee(etag, stream_csv(keys, query, compress=compress))),
+        mimetype='text/csv',
+        headers=headers
     )
+    response.set_etag(etag)
+    return response
 
-# Décorateur pour supprimer un fichier après la réponse
-def after_this_request(func):
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        response = func(*args, **kwargs)
-        request._after_this_request_functions.append(lambda: func(*args, **kwargs))
-        return response
-    return wrapper
+def send_pdf(data, download_name, etag=None):
+    """
+    Envoie un PDF rendu en mémoire (services/pdf_reports.py) depuis un BytesIO, sans fichier
+    sur le disque ; le tampon est libéré à la fin de la réponse.
+    """
+    return send_file(io.BytesIO(data), mimetype='application/pdf', as_attachment=True,
+                     download_name=download_name, etag=etag or False, conditional=False)
 
 # Génération d'un PDF des emprunts d'un utilisateur
 @reports_bp.route('/generate_pdf', methods=['POST'])
@@ -88,161 +201,146 @@ def generate_pdf():
     if not user:
         flash('Utilisateur non trouvé', 'danger')
         return redirect(url_for('main.index'))
-
-    # Récupérer les emprunts en cours de l'utilisateur
-    current_loans = db.session.query(Borrow).filter(
-        Borrow.user_id == user_id,
-        Borrow.return_date == None
-    ).all()
-    
-    # Créer un PDF avec FPDF
-    pdf = FPDF()
-    pdf.add_page()
-    
-    # Ajouter le titre
-    pdf.set_font('Arial', 'B', 16)
-    pdf.cell(0, 10, 'Liste des emprunts', 0, 1, 'C')
-    pdf.cell(0, 10, f'Utilisateur: {user.name}', 0, 1, 'C')
-    pdf.cell(0, 10, f'Date: {datetime.now().strftime("%d/%m/%Y")}', 0, 1, 'C')
-    pdf.ln(10)
-    
-    # Vérifier s'il y a des emprunts
-    if not current_loans:
-        pdf.set_font('Arial', '', 12)
-        pdf.cell(0, 10, 'Aucun emprunt en cours.', 0, 1)
-    else:
-        # Entête du tableau
-        pdf.set_font('Arial', 'B', 12)
-        pdf.cell(10, 10, '#', 1, 0, 'C')
-        pdf.cell(70, 10, 'Article', 1, 0, 'C')
-        pdf.cell(60, 10, 'Emplacement', 1, 0, 'C')
-        pdf.cell(50, 10, 'Date d\'emprunt', 1, 1, 'C')
-        
-        # Contenu du tableau
-        pdf.set_font('Arial', '', 10)
-        for i, loan in enumerate(current_loans, 1):
-            item = loan.item
-            
-            # Numéro
-            pdf.cell(10, 10, str(i), 1, 0, 'C')
-            
-            # Nom de l'article
-            pdf.cell(70, 10, item.name, 1, 0, 'L')
-            
-            # Emplacement
-            location = item.location_info if not item.is_temporary else 'Article temporaire'
-            pdf.cell(60, 10, location, 1, 0, 'L')
-            
-            # Date d'emprunt
-            borrow_date = loan.borrow_date.strftime('%d/%m/%Y') if loan.borrow_date else ''
-            pdf.cell(50, 10, borrow_date, 1, 1, 'C')
-    
-    # Générer le PDF dans un fichier temporaire
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-        pdf_path = tmp.name
-        pdf.output(pdf_path)
     
-    # Envoyer le fichier PDF au client
+    # Envoyer le PDF au client (rendu en mémoire)
     try:
-        return_data = send_file(
-            pdf_path,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f'emprunts_{user.name}_{datetime.now().strftime("%Y%m%d")}.pdf'
-        )
-        
-        # Nettoyer le fichier temporaire après l'envoi
-        @after_this_request
-        def remove_file(response):
-            try:
-                os.unlink(pdf_path)
-            except Exception as e:
-                print(f"Erreur lors de la suppression du fichier temporaire: {e}")
-            return response
-            
-        return return_data
+        by_zone = request.form.get('by_zone') == 'true'
+        return send_pdf(user_loans_pdf(user, by_zone=by_zone), user_loans_pdf_name(user))
     except Exception as e:
-        # En cas d'erreur, supprimer le fichier temporaire et retourner une erreur
-        try:
-            os.unlink(pdf_path)
-        except:
-            pass
         flash(f'Erreur lors de la génération du PDF: {str(e)}', 'danger')
         return redirect(url_for('main.dashboard'))
 
 @reports_bp.route('/all_items_pdf')
 def generate_all_items_pdf():
-    """Génère un PDF listant tous les articles (matériel)."""
+    """
+    Génère un PDF listant tous les articles (matériel), servi depuis le cache des rapports tant
+    que l'inventaire ne change pas. Paramètre optionnel : by_zone=true (une section par zone)
+    """
     if 'user_id' not in session: # Ajout de la vérification de session
         flash('Veuillez vous connecter pour accéder à cette fonctionnalité.', 'warning')
         return redirect(url_for('main.login')) # Ou une autre page de login appropriée
+    download_name = all_items_pdf_name()
+    by_zone = request.args.get('by_zone') == 'true'
+    etag = report_cache.key(ALL_ITEMS_PDF_REPORT, {'by_zone': by_zone})
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    cached = report_cache.get(etag)
+    if cached:
+        response = send_cached(cached, etag, mimetype='application/pdf', as_attachment=True,
+                               download_name=download_name)
+        response.headers['Cache-Control'] = REPORT_CACHE_CONTROL
+        return response
     try:
-        items = Item.query.order_by(Item.name).all()
-
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_auto_page_break(auto=True, margin=15)
-
-        # Titre
-        pdf.set_font('Arial', 'B', 16)
-        pdf.cell(0, 10, 'Liste de Tout le Matériel', 0, 1, 'C')
-        pdf.set_font('Arial', '', 10)
-        pdf.cell(0, 10, f'Date de génération: {datetime.now().strftime("%d/%m/%Y %H:%M:%S")}', 0, 1, 'C')
-        pdf.ln(10)
-
-        if not items:
-            pdf.set_font('Arial', '', 12)
-            pdf.cell(0, 10, 'Aucun article trouvé.', 0, 1)
-        else:
-            # En-têtes de tableau
-            pdf.set_font('Arial', 'B', 10)
-            header_height = 7
-            col_widths = {'id': 15, 'name': 60, 'location': 70, 'type': 25, 'created_at': 25}
-            
-            pdf.cell(col_widths['id'], header_height, 'ID', 1, 0, 'C')
-            pdf.cell(col_widths['name'], header_height, 'Nom', 1, 0, 'C')
-            pdf.cell(col_widths['location'], header_height, 'Emplacement', 1, 0, 'C')
-            pdf.cell(col_widths['type'], header_height, 'Type', 1, 0, 'C')
-            pdf.cell(col_widths['created_at'], header_height, 'Créé le', 1, 1, 'C')
-
-            # Données du tableau
-            pdf.set_font('Arial', '', 9)
-            row_height = 6
-            for item in items:
-                item_type = "Temporaire" if item.is_temporary else "Permanent"
-                created_date = item.created_at.strftime("%d/%m/%y") if item.created_at else "N/A"
-                location_text = item.location_info if item.location_info else "N/A"
-
-                # Utilisation de cell au lieu de multi_cell pour la simplicité et la cohérence
-                # Le texte long sera coupé par FPDF. Une gestion plus avancée du texte nécessiterait des calculs de largeur de texte.
-                pdf.cell(col_widths['id'], row_height, str(item.id), 1, 0, 'C')
-                pdf.cell(col_widths['name'], row_height, item.name, 1, 0, 'L')
-                pdf.cell(col_widths['location'], row_height, location_text, 1, 0, 'L')
-                pdf.cell(col_widths['type'], row_height, item_type, 1, 0, 'C')
-                pdf.cell(col_widths['created_at'], row_height, created_date, 1, 1, 'C') # ln=1 pour la dernière cellule de la ligne
-
-        # Générer le PDF dans un fichier temporaire
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-            pdf_path = tmp.name
-            pdf.output(pdf_path)
-
-        # Envoyer le fichier PDF au client
-        response = send_file(
-            pdf_path,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f'liste_materiel_{datetime.now().strftime("%Y%m%d")}.pdf'
-        )
-        # Nettoyage après l'envoi (nécessaire sur certains systèmes)
-        @response.call_on_close
-        def cleanup_file():
-            try:
-                os.unlink(pdf_path)
-            except Exception as e_clean:
-                current_app.logger.error(f"Erreur lors du nettoyage du fichier PDF temporaire {pdf_path}: {e_clean}")
+        # Envoyer le PDF au client (rendu en mémoire) et le garder en cache pour cette version de l'inventaire
+        data = all_items_pdf(by_zone=by_zone)
+        report_cache.put(etag, data)
+        response = send_pdf(data, download_name, etag=etag)
+        response.headers['Cache-Control'] = REPORT_CACHE_CONTROL
         return response
 
     except Exception as e:
         current_app.logger.error(f'Erreur lors de la génération du PDF de tous les articles: {e}', exc_info=True)
         flash(f'Erreur lors de la génération du PDF: {str(e)}', 'danger')
         return redirect(url_for('admin.items_list')) # Rediriger vers la liste des articles en cas d'erreur)
+
+
+# --- Génération en arrière-plan ---
+
+def job_to_dict(job):
+    """Représentation JSON d'une tâche de rapport (avec les URL de suivi et de téléchargement)"""
+    return {
+        'id': job.id,
+        'type': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'error': job.error,
+        'file_name': job.file_name,
+        'file_size': job.file_size,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'expires_at': job.expires_at.isoformat() if job.expires_at else None,
+        'status_url': url_for('reports.report_job_status', job_id=job.id),
+        'download_url': url_for('reports.download_report_job', job_id=job.id) if job.status == ReportJob.DONE else None
+    }
+
+
+def get_user_job(job_id):
+    """Tâche demandée par l'utilisateur connecté (None sinon)"""
+    job = db.session.get(ReportJob, job_id)
+    if job is None or job.user_id != session['user_id']:
+        return None
+    return job
+
+
+@reports_bp.route('/jobs', methods=['POST'])
+def create_report_job():
+    """
+    Lance la génération d'un rapport en arrière-plan et retourne la tâche (202).
+    Paramètres (JSON ou formulaire) : type ('all-items-pdf' ou 'user-loans-pdf'),
+    user_id pour les emprunts d'un utilisateur (utilisateur connecté par défaut),
+    by_zone=true pour une section par zone.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Non authentifié'}), 401
+    
+    data = request.get_json(silent=True) or request.form
+    kind = data.get('type')
+    params = {'by_zone': str(data.get('by_zone', '')).lower() == 'true'}
+    if kind == 'user-loans-pdf':
+        try:
+            user_id = int(data.get('user_id') or session['user_id'])
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Utilisateur invalide'}), 400
+        if not db.session.get(User, user_id):
+            return jsonify({'error': 'Utilisateur non trouvé'}), 404
+        params['user_id'] = user_id
+    
+    try:
+        job = report_jobs.submit(current_app._get_current_object(), kind, params, session['user_id'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ReportQueueFull:
+        response = jsonify({'error': 'Trop de rapports en cours de génération, réessayez dans un instant'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '10'
+        return response
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f'Erreur lors de la création de la tâche de rapport: {e}', exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    
+    response = jsonify({'success': True, 'job': job_to_dict(job)})
+    response.status_code = 202
+    response.headers['Location'] = url_for('reports.report_job_status', job_id=job.id)
+    return response
+
+
+@reports_bp.route('/jobs/<job_id>', methods=['GET'])
+def report_job_status(job_id):
+    """État et avancement d'une tâche de rapport"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Non authentifié'}), 401
+    
+    job = get_user_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Tâche non trouvée'}), 404
+    report_jobs.check_stale(job)
+    return jsonify({'success': True, 'job': job_to_dict(job)})
+
+
+@reports_bp.route('/jobs/<job_id>/download', methods=['GET'])
+def download_report_job(job_id):
+    """Télécharge le fichier produit par une tâche terminée"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Non authentifié'}), 401
+    
+    job = get_user_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Tâche non trouvée'}), 404
+    if job.status != ReportJob.DONE:
+        return jsonify({'error': 'Le rapport n\'est pas disponible', 'job': job_to_dict(job)}), 409
+    
+    path = report_jobs.path(job.id)
+    if job.expires_at < datetime.utcnow() or not os.path.exists(path):
+        return jsonify({'error': 'Le rapport a expiré'}), 410
+    return send_file(path, as_attachment=True, download_name=job.file_name)
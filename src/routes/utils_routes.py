@@ -1,6 +1,5 @@
 from flask import Blueprint, request, jsonify, session
-from src.models import db
-from src.models.item import Item
+from src.services.autocomplete_index import autocomplete_index
 
 # Création du blueprint
 utils_bp = Blueprint('utils', __name__)
@@ -10,6 +9,7 @@ utils_bp = Blueprint('utils', __name__)
 def autocomplete():
     """
     Fournit des suggestions pour l'autocomplétion de la recherche d'articles
+    (servies par l'index en mémoire, sans requête en base)
     """
     if 'user_id' not in session:
         return jsonify({'error': 'Non authentifié'}), 401
@@ -18,18 +18,4 @@ def autocomplete():
     if not query or len(query) < 2:
         return jsonify([])
     
-    # Rechercher les articles correspondant à la requête
-    items = db.session.query(Item).filter(
-        Item.name.ilike(f'%{query}%')
-    ).order_by(Item.name).limit(10).all()
-    
-    # Formater les résultats
-    results = []
-    for item in items:
-        results.append({
-            'id': item.id,
-            'label': f"{item.name} - {item.location_info}",
-            'value': item.name
-        })
-    
-    return jsonify(results)
+    return jsonify(autocomplete_index.search(query, limit=10))
@@ -229,7 +229,7 @@ class AIService:
         Construit le contexte de l'inventaire et interroge l'API de complétion.
 
         Args:
-            items_list (list): Liste des objets Item de l'inventaire.
+            items_list (list): Articles de l'inventaire (attributs name et location_path).
             user_query (str): La question de l'utilisateur.
 
         Returns:
@@ -252,7 +252,7 @@ class AIService:
             ]
             for item in items_list:
                 inventory_context_parts.append(
-                    f"- Nom: {item.name}, Emplacement: {item.location_info or 'N/A'}"
+                    f"- Nom: {item.name}, Emplacement: {item.location_path or 'N/A'}"
                 )
             inventory_context = "\n".join(inventory_context_parts)
         
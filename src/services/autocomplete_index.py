@@ -0,0 +1,288 @@
+"""
+Index d'autocomplétion en mémoire (un par worker) sur les noms d'articles.
+
+Les noms normalisés sont rangés dans deux tableaux triés parallèles (clés / ids) pour
+la recherche par préfixe, complétés par une table de trigrammes -> ids pour la recherche
+par sous-chaîne et par une table des sous-chaînes de 1 et 2 caractères -> (clé, id) triés
+pour les saisies courtes. Le libellé d'emplacement est précalculé pour chaque article.
+
+L'index est construit au premier appel, corrigé incrémentalement après chaque commit
+qui crée, renomme, déplace ou supprime un article dans ce worker, et reconstruit après
+chaque écriture d'emplacement dans ce worker. Le compteur de version `item_names` (articles
+créés, supprimés, renommés ou déplacés, emplacements modifiés ; pas les mouvements de stock)
+est relu au plus toutes les AUTOCOMPLETE_INDEX_CHECK_INTERVAL secondes : s'il a progressé plus
+que les commits de ce worker, un autre worker a modifié des noms et l'index est reconstruit.
+"""
+import heapq
+import logging
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from src.models import db
+from src.models.data_version import ITEM_NAME_ATTRIBUTES, DataVersion, local_writes, on_version_change
+from src.models.item import Item, normalize_search_text
+
+logger = logging.getLogger(__name__)
+
+NGRAM_SIZE = 3
+
+# Attributs d'un article qui modifient son entrée dans l'index
+INDEXED_ATTRIBUTES = ITEM_NAME_ATTRIBUTES
+
+
+def _ngrams(key):
+    return {key[i:i + NGRAM_SIZE] for i in range(len(key) - NGRAM_SIZE + 1)}
+
+
+def _short_grams(key):
+    return {key[i:i + size] for size in range(1, NGRAM_SIZE) for i in range(len(key) - size + 1)}
+
+
+class AutocompleteIndex:
+    """
+    Index en mémoire des noms d'articles pour l'autocomplétion
+    """
+
+    def __init__(self, check_interval=None):
+        self.check_interval = check_interval if check_interval is not None \
+            else float(os.getenv('AUTOCOMPLETE_INDEX_CHECK_INTERVAL', '2'))
+        self._lock = threading.RLock()
+        self._built_at = None
+        self._checked_at = 0.0
+        self._version = None         # compteur `item_names` lu à la construction / dernière vérification
+        self._local_writes = 0       # commits de ce worker sur `item_names` à ce moment-là
+        self._keys = []              # noms normalisés, triés
+        self._ids = array('q')       # ids des articles, dans le même ordre que _keys
+        self._entries = {}           # id -> (clé normalisée, nom, libellé)
+        self._postings = {}          # trigramme -> set(ids)
+        self._short_postings = {}    # sous-chaîne de 1 ou 2 caractères -> [(clé, id)] trié
+        self._pending_upserts = set()
+        self._pending_deletes = set()
+
+    # --- Construction et mise à jour ---
+
+    def _load_rows(self, item_ids=None):
+        query = db.session.query(Item.id, Item.name, Item.location_path)
+        if item_ids is not None:
+            query = query.filter(Item.id.in_(item_ids))
+        return query.all()
+
+    @staticmethod
+    def _make_entry(row):
+        return normalize_search_text(row.name), row.name, f"{row.name} - {row.location_path}"
+
+    def rebuild(self):
+        """Reconstruit entièrement l'index à partir de la base"""
+        started = time.monotonic()
+        # Compteurs lus avant les articles : au pire une reconstruction de trop, jamais une écriture manquée
+        writes = local_writes(DataVersion.ITEM_NAMES)
+        version = DataVersion.get(DataVersion.ITEM_NAMES)
+        entries = {row.id: self._make_entry(row) for row in self._load_rows()}
+
+        ordered = sorted((entry[0], item_id) for item_id, entry in entries.items())
+        postings = {}
+        short_postings = {}
+        for key, item_id in ordered:
+            for gram in _ngrams(key):
+                postings.setdefault(gram, set()).add(item_id)
+            for gram in _short_grams(key):
+                short_postings.setdefault(gram, []).append((key, item_id))
+
+        with self._lock:
+            self._entries = entries
+            self._keys = [key for key, _ in ordered]
+            self._ids = array('q', (item_id for _, item_id in ordered))
+            self._postings = postings
+            self._short_postings = short_postings
+            self._pending_upserts.clear()
+            self._pending_deletes.clear()
+            self._version = version
+            self._local_writes = writes
+            self._built_at = self._checked_at = time.monotonic()
+        logger.info(f"Index d'autocomplétion construit: {len(entries)} articles en {time.monotonic() - started:.3f}s")
+
+    def invalidate(self):
+        """Force une reconstruction complète au prochain appel"""
+        with self._lock:
+            self._built_at = None
+
+    def notify_changes(self, upserted_ids, deleted_ids):
+        """Enregistre des articles créés/modifiés ou supprimés, appliqués au prochain appel"""
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._pending_upserts.difference_update(deleted_ids)
+            self._pending_upserts.update(upserted_ids)
+            self._pending_deletes.update(deleted_ids)
+
+    def _remove(self, item_id):
+        entry = self._entries.pop(item_id, None)
+        if entry is None:
+            return
+        key = entry[0]
+        position = bisect_left(self._keys, key)
+        while self._ids[position] != item_id:
+            position += 1
+        del self._keys[position]
+        del self._ids[position]
+        for gram in _ngrams(key):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(item_id)
+                if not ids:
+                    del self._postings[gram]
+        for gram in _short_grams(key):
+            pairs = self._short_postings.get(gram)
+            if pairs is not None:
+                position = bisect_left(pairs, (key, item_id))
+                if position < len(pairs) and pairs[position] == (key, item_id):
+                    del pairs[position]
+                if not pairs:
+                    del self._short_postings[gram]
+
+    def _insert(self, item_id, entry):
+        key = entry[0]
+        self._entries[item_id] = entry
+        position = bisect_right(self._keys, key)
+        self._keys.insert(position, key)
+        self._ids.insert(position, item_id)
+        for gram in _ngrams(key):
+            self._postings.setdefault(gram, set()).add(item_id)
+        for gram in _short_grams(key):
+            insort(self._short_postings.setdefault(gram, []), (key, item_id))
+
+    def _apply_pending(self):
+        with self._lock:
+            upserts = set(self._pending_upserts)
+            deletes = set(self._pending_deletes)
+            self._pending_upserts.clear()
+            self._pending_deletes.clear()
+
+        rows = self._load_rows(upserts) if upserts else []
+        with self._lock:
+            for item_id in deletes | upserts:
+                self._remove(item_id)
+            for row in rows:
+                self._insert(row.id, self._make_entry(row))
+
+    def _is_stale(self):
+        """Vrai si le compteur `item_names` a progressé plus que les commits de ce worker"""
+        writes = local_writes(DataVersion.ITEM_NAMES)
+        version = DataVersion.get(DataVersion.ITEM_NAMES)
+        with self._lock:
+            if version != self._version + (writes - self._local_writes):
+                return True
+            self._version = version
+            self._local_writes = writes
+            self._checked_at = time.monotonic()
+        return False
+
+    def _ensure_fresh(self):
+        if self._built_at is None:
+            self.rebuild()
+            return
+        if time.monotonic() - self._checked_at >= self.check_interval and self._is_stale():
+            self.rebuild()
+            return
+        if self._pending_upserts or self._pending_deletes:
+            self._apply_pending()
+
+    # --- Recherche ---
+
+    def search(self, term, limit=10):
+        """
+        Retourne les suggestions d'autocomplétion pour un terme
+
+        Args:
+            term (str): texte saisi
+            limit (int): nombre maximum de suggestions
+
+        Returns:
+            list: [{"id": ..., "label": "Nom - Emplacement", "value": "Nom"}, ...]
+        """
+        query = normalize_search_text(term)
+        if not query:
+            return []
+        self._ensure_fresh()
+
+        with self._lock:
+            if len(query) >= NGRAM_SIZE:
+                matches = self._substring_matches(query)
+            else:
+                matches = self._short_matches(query, limit)
+
+            entries = self._entries
+            best = heapq.nsmallest(
+                limit, matches,
+                key=lambda item_id: (not entries[item_id][0].startswith(query), entries[item_id][1], item_id)
+            )
+            return [{'id': item_id, 'label': entries[item_id][2], 'value': entries[item_id][1]} for item_id in best]
+
+    def _substring_matches(self, query):
+        postings = []
+        for gram in _ngrams(query):
+            ids = self._postings.get(gram)
+            if not ids:
+                return []
+            postings.append(ids)
+        postings.sort(key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        return [item_id for item_id in candidates if query in self._entries[item_id][0]]
+
+    def _short_matches(self, query, limit):
+        # Préfixes d'abord (tranche contiguë du tableau trié), puis sous-chaînes si nécessaire
+        start = bisect_left(self._keys, query)
+        end = start
+        while end < len(self._keys) and end - start < limit and self._keys[end].startswith(query):
+            end += 1
+        matches = list(self._ids[start:end])
+        if len(matches) >= limit:
+            return matches
+        for key, item_id in self._short_postings.get(query, ()):
+            if not key.startswith(query):
+                matches.append(item_id)
+                if len(matches) >= limit:
+                    break
+        return matches
+
+
+# Instance singleton de l'index
+autocomplete_index = AutocompleteIndex()
+
+# Un renommage d'emplacement met à jour location_path en masse : reconstruire l'index
+on_version_change(DataVersion.LOCATIONS, autocomplete_index.invalidate)
+
+
+# --- Suivi des écritures sur les articles ---
+
+@event.listens_for(Session, 'after_flush')
+def _track_item_changes(session, flush_context):
+    upserts, deletes = session.info.setdefault('autocomplete_changes', (set(), set()))
+    for obj in session.new:
+        if isinstance(obj, Item):
+            upserts.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, Item):
+            state = inspect(obj)
+            if any(state.attrs[attr].history.has_changes() for attr in INDEXED_ATTRIBUTES):
+                upserts.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, Item):
+            deletes.add(obj.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_item_changes(session):
+    changes = session.info.pop('autocomplete_changes', None)
+    if changes:
+        upserts, deletes = changes
+        autocomplete_index.notify_changes(upserts - deletes, deletes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_item_changes(session):
+    session.info.pop('autocomplete_changes', None)
@@ -0,0 +1,260 @@
+"""
+Diffusion en direct des changements d'inventaire (Server-Sent Events, /api/events).
+
+Les changements sont écrits dans la table change_event, dans la transaction qui les produit :
+- détectés automatiquement après chaque flush de la session (articles, emprunts, alertes,
+  emplacements modifiés via l'ORM) ;
+- publiés explicitement avec publish() pour les UPDATE en masse qui contournent l'ORM.
+
+Dans chaque worker, un thread du hub relit la table toutes les EVENTS_POLL_INTERVAL secondes
+(une requête indexée par worker, quel que soit le nombre de clients) et répartit les nouveaux
+événements dans les files des clients connectés. La table sert aussi à rejouer les événements
+manqués lors d'une reconnexion (en-tête Last-Event-ID) ; elle est purgée au-delà de
+EVENTS_RETENTION secondes.
+
+Les identifiants sont attribués à l'insertion mais deviennent visibles au commit : sous
+PostgreSQL, l'événement 11 peut être lu avant l'événement 10 d'une transaction encore ouverte.
+Le curseur du hub n'avance donc que sur des identifiants contigus ; un trou retient les
+événements suivants jusqu'à ce qu'il se comble, ou qu'il soit abandonné après
+EVENTS_GAP_TIMEOUT secondes (identifiant consommé par une transaction annulée).
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import delete, event, func, inspect, select
+from sqlalchemy.orm import Session
+from src.models import db
+from src.models.borrow import Borrow
+from src.models.change_event import ChangeEvent
+from src.models.item import Item
+from src.models.location import Zone, Furniture, Drawer
+from src.models.notification import Notification
+
+logger = logging.getLogger(__name__)
+
+# Sujets des événements
+STOCK = 'stock'
+LOAN = 'loan'
+ALERT = 'alert'
+LOCATION = 'location'
+
+# Taille maximale de la file d'un client ; au-delà le flux est fermé et le client se reconnecte
+SUBSCRIBER_QUEUE_SIZE = 1000
+# Nombre maximal d'événements lus par requête du hub
+BATCH_SIZE = 500
+# Intervalle entre deux purges de la table (secondes)
+PURGE_INTERVAL = 60
+
+Event = namedtuple('Event', 'id topic data')
+
+LOCATION_KINDS = {Zone: 'zone', Furniture: 'furniture', Drawer: 'drawer'}
+
+
+def publish(topic, session=None, **payload):
+    """Ajoute un événement à la transaction en cours (écrit au prochain flush ou au commit)"""
+    session = session or db.session
+    session.info.setdefault('change_events', []).append((topic, payload))
+
+
+def _stock_value(item):
+    stock = item.__dict__.get('stock')
+    return stock if isinstance(stock, int) else None
+
+
+def _has_changed(obj, attribute):
+    return inspect(obj).attrs[attribute].history.has_changes()
+
+
+def _detect_changes(session):
+    """Événements correspondant aux objets écrits par le flush"""
+    events = []
+    for obj in session.new:
+        if isinstance(obj, Item):
+            events.append((STOCK, {'item_id': obj.id, 'stock': _stock_value(obj)}))
+        elif isinstance(obj, Borrow):
+            events.append((LOAN, {'action': 'created', 'loan_id': obj.id, 'item_id': obj.item_id,
+                                  'user_id': obj.user_id, 'quantity': obj.quantity}))
+        elif isinstance(obj, Notification) and obj.item_id is not None:
+            events.append((ALERT, {'action': 'created', 'item_id': obj.item_id, 'type': obj.type}))
+        elif type(obj) in LOCATION_KINDS:
+            events.append((LOCATION, {'action': 'created', 'kind': LOCATION_KINDS[type(obj)], 'id': obj.id}))
+
+    for obj in session.dirty:
+        if isinstance(obj, Item) and _has_changed(obj, 'stock'):
+            events.append((STOCK, {'item_id': obj.id, 'stock': _stock_value(obj)}))
+        elif isinstance(obj, Borrow) and _has_changed(obj, 'return_date') and obj.return_date is not None:
+            events.append((LOAN, {'action': 'returned', 'loan_id': obj.id, 'item_id': obj.item_id,
+                                  'user_id': obj.user_id, 'quantity': obj.quantity}))
+        elif isinstance(obj, Notification) and _has_changed(obj, 'is_active') and not obj.is_active:
+            events.append((ALERT, {'action': 'dismissed', 'item_id': obj.item_id, 'type': obj.type}))
+        elif type(obj) in LOCATION_KINDS and session.is_modified(obj):
+            events.append((LOCATION, {'action': 'updated', 'kind': LOCATION_KINDS[type(obj)], 'id': obj.id}))
+
+    for obj in session.deleted:
+        if type(obj) in LOCATION_KINDS:
+            events.append((LOCATION, {'action': 'deleted', 'kind': LOCATION_KINDS[type(obj)], 'id': obj.id}))
+    return events
+
+
+def _write_events(session, events):
+    if not events:
+        return
+    now = datetime.utcnow()
+    session.connection().execute(ChangeEvent.__table__.insert(), [{
+        'topic': topic,
+        'payload': json.dumps(payload, separators=(',', ':'), ensure_ascii=False),
+        'created_at': now
+    } for topic, payload in events])
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_flushed_changes(session, flush_context):
+    events = session.info.pop('change_events', []) + _detect_changes(session)
+    _write_events(session, events)
+
+
+@event.listens_for(Session, 'before_commit')
+def _record_published_events(session):
+    # Événements publiés après le dernier flush (UPDATE en masse sans objet ORM modifié)
+    _write_events(session, session.info.pop('change_events', []))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_published_events(session):
+    session.info.pop('change_events', None)
+
+
+class EventHub:
+    """
+    Répartit les événements de la table change_event entre les clients connectés à ce worker
+    """
+
+    def __init__(self, poll_interval=None, retention=None, gap_timeout=None):
+        self.poll_interval = poll_interval if poll_interval is not None \
+            else float(os.getenv('EVENTS_POLL_INTERVAL', '1'))
+        self.retention = retention if retention is not None \
+            else float(os.getenv('EVENTS_RETENTION', '3600'))
+        self.gap_timeout = gap_timeout if gap_timeout is not None \
+            else float(os.getenv('EVENTS_GAP_TIMEOUT', '10'))
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._thread = None
+        self._purged_at = 0.0
+        self._cursor = 0           # dernier identifiant réparti (sans trou en dessous)
+        self._held = {}            # id retenu derrière un trou -> date de première lecture
+
+    # --- Lecture de la table ---
+
+    @staticmethod
+    def latest_id():
+        """Identifiant du dernier événement enregistré"""
+        return db.session.query(func.max(ChangeEvent.id)).scalar() or 0
+
+    @staticmethod
+    def events_since(last_id, until=None, limit=BATCH_SIZE):
+        """Événements postérieurs à last_id (et jusqu'à until inclus), dans l'ordre"""
+        query = select(ChangeEvent.id, ChangeEvent.topic, ChangeEvent.payload).where(ChangeEvent.id > last_id)
+        if until is not None:
+            query = query.where(ChangeEvent.id <= until)
+        rows = db.session.execute(query.order_by(ChangeEvent.id).limit(limit)).all()
+        return [Event(*row) for row in rows]
+
+    def _contiguous(self, events):
+        """
+        Événements lus qui peuvent être répartis : ceux qui suivent le curseur sans trou, ou dont
+        le trou précédent n'a pas été comblé après gap_timeout secondes
+        """
+        now = time.monotonic()
+        cursor = self._cursor
+        ready = []
+        for position, item in enumerate(events):
+            if item.id != cursor + 1:
+                seen_at = self._held.setdefault(item.id, now)
+                if now - seen_at < self.gap_timeout:
+                    for later in events[position + 1:]:
+                        self._held.setdefault(later.id, now)
+                    break
+                logger.warning(f"Événements {cursor + 1} à {item.id - 1} absents après {self.gap_timeout}s "
+                               f"(transaction annulée ?) : ignorés")
+            ready.append(item)
+            cursor = item.id
+        self._held = {event_id: seen_at for event_id, seen_at in self._held.items() if event_id > cursor}
+        return ready
+
+    def _purge(self):
+        if time.monotonic() - self._purged_at < PURGE_INTERVAL:
+            return
+        self._purged_at = time.monotonic()
+        cutoff = datetime.utcnow() - timedelta(seconds=self.retention)
+        db.session.execute(delete(ChangeEvent).where(ChangeEvent.created_at < cutoff))
+        db.session.commit()
+
+    # --- Abonnements ---
+
+    def subscribe(self, app):
+        """
+        Crée la file d'un client et démarre le thread du hub si nécessaire
+
+        Returns:
+            tuple: (file, curseur) ; la file recevra les événements postérieurs au curseur,
+            les précédents sont à rejouer depuis la table (events_since(..., until=curseur))
+        """
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            if self._thread is None:
+                self._cursor = self.latest_id()
+                self._held = {}
+                self._thread = threading.Thread(target=self._run, args=(app,), name='event-hub', daemon=True)
+                self._thread.start()
+            self._subscribers.add(subscriber)
+            return subscriber, self._cursor
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _dispatch(self, events):
+        with self._lock:
+            # Curseur et abonnés lus ensemble : un nouvel abonné rejoue jusqu'au curseur, puis
+            # reçoit tout ce qui suit
+            self._cursor = events[-1].id
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                for item in events:
+                    subscriber.put_nowait(item)
+            except queue.Full:
+                # Client trop lent : fermer son flux, il rejouera les événements à la reconnexion
+                self.unsubscribe(subscriber)
+                while not subscriber.empty():
+                    subscriber.get_nowait()
+                subscriber.put_nowait(None)
+
+    def _run(self, app):
+        with app.app_context():
+            while True:
+                with self._lock:
+                    if not self._subscribers:
+                        self._thread = None
+                        return
+                ready = []
+                try:
+                    ready = self._contiguous(self.events_since(self._cursor))
+                    if ready:
+                        self._dispatch(ready)
+                    self._purge()
+                except Exception as e:
+                    logger.error(f"Erreur du hub d'événements: {e}")
+                finally:
+                    db.session.remove()
+                if len(ready) < BATCH_SIZE:
+                    time.sleep(self.poll_interval)
+
+
+# Instance singleton du hub
+event_hub = EventHub()
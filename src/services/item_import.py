@@ -0,0 +1,513 @@
+"""
+Import en masse d'articles depuis un fichier CSV ou NDJSON (un objet JSON par ligne).
+
+Le fichier est lu en flux, par blocs de ITEM_IMPORT_CHUNK_SIZE lignes : il n'est jamais chargé
+entièrement en mémoire. Chaque ligne est validée et ses emplacements sont résolus avec une
+table des noms construite une seule fois à partir du cache des emplacements ; une ligne
+invalide est écartée et signalée (numéro de ligne et message) sans interrompre l'import.
+
+Comme /add et /add_batch, un article permanent n'est pas créé s'il existe déjà un article de
+même nom au même emplacement (une requête sur les noms de chaque bloc, voir existing_items()),
+ni s'il répète une ligne précédente du fichier ; ces lignes sont signalées comme erreurs.
+
+Colonnes / clés reconnues :
+- name (obligatoire), stock (entier >= 0, défaut 1), is_temporary (true/false, oui/non, 1/0)
+- zone, furniture (ou mobilier), drawer (ou niveau_tiroir) : noms des emplacements, comparés
+  sans tenir compte de la casse ni des accents ; le meuble est cherché dans la zone, le tiroir
+  dans le meuble
+- ou zone_id, furniture_id, drawer_id : identifiants (la hiérarchie est vérifiée)
+
+Les lignes valides d'un bloc sont insérées en une fois, sans objets ORM :
+- PostgreSQL : COPY dans une table temporaire, puis INSERT ... SELECT ... RETURNING ;
+- autres bases (SQLite) : INSERT groupé (executemany) avec RETURNING.
+Les colonnes dérivées que l'ORM remplit à l'écriture d'un article (search_name, location_path,
+champs texte zone / mobilier / niveau_tiroir, compteurs d'emprunts, version) sont calculées ici.
+Chaque bloc enregistre aussi le stock de départ dans le journal des mouvements (un INSERT ...
+SELECT), publie un événement `stock` (action `imported`) et incrémente les compteurs de version
+`inventory` et `item_names`, puis est validé : un long import ne bloque pas les autres écritures (SQLite) et,
+en cas d'erreur, les blocs précédents restent importés.
+"""
+import csv
+import io
+import json
+import logging
+import os
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import insert, literal, select, text
+from src.models import db
+from src.models.data_version import DataVersion
+from src.models.item import Item, normalize_search_text
+from src.models.stock_movement import StockMovement
+from src.services.autocomplete_index import autocomplete_index
+from src.services.event_hub import publish, STOCK
+from src.services.location_cache import location_cache
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+# Nombre de lignes lues, validées et insérées ensemble
+CHUNK_SIZE = int(os.getenv('ITEM_IMPORT_CHUNK_SIZE', '2000'))
+# Nombre maximal d'erreurs détaillées dans le rapport (toutes sont comptées)
+MAX_REPORTED_ERRORS = 1000
+
+NAME_MAX_LENGTH = Item.__table__.c.name.type.length
+
+# Colonnes écrites par l'import, dans l'ordre du COPY
+IMPORT_COLUMNS = ('name', 'search_name', 'stock', 'is_temporary', 'zone_id', 'furniture_id', 'drawer_id',
+                  'zone', 'mobilier', 'niveau_tiroir', 'location_path', 'created_at',
+                  'active_loan_count', 'borrowed_quantity', 'version_id')
+
+# Noms de colonnes acceptés pour les emplacements
+LOCATION_KEYS = {
+    'zone': ('zone',),
+    'furniture': ('furniture', 'mobilier'),
+    'drawer': ('drawer', 'niveau_tiroir'),
+}
+
+TRUE_VALUES = {'true', '1', 'oui', 'yes', 'o', 'y'}
+FALSE_VALUES = {'false', '0', 'non', 'no', 'n', ''}
+
+RowError = namedtuple('RowError', 'line error')
+
+
+class ItemImportError(ValueError):
+    """Fichier illisible dans son ensemble (format inconnu, colonne name absente...)"""
+
+
+class ImportReport:
+    """
+    Résultat d'un import : lignes lues, importées (ou valides en simulation) et erreurs
+    """
+
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.total = 0
+        self.imported = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(RowError(line, message))
+
+    def to_dict(self):
+        return {
+            'dry_run': self.dry_run,
+            'total': self.total,
+            'imported': self.imported,
+            'error_count': self.error_count,
+            'errors': [error._asdict() for error in self.errors],
+            'errors_truncated': self.error_count > len(self.errors),
+        }
+
+
+# --- Lecture en flux ---
+
+def _text_stream(stream):
+    """Flux texte UTF-8 (BOM d'Excel ignoré) à partir d'un flux binaire"""
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+
+def read_csv(stream):
+    """
+    Lignes d'un fichier CSV (séparateur ',' ou ';', détecté sur l'en-tête)
+
+    Yields:
+        tuple: (numéro de ligne, dictionnaire colonne -> valeur)
+    """
+    lines = _text_stream(stream)
+    header = lines.readline()
+    if not header.strip():
+        raise ItemImportError('Fichier CSV vide')
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    columns = [column.strip().lower() for column in next(csv.reader([header], delimiter=delimiter))]
+    if 'name' not in columns:
+        raise ItemImportError("Colonne 'name' absente de l'en-tête du fichier CSV")
+
+    reader = csv.reader(lines, delimiter=delimiter)
+    for values in reader:
+        if not any(value.strip() for value in values):
+            continue
+        # reader.line_num compte les lignes lues après l'en-tête
+        yield reader.line_num + 1, dict(zip(columns, values))
+
+
+def read_ndjson(stream):
+    """
+    Lignes d'un fichier NDJSON ; une ligne qui n'est pas un objet JSON est renvoyée avec
+    le message d'erreur à la place du dictionnaire
+
+    Yields:
+        tuple: (numéro de ligne, dictionnaire ou message d'erreur)
+    """
+    for line_number, line in enumerate(_text_stream(stream), 1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            yield line_number, f'JSON invalide: {e}'
+            continue
+        if not isinstance(data, dict):
+            yield line_number, 'Un objet JSON est attendu sur chaque ligne'
+            continue
+        yield line_number, {str(key).lower(): value for key, value in data.items()}
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+
+
+# --- Validation ---
+
+class LocationMap:
+    """
+    Emplacements indexés par nom normalisé et par identifiant, construits une fois par import
+    à partir du cache des emplacements
+    """
+
+    def __init__(self):
+        # Emplacements créés par un autre worker depuis la dernière vérification du cache
+        location_cache.check_version()
+        zones = location_cache.zones()
+        furniture = location_cache.furniture()
+        drawers = location_cache.drawers()
+        self.zones = {zone.id: zone for zone in zones}
+        self.furniture = {entry.id: entry for entry in furniture}
+        self.drawers = {entry.id: entry for entry in drawers}
+        self.zone_names = {normalize_search_text(zone.name): zone.id for zone in zones}
+        self.furniture_names = {(entry.zone_id, normalize_search_text(entry.name)): entry.id
+                                for entry in furniture}
+        self.drawer_names = {(entry.furniture_id, normalize_search_text(entry.name)): entry.id
+                             for entry in drawers}
+        # Noms lus dans le fichier -> forme normalisée (les mêmes emplacements reviennent à chaque ligne)
+        self._normalized = {}
+
+    def _normalize(self, name):
+        normalized = self._normalized.get(name)
+        if normalized is None:
+            normalized = self._normalized[name] = normalize_search_text(name)
+        return normalized
+
+    def resolve(self, row):
+        """
+        Identifiants (zone, meuble, tiroir) d'une ligne, à partir des noms ou des identifiants
+
+        Raises:
+            ValueError: emplacement incomplet, inconnu ou incohérent
+        """
+        names = {kind: _first_value(row, keys) for kind, keys in LOCATION_KEYS.items()}
+        if any(names.values()):
+            if not all(names.values()):
+                raise ValueError('Zone, meuble et tiroir sont obligatoires pour un article permanent')
+            zone_id = self.zone_names.get(self._normalize(names['zone']))
+            if zone_id is None:
+                raise ValueError(f"Zone inconnue: {names['zone']}")
+            furniture_id = self.furniture_names.get((zone_id, self._normalize(names['furniture'])))
+            if furniture_id is None:
+                raise ValueError(f"Meuble inconnu dans la zone {names['zone']}: {names['furniture']}")
+            drawer_id = self.drawer_names.get((furniture_id, self._normalize(names['drawer'])))
+            if drawer_id is None:
+                raise ValueError(f"Tiroir inconnu dans le meuble {names['furniture']}: {names['drawer']}")
+            return zone_id, furniture_id, drawer_id
+
+        ids = [_integer(row.get(key), key) for key in ('zone_id', 'furniture_id', 'drawer_id')]
+        if any(value is None for value in ids):
+            raise ValueError('Emplacement manquant (zone, furniture, drawer ou zone_id, furniture_id, drawer_id)')
+        zone_id, furniture_id, drawer_id = ids
+        if zone_id not in self.zones:
+            raise ValueError(f"La zone avec l'ID {zone_id} n'existe pas")
+        if furniture_id not in self.furniture:
+            raise ValueError(f"Le meuble avec l'ID {furniture_id} n'existe pas")
+        if drawer_id not in self.drawers:
+            raise ValueError(f"Le tiroir avec l'ID {drawer_id} n'existe pas")
+        if self.furniture[furniture_id].zone_id != zone_id or self.drawers[drawer_id].furniture_id != furniture_id:
+            raise ValueError("Le tiroir, le meuble et la zone ne correspondent pas")
+        return zone_id, furniture_id, drawer_id
+
+
+def _first_value(row, keys):
+    for key in keys:
+        value = row.get(key)
+        if value is not None and str(value).strip():
+            return str(value).strip()
+    return None
+
+
+def _integer(value, field):
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f'{field}: entier attendu')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field}: entier attendu')
+
+
+def _boolean(value):
+    if isinstance(value, bool) or value is None:
+        return bool(value)
+    text_value = str(value).strip().lower()
+    if text_value in TRUE_VALUES:
+        return True
+    if text_value in FALSE_VALUES:
+        return False
+    raise ValueError(f'is_temporary: valeur invalide ({value})')
+
+
+def build_row(row, locations, created_at):
+    """
+    Valeurs des colonnes de l'article décrit par une ligne du fichier
+
+    Raises:
+        ValueError: ligne invalide
+    """
+    name = row.get('name')
+    name = str(name).strip() if name is not None else ''
+    if not name:
+        raise ValueError("Le nom de l'article est requis")
+    if len(name) > NAME_MAX_LENGTH:
+        raise ValueError(f'Nom trop long ({len(name)} caractères, {NAME_MAX_LENGTH} au maximum)')
+
+    stock = _integer(row.get('stock'), 'stock')
+    if stock is None:
+        stock = 1
+    if stock < 0:
+        raise ValueError('stock: valeur positive attendue')
+
+    values = {
+        'name': name,
+        'search_name': normalize_search_text(name),
+        'stock': stock,
+        'is_temporary': _boolean(row.get('is_temporary')),
+        'created_at': created_at,
+        'active_loan_count': 0,
+        'borrowed_quantity': 0,
+        'version_id': 1,
+    }
+    if values['is_temporary']:
+        values.update(zone_id=None, furniture_id=None, drawer_id=None,
+                      zone=None, mobilier=None, niveau_tiroir=None,
+                      location_path=Item.format_location(True, None, None, None))
+        return values
+
+    zone_id, furniture_id, drawer_id = locations.resolve(row)
+    zone_name = locations.zones[zone_id].name
+    furniture_name = locations.furniture[furniture_id].name
+    drawer_name = locations.drawers[drawer_id].name
+    values.update(zone_id=zone_id, furniture_id=furniture_id, drawer_id=drawer_id,
+                  zone=zone_name, mobilier=furniture_name, niveau_tiroir=drawer_name,
+                  location_path=Item.format_location(False, zone_name, furniture_name, drawer_name))
+    return values
+
+
+# --- Doublons ---
+
+def item_key(values):
+    """Clé de doublon d'un article permanent : même nom au même emplacement"""
+    return values['name'], values['zone_id'], values['furniture_id'], values['drawer_id']
+
+
+def existing_items(keys):
+    """
+    Articles permanents existants ayant l'une des clés item_key() données (une requête sur les noms)
+
+    Returns:
+        dict: clé -> identifiant de l'article existant
+    """
+    if not keys:
+        return {}
+    rows = db.session.execute(
+        select(Item.id, Item.name, Item.zone_id, Item.furniture_id, Item.drawer_id)
+        .where(Item.name.in_({key[0] for key in keys}), Item.is_temporary == False)
+    ).all()
+    found = {}
+    for row in rows:
+        key = (row.name, row.zone_id, row.furniture_id, row.drawer_id)
+        if key in keys:
+            found[key] = row.id
+    return found
+
+
+def _drop_duplicates(chunk, seen, report):
+    """
+    Écarte d'un bloc les articles permanents déjà présents plus haut dans le fichier ou déjà en base
+
+    Args:
+        chunk: [(numéro de ligne, valeurs)] du bloc
+        seen: clé -> numéro de la première ligne, pour tout le fichier (complété ici)
+        report: ImportReport où signaler les lignes écartées
+
+    Returns:
+        list: valeurs des lignes retenues, dans l'ordre
+    """
+    lines = {}
+    for line_number, values in chunk:
+        if values['is_temporary']:
+            continue
+        key = item_key(values)
+        if key in seen:
+            lines[line_number] = f'Article présent plusieurs fois dans le fichier (ligne {seen[key]})'
+        else:
+            seen[key] = line_number
+    existing = existing_items({item_key(values) for line_number, values in chunk
+                               if not values['is_temporary'] and line_number not in lines})
+    rows = []
+    for line_number, values in chunk:
+        if not values['is_temporary'] and line_number not in lines and item_key(values) in existing:
+            lines[line_number] = f"Un article nommé '{values['name']}' existe déjà à cet emplacement."
+        if line_number in lines:
+            report.add_error(line_number, lines[line_number])
+        else:
+            rows.append(values)
+    return rows
+
+
+# --- Insertion ---
+
+def _insert_rows(rows):
+    """Insère un bloc d'articles ; retourne les identifiants des articles créés"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return _copy_rows(rows)
+    # executemany de SQLAlchemy : INSERT ... VALUES (...), (...) ... RETURNING id par lots
+    # (plus rapide sous SQLite que l'executemany du pilote, qui exécute l'INSERT ligne par ligne)
+    return db.session.execute(insert(Item.__table__).returning(Item.id), rows).scalars().all()
+
+
+def _copy_rows(rows):
+    """
+    PostgreSQL : COPY du bloc dans une table temporaire puis un seul INSERT ... SELECT
+    (les identifiants sont attribués par la séquence de item)
+    """
+    columns = ', '.join(IMPORT_COLUMNS)
+    connection = db.session.connection()
+    # Table supprimée à la validation du bloc
+    connection.execute(text(
+        f"CREATE TEMPORARY TABLE item_import ON COMMIT DROP AS "
+        f"SELECT {columns} FROM item WITH NO DATA"
+    ))
+
+    # Format CSV du COPY : champ vide non cité = NULL
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    for row in rows:
+        writer.writerow(_copy_value(row[column]) for column in IMPORT_COLUMNS)
+    buffer.seek(0)
+
+    cursor = connection.connection.driver_connection.cursor()
+    try:
+        copy_sql = f"COPY item_import ({columns}) FROM STDIN WITH (FORMAT csv)"
+        if hasattr(cursor, 'copy_expert'):  # psycopg2
+            cursor.copy_expert(copy_sql, buffer)
+        else:  # psycopg 3
+            with cursor.copy(copy_sql) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+    return connection.execute(text(
+        f"INSERT INTO item ({columns}) SELECT {columns} FROM item_import RETURNING id"
+    )).scalars().all()
+
+
+def _copy_value(value):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return value
+
+
+def record_initial_stock(item_ids, user_id, created_at):
+    """Stock de départ des articles créés dans le journal des mouvements (un INSERT ... SELECT)"""
+    item = Item.__table__
+    first, last = min(item_ids), max(item_ids)
+    # Identifiants consécutifs (cas courant) : un intervalle plutôt qu'une liste
+    selected = item.c.id.between(first, last) if last - first + 1 == len(item_ids) else item.c.id.in_(item_ids)
+    db.session.execute(insert(StockMovement.__table__).from_select(
+        ['item_id', 'zone_id', 'delta', 'stock_after', 'reason', 'user_id', 'created_at'],
+        select(item.c.id, item.c.zone_id, item.c.stock, item.c.stock, literal(StockMovement.CREATE),
+               literal(user_id, db.Integer), literal(created_at, db.DateTime))
+        .where(selected, item.c.stock != 0)
+    ))
+
+
+def _import_chunk(rows, user_id, created_at):
+    item_ids = _insert_rows(rows)
+    record_initial_stock(item_ids, user_id, created_at)
+    # Un événement par bloc : les clients du flux ne reçoivent pas un message par article
+    publish(STOCK, action='imported', item_ids=item_ids)
+    DataVersion.touch(DataVersion.INVENTORY)
+    DataVersion.touch(DataVersion.ITEM_NAMES)
+    db.session.commit()
+    return len(item_ids)
+
+
+# --- Import ---
+
+def import_items(stream, file_format, dry_run=False, user_id=None, chunk_size=None):
+    """
+    Importe les articles d'un fichier lu en flux
+
+    Args:
+        stream: flux binaire du fichier (UTF-8)
+        file_format: 'csv' ou 'ndjson'
+        dry_run: valider seulement (aucune écriture) ; `imported` compte alors les lignes valides
+        user_id: utilisateur à l'origine de l'import (journal des mouvements de stock)
+        chunk_size: taille des blocs (défaut ITEM_IMPORT_CHUNK_SIZE)
+
+    Returns:
+        ImportReport
+
+    Raises:
+        ItemImportError: format inconnu ou fichier illisible
+    """
+    if file_format not in READERS:
+        raise ItemImportError(f"Format d'import inconnu: {file_format} (csv ou ndjson)")
+    chunk_size = chunk_size or CHUNK_SIZE
+    report = ImportReport(dry_run)
+    locations = LocationMap()
+    created_at = datetime.utcnow()
+
+    chunk = []
+    # Articles permanents déjà lus : clé -> première ligne (répétitions d'un bloc à l'autre)
+    seen = {}
+
+    def flush():
+        rows = _drop_duplicates(chunk, seen, report)
+        if rows:
+            report.imported += len(rows) if dry_run else _import_chunk(rows, user_id, created_at)
+
+    try:
+        for line_number, row in READERS[file_format](stream):
+            report.total += 1
+            if isinstance(row, str):
+                report.add_error(line_number, row)
+                continue
+            try:
+                chunk.append((line_number, build_row(row, locations, created_at)))
+            except ValueError as e:
+                report.add_error(line_number, str(e))
+                continue
+            if len(chunk) >= chunk_size:
+                flush()
+                chunk.clear()
+        if chunk:
+            flush()
+    except (UnicodeDecodeError, csv.Error) as e:
+        # Lecture impossible au milieu du fichier : les blocs déjà validés restent importés
+        message = 'Le fichier doit être encodé en UTF-8' if isinstance(e, UnicodeDecodeError) else 'CSV invalide'
+        raise ItemImportError(f'{message} ({e}) ; {report.imported} article(s) déjà importé(s)')
+    finally:
+        if report.imported and not dry_run:
+            # Index reconstruit au prochain appel plutôt que corrigé article par article
+            autocomplete_index.invalidate()
+
+    logger.info(f"Import d'articles ({file_format}{', simulation' if dry_run else ''}): "
+                f"{report.imported}/{report.total} ligne(s), {report.error_count} erreur(s)")
+    return report
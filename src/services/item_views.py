@@ -0,0 +1,93 @@
+"""
+Chargement groupé des "vues article" : article, noms d'emplacement et état d'emprunt.
+
+Le nombre de requêtes est constant quel que soit le nombre d'articles :
+une seule requête pour les articles, avec zone/meuble/tiroir chargés par jointure.
+L'état d'emprunt provient des compteurs dénormalisés Item.active_loan_count / borrowed_quantity.
+"""
+from sqlalchemy.orm import joinedload
+from src.models import db
+from src.models.item import Item
+from src.models.location import Zone, Furniture, Drawer
+
+
+class ItemView:
+    """
+    Article accompagné de ses noms d'emplacement et de son état d'emprunt
+    """
+    __slots__ = ('item',)
+
+    def __init__(self, item):
+        self.item = item
+
+    @property
+    def active_loan_count(self):
+        return self.item.active_loan_count
+
+    @property
+    def borrowed_quantity(self):
+        return self.item.borrowed_quantity
+
+    @property
+    def is_borrowed(self):
+        return self.item.is_borrowed
+
+    @property
+    def zone_name(self):
+        return self.item.zone_rel.name if self.item.zone_rel else None
+
+    @property
+    def furniture_name(self):
+        return self.item.furniture_rel.name if self.item.furniture_rel else None
+
+    @property
+    def drawer_name(self):
+        return self.item.drawer_rel.name if self.item.drawer_rel else None
+
+    @property
+    def location_info(self):
+        return self.item.location_info
+
+
+def location_options():
+    """Options de chargement des emplacements d'un article en une seule requête"""
+    return (
+        joinedload(Item.zone_rel),
+        joinedload(Item.furniture_rel),
+        joinedload(Item.drawer_rel),
+    )
+
+
+def load_item_views(query):
+    """
+    Exécute une requête sur Item et retourne la liste des ItemView correspondantes
+
+    Args:
+        query: requête SQLAlchemy portant sur Item (filtres, tri et limite déjà appliqués)
+
+    Returns:
+        list: ItemView dans l'ordre de la requête
+    """
+    return [ItemView(item) for item in query.options(*location_options()).all()]
+
+
+def get_item_view(item_id):
+    """Retourne l'ItemView d'un article, ou None s'il n'existe pas"""
+    views = load_item_views(db.session.query(Item).filter(Item.id == item_id))
+    return views[0] if views else None
+
+
+def location_rows(query=None):
+    """
+    Requête par colonnes (sans entités ORM) : id, name, is_temporary et noms d'emplacement.
+    Adaptée aux gros volumes (index en mémoire, exports).
+    """
+    if query is None:
+        query = db.session.query(Item.id, Item.name, Item.is_temporary)
+    return query.add_columns(
+        Zone.name.label('zone_name'),
+        Furniture.name.label('furniture_name'),
+        Drawer.name.label('drawer_name')
+    ).outerjoin(Zone, Item.zone_id == Zone.id) \
+        .outerjoin(Furniture, Item.furniture_id == Furniture.id) \
+        .outerjoin(Drawer, Item.drawer_id == Drawer.id)
@@ -0,0 +1,143 @@
+"""
+Cache en mémoire (un par worker) de la hiérarchie des emplacements.
+
+Zones, meubles et tiroirs changent rarement mais sont lus en permanence (libellés
+d'emplacement, validation des formulaires, contexte de l'IA). Le cache garde des
+dictionnaires id -> tuple (nom et lien vers le parent), remplacés d'un bloc à chaque
+rechargement.
+
+Fraîcheur :
+- dans ce worker, le cache est vidé après chaque transaction qui écrit un emplacement ;
+- pour les écritures des autres workers, le compteur de version `locations` (table
+  data_version) est relu au plus toutes les LOCATION_CACHE_CHECK_INTERVAL secondes,
+  et immédiatement quand une validation ne trouve pas un identifiant.
+"""
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from src.models import db
+from src.models.data_version import DataVersion, on_version_change
+from src.models.item import Item
+from src.models.location import Zone, Furniture, Drawer
+
+logger = logging.getLogger(__name__)
+
+ZoneEntry = namedtuple('ZoneEntry', 'id name')
+FurnitureEntry = namedtuple('FurnitureEntry', 'id name zone_id')
+DrawerEntry = namedtuple('DrawerEntry', 'id name furniture_id')
+
+# Instantané immuable : version + dictionnaires id -> entrée
+_Snapshot = namedtuple('_Snapshot', 'version zones furniture drawers')
+
+
+class LocationCache:
+    """
+    Cache versionné des zones, meubles et tiroirs
+    """
+
+    def __init__(self, check_interval=None):
+        self.check_interval = check_interval if check_interval is not None \
+            else float(os.getenv('LOCATION_CACHE_CHECK_INTERVAL', '2'))
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._checked_at = 0.0
+
+    def invalidate(self):
+        """Force un rechargement au prochain accès"""
+        self._snapshot = None
+
+    def _load(self):
+        version = DataVersion.get(DataVersion.LOCATIONS)
+        zones = {row.id: ZoneEntry(row.id, row.name)
+                 for row in db.session.query(Zone.id, Zone.name)}
+        furniture = {row.id: FurnitureEntry(row.id, row.name, row.zone_id)
+                     for row in db.session.query(Furniture.id, Furniture.name, Furniture.zone_id)}
+        drawers = {row.id: DrawerEntry(row.id, row.name, row.furniture_id)
+                   for row in db.session.query(Drawer.id, Drawer.name, Drawer.furniture_id)}
+        logger.debug(f"Cache des emplacements chargé (version {version}): "
+                     f"{len(zones)} zones, {len(furniture)} meubles, {len(drawers)} tiroirs")
+        return _Snapshot(version, zones, furniture, drawers)
+
+    def _current(self, force_check=False):
+        snapshot = self._snapshot
+        if snapshot is not None and not force_check \
+                and time.monotonic() - self._checked_at < self.check_interval:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or DataVersion.get(DataVersion.LOCATIONS) != snapshot.version:
+                snapshot = self._snapshot = self._load()
+            self._checked_at = time.monotonic()
+        return snapshot
+
+    def check_version(self):
+        """Relit tout de suite le compteur de version (avant une validation en masse)"""
+        self._current(force_check=True)
+
+    # --- Lecture ---
+
+    def names(self, zone_id, furniture_id, drawer_id):
+        """Retourne (nom de zone, nom de meuble, nom de tiroir), None pour un identifiant inconnu"""
+        snapshot = self._current()
+        zone = snapshot.zones.get(zone_id)
+        furniture = snapshot.furniture.get(furniture_id)
+        drawer = snapshot.drawers.get(drawer_id)
+        return (
+            zone.name if zone else None,
+            furniture.name if furniture else None,
+            drawer.name if drawer else None
+        )
+
+    def location_info(self, is_temporary, zone_id, furniture_id, drawer_id):
+        """Libellé d'emplacement d'un article (voir Item.format_location)"""
+        if is_temporary:
+            return Item.format_location(True, None, None, None)
+        return Item.format_location(False, *self.names(zone_id, furniture_id, drawer_id))
+
+    def validate(self, zone_id, furniture_id, drawer_id):
+        """
+        Vérifie que la zone, le meuble et le tiroir existent et s'emboîtent
+        (tiroir dans le meuble, meuble dans la zone)
+
+        Returns:
+            str: message d'erreur, ou None si l'emplacement est valide
+        """
+        error = self._validate(self._current(), zone_id, furniture_id, drawer_id)
+        if error:
+            # Emplacement peut-être créé ou déplacé par un autre worker : vérifier la version tout de suite
+            error = self._validate(self._current(force_check=True), zone_id, furniture_id, drawer_id)
+        return error
+
+    @staticmethod
+    def _validate(snapshot, zone_id, furniture_id, drawer_id):
+        if zone_id not in snapshot.zones:
+            return f"La zone avec l'ID {zone_id} n'existe pas"
+        if furniture_id not in snapshot.furniture:
+            return f"Le meuble avec l'ID {furniture_id} n'existe pas"
+        if drawer_id not in snapshot.drawers:
+            return f"Le tiroir avec l'ID {drawer_id} n'existe pas"
+        if snapshot.furniture[furniture_id].zone_id != zone_id \
+                or snapshot.drawers[drawer_id].furniture_id != furniture_id:
+            return "Le tiroir, le meuble et la zone ne correspondent pas"
+        return None
+
+    def zones(self):
+        """Zones triées par nom"""
+        return sorted(self._current().zones.values(), key=lambda entry: entry.name)
+
+    def furniture(self):
+        """Meubles triés par nom"""
+        return sorted(self._current().furniture.values(), key=lambda entry: entry.name)
+
+    def drawers(self):
+        """Tiroirs triés par nom"""
+        return sorted(self._current().drawers.values(), key=lambda entry: entry.name)
+
+
+# Instance singleton du cache
+location_cache = LocationCache()
+
+on_version_change(DataVersion.LOCATIONS, location_cache.invalidate)
@@ -0,0 +1,173 @@
+"""
+Mise en page des tableaux des rapports PDF (reportlab, sans accès à la base).
+
+Chaque ligne du tableau est découpée (textes renvoyés à la ligne, hauteur de la ligne) puis
+rendue en un fragment de code PDF (cadres des cellules et objet texte de reportlab), dessiné à
+partir du coin supérieur gauche de la ligne (y = 0, vers le bas). services/pdf_reports.py rend
+ces fragments par blocs, dans un pool de processus pour les gros rapports, puis les place dans
+les pages du document final : ce module est importé par les processus du pool et ne dépend que
+de reportlab.
+
+Un fragment désigne ses polices par leur nom interne au document (/F1, /F2...), attribué dans
+l'ordre d'enregistrement : new_canvas() enregistre les mêmes polices, substitutions comprises,
+dans le même ordre sur chaque canvas, et font_names() permet de vérifier que les noms du canvas
+de travail d'un processus sont ceux du document final.
+"""
+import io
+from collections import namedtuple
+from functools import lru_cache
+from reportlab import rl_config
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase.pdfmetrics import getFont, stringWidth
+from reportlab.pdfgen.canvas import Canvas
+
+# Flux compressés en binaire : sans l'encodage ASCII85 (fait en Python pur sans l'extension
+# rl_accel), le document est 25 % plus petit et plus rapide à écrire
+rl_config.useA85 = 0
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 36
+CONTENT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+
+FONT = 'Helvetica'
+FONT_BOLD = 'Helvetica-Bold'
+# Polices enregistrées sur chaque canvas : polices des tableaux puis polices de substitution
+FONTS = tuple(dict.fromkeys([FONT, FONT_BOLD] + [substitution.fontName
+                                                 for font in (FONT, FONT_BOLD)
+                                                 for substitution in getFont(font).substitutionFonts]))
+FONT_SIZE = 8
+LEADING = 10
+PADDING = 3
+# Hauteur d'une ligne de tableau sur une seule ligne de texte
+ROW_HEIGHT = LEADING + 2 * PADDING
+# Hauteur d'une bande de titre de section
+BAND_HEIGHT = ROW_HEIGHT + 2
+
+# Colonne d'un tableau : titre, largeur (points), alignement ('left' ou 'center')
+Column = namedtuple('Column', 'title width align')
+# Ligne de tableau découpée : hauteur (points), lignes de texte de chaque cellule
+RowLayout = namedtuple('RowLayout', 'height cells')
+
+
+def new_canvas(output, **kwargs):
+    """Canvas A4 avec les polices enregistrées dans l'ordre commun à tous les canvas"""
+    canvas = Canvas(output, pagesize=A4, **kwargs)
+    register_fonts(canvas)
+    return canvas
+
+
+def register_fonts(canvas):
+    """
+    Enregistre les polices des tableaux et leurs polices de substitution (caractères hors
+    Latin-1), toujours dans le même ordre : leurs noms internes (/F1, /F2...) sont alors les
+    mêmes sur le canvas de travail d'un processus du pool et sur le document final
+    """
+    for font in FONTS:
+        canvas.setFont(font, FONT_SIZE)
+
+
+def font_names(canvas):
+    """Noms internes des polices sur un canvas, lus dans le code d'un objet texte"""
+    names = []
+    for font in FONTS:
+        text = canvas.beginText()
+        text.setFont(font, FONT_SIZE)
+        # "... /F1 8 Tf ..." : nom suivi de la taille et de l'opérateur Tf
+        operators = text.getCode().split()
+        names.append(operators[operators.index('Tf') - 2])
+    return names
+
+
+@lru_cache(maxsize=4096)
+def text_width(text, font):
+    """Largeur d'un texte (mémorisée : chemins d'emplacement, types et dates se répètent d'une ligne à l'autre)"""
+    return stringWidth(text, font, FONT_SIZE)
+
+
+def wrap_text(text, font, width):
+    """Découpe un texte en lignes tenant dans la largeur (les mots trop longs sont coupés)"""
+    if text_width(text, font) <= width:
+        return [text]
+    lines = []
+    for line in simpleSplit(text, font, FONT_SIZE, width) or ['']:
+        while stringWidth(line, font, FONT_SIZE) > width and len(line) > 1:
+            # Mot plus long que la colonne : couper au dernier caractère qui tient
+            cut = len(line) - 1
+            while cut > 1 and stringWidth(line[:cut], font, FONT_SIZE) > width:
+                cut -= 1
+            lines.append(line[:cut])
+            line = line[cut:]
+        lines.append(line)
+    return lines
+
+
+def layout_row(columns, values, font=FONT):
+    """
+    Découpe d'une ligne de tableau : textes de chaque cellule renvoyés à la ligne
+
+    Returns:
+        RowLayout: hauteur de la ligne et lignes de texte de chaque cellule
+    """
+    cells = [wrap_text(str(value), font, column.width - 2 * PADDING)
+             for column, value in zip(columns, values)]
+    return RowLayout(max(len(lines) for lines in cells) * LEADING + 2 * PADDING, cells)
+
+
+def layout_rows(columns, rows):
+    """Découpe d'un bloc de lignes, dans l'ordre"""
+    return [layout_row(columns, row) for row in rows]
+
+
+def row_fragment(canvas, columns, row, font=FONT, fill=None):
+    """
+    Fragment PDF d'une ligne découpée par layout_row(), dessinée à partir de son bord supérieur
+    (y = 0, vers le bas) : cadres des cellules, puis texte (objet texte de reportlab, dont les
+    polices sont celles enregistrées par register_fonts())
+
+    Returns:
+        tuple: (hauteur de la ligne, code PDF)
+    """
+    frames = []
+    text = canvas.beginText()
+    text.setFont(font, FONT_SIZE, LEADING)
+    x = MARGIN
+    for column, lines in zip(columns, row.cells):
+        frames.append(f'{x:.2f} {-row.height:.2f} {column.width:.2f} {row.height:.2f} re')
+        if column.align == 'center':
+            for index, line in enumerate(lines):
+                offset = (column.width - text_width(line, font)) / 2
+                text.setTextOrigin(x + offset, -PADDING - LEADING * (index + 1) + 2)
+                text.textLine(line)
+        else:
+            # Lignes suivantes de la cellule : passage à la ligne du texte (interligne LEADING)
+            text.setTextOrigin(x + PADDING, -PADDING - LEADING + 2)
+            for line in lines:
+                text.textLine(line)
+        x += column.width
+
+    code = ' '.join(frames)
+    if fill is not None:
+        code = f'{fill} g {code} f 0 g {code}'
+    return row.height, f'{code} S {text.getCode()}'
+
+
+def render_rows(columns, rows):
+    """
+    Fragments d'un bloc de lignes, rendus sur un canvas de travail (exécuté dans un processus
+    du pool de services/pdf_reports.py)
+
+    Returns:
+        tuple: (noms internes des polices du canvas de travail, [(hauteur, code PDF)] dans l'ordre des lignes)
+    """
+    canvas = new_canvas(io.BytesIO())
+    return font_names(canvas), [row_fragment(canvas, columns, row) for row in layout_rows(columns, rows)]
+
+
+def draw_band(canvas, top, label):
+    """Dessine une bande de titre sur toute la largeur (titre de section) ; sa hauteur est BAND_HEIGHT"""
+    canvas.setFillGray(0.85)
+    canvas.rect(MARGIN, top - BAND_HEIGHT, CONTENT_WIDTH, BAND_HEIGHT, stroke=0, fill=1)
+    canvas.setFillGray(0)
+    canvas.setFont(FONT_BOLD, FONT_SIZE + 1)
+    canvas.drawString(MARGIN + PADDING, top - PADDING - LEADING + 1, label)
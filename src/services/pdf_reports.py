@@ -0,0 +1,309 @@
+"""
+Rendu des rapports PDF (liste de tout le matériel, emprunts en cours d'un utilisateur) avec reportlab.
+
+Les lignes sont lues par colonnes (sans objets ORM), puis rendues en fragments PDF
+(services/pdf_layout.py) par blocs de CHUNK_PAGES pages : au-delà de PARALLEL_MIN_ROWS lignes,
+dans le pool de REPORT_PDF_PROCESSES processus du worker (créé au premier gros rapport puis
+réutilisé), dans le processus courant sinon. Les fragments sont ensuite répartis dans les
+pages d'un seul document : en-tête du tableau répété sur chaque page, sections par zone (optionnelles) reprises en haut de page, numéros de page. Les textes
+longs passent à la ligne au lieu d'être coupés.
+
+Les fonctions retournent le document en octets ; elles sont appelées par les routes de
+reports_routes.py et par les tâches de fond (services/report_jobs.py), qui leur passent un
+rappel progress(fraction) pour suivre l'avancement.
+"""
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import namedtuple
+from datetime import datetime
+from itertools import repeat
+from src.models import db
+from src.models.borrow import Borrow
+from src.models.data_version import DataVersion
+from src.models.item import Item
+from src.models.location import Zone
+from src.services.pdf_layout import (BAND_HEIGHT, Column, FONT, FONT_BOLD, MARGIN, PAGE_HEIGHT, PAGE_WIDTH,
+                                     ROW_HEIGHT, draw_band, font_names, layout_row, layout_rows, new_canvas,
+                                     render_rows, row_fragment)
+
+logger = logging.getLogger(__name__)
+
+# Type de rapport de la liste du matériel dans le cache des rapports
+ALL_ITEMS_PDF_REPORT = 'all-items-pdf'
+
+# Nombre de processus de rendu du pool (1 : rendu dans le processus courant)
+PROCESSES = int(os.getenv('REPORT_PDF_PROCESSES', str(os.cpu_count() or 1)))
+# En dessous de ce nombre de lignes, l'envoi des blocs au pool coûte plus qu'il ne rapporte
+PARALLEL_MIN_ROWS = 5000
+# Taille d'un bloc confié à un processus (en pages de lignes sur une seule ligne de texte)
+CHUNK_PAGES = 20
+
+TITLE_HEIGHT = 48
+FOOTER_HEIGHT = 14
+ROWS_PER_PAGE = int((PAGE_HEIGHT - 2 * MARGIN - FOOTER_HEIGHT) // ROW_HEIGHT) - 1
+CHUNK_ROWS = ROWS_PER_PAGE * CHUNK_PAGES
+
+ITEM_COLUMNS = (
+    Column('ID', 40, 'center'),
+    Column('Nom', 170, 'left'),
+    Column('Emplacement', 200, 'left'),
+    Column('Type', 60, 'center'),
+    Column('Créé le', 53, 'center'),
+)
+
+LOAN_COLUMNS = (
+    Column('#', 25, 'center'),
+    Column('Article', 170, 'left'),
+    Column('Emplacement', 178, 'left'),
+    Column('Qté', 35, 'center'),
+    Column("Emprunté le", 55, 'center'),
+    Column('Retour prévu', 60, 'center'),
+)
+
+# Titre de section placé dans une page (dessiné directement sur le document final)
+Band = namedtuple('Band', 'label')
+
+# Titre de section des articles sans zone (articles temporaires, emplacement non renseigné)
+NO_ZONE_SECTION = 'Sans zone'
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def render_pool():
+    """
+    Pool de processus de rendu du worker, créé au premier appel puis réutilisé par tous les
+    rapports (None si REPORT_PDF_PROCESSES vaut 1)
+    """
+    global _pool, _pool_pid
+    if PROCESSES <= 1:
+        return None
+    with _pool_lock:
+        # Pool d'un autre processus : worker créé par fork après le premier rapport
+        if _pool is None or _pool_pid != os.getpid():
+            # spawn : pas de fork d'un worker qui a des threads et des connexions ouvertes
+            _pool = ProcessPoolExecutor(max_workers=PROCESSES, mp_context=multiprocessing.get_context('spawn'))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def shutdown_render_pool():
+    """Arrête le pool de rendu (recréé au prochain gros rapport)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown()
+        _pool = None
+
+
+def _fragments(canvas, columns, rows, progress=None):
+    """Fragments de toutes les lignes, dans l'ordre (rendu par blocs, en parallèle si utile)"""
+    chunks = [rows[start:start + CHUNK_ROWS] for start in range(0, len(rows), CHUNK_ROWS)]
+    pool = render_pool() if len(rows) >= PARALLEL_MIN_ROWS else None
+    if pool is not None:
+        try:
+            return _parallel_fragments(pool, canvas, columns, chunks, progress)
+        except BrokenProcessPool:
+            logger.warning('Pool de rendu PDF interrompu, rendu dans le processus courant')
+            shutdown_render_pool()
+
+    fragments = []
+    for done, chunk in enumerate(chunks, 1):
+        fragments.extend(row_fragment(canvas, columns, row) for row in layout_rows(columns, chunk))
+        if progress:
+            progress(0.9 * done / len(chunks))
+    return fragments
+
+
+def _parallel_fragments(pool, canvas, columns, chunks, progress):
+    expected = font_names(canvas)
+    fragments = []
+    for done, (names, chunk) in enumerate(pool.map(render_rows, repeat(columns), chunks), 1):
+        if names != expected:
+            raise RuntimeError(f'Polices du pool de rendu ({names}) différentes du document ({expected})')
+        fragments.extend(chunk)
+        if progress:
+            progress(0.9 * done / len(chunks))
+    return fragments
+
+
+def render_table(title, subtitle, columns, rows, sections=None, empty_message=None, progress=None):
+    """
+    Document PDF d'un tableau sur plusieurs pages
+
+    Args:
+        title: titre (première page et pied de page)
+        subtitle: sous-titre de la première page
+        columns: colonnes (pdf_layout.Column)
+        rows: liste de tuples de textes, un par colonne
+        sections: titre de section de chaque ligne (lignes déjà groupées par section), ou None
+        empty_message: texte affiché s'il n'y a aucune ligne
+        progress: rappel optionnel appelé avec la fraction du rendu effectuée (0 à 1)
+    """
+    output = io.BytesIO()
+    canvas = new_canvas(output, pageCompression=1)
+    canvas.setTitle(title)
+    fragments = _fragments(canvas, columns, rows, progress)
+    header_layout = layout_row(columns, [column.title for column in columns], font=FONT_BOLD)
+    header_height, header = row_fragment(canvas, columns, header_layout, font=FONT_BOLD, fill=0.9)
+    bottom = MARGIN + FOOTER_HEIGHT
+
+    # Répartition des fragments dans les pages : [(ordonnée du haut, code ou titre de section)]
+    # par page
+    pages = []
+    section = None
+
+    def start_page(continued):
+        page = []
+        pages.append(page)
+        y = PAGE_HEIGHT - MARGIN - (0 if len(pages) > 1 else TITLE_HEIGHT)
+        if fragments:
+            page.append((y, header))
+            y -= header_height
+        if continued and section is not None:
+            page.append((y, Band(f'{section} (suite)')))
+            y -= BAND_HEIGHT
+        return page, y
+
+    page, y = start_page(continued=False)
+    for index, (height, code) in enumerate(fragments):
+        if sections is not None and sections[index] != section:
+            section = sections[index]
+            # Pas de titre de section seul en bas de page
+            if y - BAND_HEIGHT - height < bottom:
+                page, y = start_page(continued=False)
+            page.append((y, Band(section)))
+            y -= BAND_HEIGHT
+        if y - height < bottom:
+            page, y = start_page(continued=True)
+        page.append((y, code))
+        y -= height
+
+    for number, page in enumerate(pages, 1):
+        if number == 1:
+            canvas.setFont(FONT_BOLD, 14)
+            canvas.drawCentredString(PAGE_WIDTH / 2, PAGE_HEIGHT - MARGIN - 16, title)
+            canvas.setFont(FONT, 9)
+            canvas.drawCentredString(PAGE_WIDTH / 2, PAGE_HEIGHT - MARGIN - 32, subtitle)
+            if not fragments and empty_message:
+                canvas.setFont(FONT, 11)
+                canvas.drawString(MARGIN, PAGE_HEIGHT - MARGIN - TITLE_HEIGHT - 12, empty_message)
+        canvas.setLineWidth(0.5)
+        for top, entry in page:
+            if isinstance(entry, Band):
+                draw_band(canvas, top, entry.label)
+            else:
+                canvas.addLiteral(f'q 1 0 0 1 0 {top:.2f} cm {entry} Q')
+        canvas.setFont(FONT, 7)
+        canvas.drawString(MARGIN, MARGIN, title)
+        canvas.drawRightString(PAGE_WIDTH - MARGIN, MARGIN, f'Page {number} / {len(pages)}')
+        canvas.showPage()
+    canvas.save()
+
+    if progress:
+        progress(1)
+    return output.getvalue()
+
+
+def _date(value, fmt='%d/%m/%Y'):
+    return value.strftime(fmt) if value else 'N/A'
+
+
+def all_items_pdf(by_zone=False, progress=None):
+    """
+    PDF listant tous les articles (matériel), triés par nom
+
+    Args:
+        by_zone: une section par zone (articles triés par zone puis par nom)
+        progress: rappel optionnel appelé avec la fraction du rendu effectuée (0 à 1)
+    """
+    # Le document est servi depuis le cache tant que l'inventaire ne change pas : il indique
+    # la version et la date de l'état rendu, pas une date de téléchargement
+    version = DataVersion.get(DataVersion.INVENTORY)
+    rendered_at = datetime.now()
+    query = db.session.query(Item.id, Item.name, Item.location_path, Item.is_temporary, Item.created_at,
+                             Zone.name.label('zone_name')) \
+        .outerjoin(Zone, Item.zone_id == Zone.id)
+    if by_zone:
+        query = query.order_by(Zone.name.is_(None), Zone.name, Zone.id)
+    query = query.order_by(Item.name, Item.id)
+
+    rows = []
+    sections = [] if by_zone else None
+    for item in query:
+        rows.append((
+            str(item.id),
+            item.name,
+            item.location_path or 'N/A',
+            'Temporaire' if item.is_temporary else 'Permanent',
+            _date(item.created_at, '%d/%m/%y'),
+        ))
+        if by_zone:
+            sections.append(item.zone_name or NO_ZONE_SECTION)
+
+    return render_table(
+        'Liste de tout le matériel',
+        f'Inventaire version {version} au {rendered_at.strftime("%d/%m/%Y %H:%M:%S")} - {len(rows)} article(s)',
+        ITEM_COLUMNS, rows, sections,
+        empty_message='Aucun article trouvé.',
+        progress=progress
+    )
+
+
+def user_loans_pdf(user, by_zone=False, progress=None):
+    """
+    PDF des emprunts en cours d'un utilisateur
+
+    Args:
+        user: utilisateur (User)
+        by_zone: une section par zone des articles empruntés
+        progress: rappel optionnel appelé avec la fraction du rendu effectuée (0 à 1)
+    """
+    query = db.session.query(Item.name, Item.location_path, Item.is_temporary, Borrow.quantity,
+                             Borrow.borrow_date, Borrow.expected_return_date, Zone.name.label('zone_name')) \
+        .select_from(Borrow) \
+        .join(Item, Borrow.item_id == Item.id) \
+        .outerjoin(Zone, Item.zone_id == Zone.id) \
+        .filter(Borrow.user_id == user.id, Borrow.return_date == None)
+    if by_zone:
+        query = query.order_by(Zone.name.is_(None), Zone.name, Zone.id)
+    query = query.order_by(Borrow.borrow_date, Borrow.id)
+
+    rows = []
+    sections = [] if by_zone else None
+    for index, loan in enumerate(query, 1):
+        rows.append((
+            str(index),
+            loan.name,
+            'Article temporaire' if loan.is_temporary else (loan.location_path or 'N/A'),
+            str(loan.quantity or 1),
+            _date(loan.borrow_date),
+            _date(loan.expected_return_date),
+        ))
+        if by_zone:
+            sections.append(loan.zone_name or NO_ZONE_SECTION)
+
+    return render_table(
+        'Liste des emprunts',
+        f'Utilisateur: {user.name} - Date: {datetime.now().strftime("%d/%m/%Y")}',
+        LOAN_COLUMNS, rows, sections,
+        empty_message='Aucun emprunt en cours.',
+        progress=progress
+    )
+
+
+def all_items_pdf_name():
+    """Nom de fichier proposé au téléchargement de la liste du matériel"""
+    return f'liste_materiel_{datetime.now().strftime("%Y%m%d")}.pdf'
+
+
+def user_loans_pdf_name(user):
+    """Nom de fichier proposé au téléchargement des emprunts d'un utilisateur"""
+    return f'emprunts_{user.name}_{datetime.now().strftime("%Y%m%d")}.pdf'
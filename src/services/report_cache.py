@@ -0,0 +1,191 @@
+"""
+Cache disque des rapports générés (export CSV des articles, PDF de tout le matériel).
+
+Une entrée est identifiée par le type de rapport, ses paramètres et le compteur de version
+`inventory` (table data_version), incrémenté dans la transaction de toute écriture sur les
+articles et les emplacements. Une entrée n'est donc jamais périmée : après une écriture, les
+requêtes calculent une autre clé et les anciennes entrées disparaissent par éviction.
+
+La clé sert aussi d'ETag fort : le fichier d'une clé est écrit une seule fois (fichier
+temporaire puis renommage atomique) et n'est plus modifié.
+
+Le répertoire est partagé entre workers. La date de modification d'un fichier tient lieu de
+date de dernier accès (mise à jour à chaque lecture) : au-delà de REPORT_CACHE_MAX_BYTES, les
+entrées les moins récemment servies sont supprimées.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from src.models.data_version import DataVersion
+
+logger = logging.getLogger(__name__)
+
+# Fichiers en cours d'écriture : ignorés par l'éviction, supprimés s'ils sont abandonnés depuis plus d'une heure
+_PARTIAL_SUFFIX = '.part'
+_PARTIAL_MAX_AGE = 3600
+
+
+class ReportCache:
+    """
+    Cache LRU de rapports sur disque, borné en taille
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or os.getenv('REPORT_CACHE_DIR') \
+            or os.path.join(tempfile.gettempdir(), 'jpjr-report-cache')
+        self.max_bytes = max_bytes if max_bytes is not None \
+            else int(os.getenv('REPORT_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """REPORT_CACHE_MAX_BYTES=0 désactive le stockage (les ETag restent calculés)"""
+        return self.max_bytes > 0
+
+    def key(self, report, params):
+        """
+        Clé (et ETag) d'un rapport pour la version courante de l'inventaire
+
+        Args:
+            report: type de rapport (ex. 'items-csv')
+            params: dictionnaire des paramètres qui changent le contenu du rapport
+        """
+        version = DataVersion.get(DataVersion.INVENTORY)
+        digest = hashlib.sha256(
+            json.dumps([report, sorted(params.items()), version], ensure_ascii=False).encode('utf-8')
+        ).hexdigest()[:32]
+        return f'{report}-{version}-{digest}'
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """
+        Fichier en cache pour une clé, ouvert en lecture binaire (None s'il n'existe pas), marqué
+        comme utilisé. Le fichier est ouvert ici : une éviction par un autre thread ou worker
+        entre la recherche et l'envoi ne peut plus le faire disparaître. À fermer par l'appelant
+        (send_file le ferme après l'envoi).
+        """
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            cached = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # évincé entre-temps : le fichier ouvert reste lisible
+        return cached
+
+    def put(self, key, data):
+        """Enregistre un rapport déjà rendu en mémoire"""
+        return self._store(key, [data])
+
+    def tee(self, key, chunks):
+        """
+        Générateur qui renvoie les blocs d'un rapport envoyé en flux tout en les écrivant dans
+        le cache. L'entrée n'est créée que si le flux va jusqu'au bout (pas de fichier tronqué si
+        le client se déconnecte).
+        """
+        if not self.enabled:
+            yield from chunks
+            return
+        partial = self._open_partial(key)
+        complete = False
+        try:
+            for chunk in chunks:
+                if partial:
+                    partial.write(chunk)
+                yield chunk
+            complete = True
+        finally:
+            if partial:
+                self._finish(key, partial, complete)
+
+    def _store(self, key, chunks):
+        if not self.enabled:
+            return None
+        partial = self._open_partial(key)
+        if not partial:
+            return None
+        complete = False
+        try:
+            for chunk in chunks:
+                partial.write(chunk)
+            complete = True
+        finally:
+            path = self._finish(key, partial, complete)
+        return path
+
+    def _open_partial(self, key):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            return tempfile.NamedTemporaryFile(prefix=f'{key}.', suffix=_PARTIAL_SUFFIX,
+                                               dir=self.directory, delete=False)
+        except OSError as e:
+            # Le cache est facultatif : le rapport est servi sans être enregistré
+            logger.warning(f"Cache des rapports indisponible ({self.directory}): {e}")
+            return None
+
+    def _finish(self, key, partial, complete):
+        partial.close()
+        try:
+            if not complete or os.path.getsize(partial.name) > self.max_bytes:
+                os.remove(partial.name)
+                return None
+            path = self._path(key)
+            os.replace(partial.name, path)
+        except OSError as e:
+            logger.warning(f"Impossible d'enregistrer le rapport {key} dans le cache: {e}")
+            return None
+        self._evict()
+        return path
+
+    def _evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de la taille maximale"""
+        with self._lock:
+            entries = []
+            total = 0
+            with os.scandir(self.directory) as scan:
+                for entry in scan:
+                    if not entry.is_file():
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    if entry.name.endswith(_PARTIAL_SUFFIX):
+                        # Fichier abandonné par un worker arrêté en cours d'écriture
+                        if time.time() - stat.st_mtime > _PARTIAL_MAX_AGE:
+                            _remove(entry.path)
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+            if total <= self.max_bytes:
+                return
+            for _, size, path in sorted(entries):
+                _remove(path)
+                total -= size
+                logger.debug(f"Rapport retiré du cache: {os.path.basename(path)}")
+                if total <= self.max_bytes:
+                    break
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        # Fichier en cours d'envoi sous Windows : il sera retiré à une prochaine éviction
+        logger.debug(f"Rapport non retiré du cache ({os.path.basename(path)}): {e}")
+
+
+# Instance unique (par worker, répertoire partagé)
+report_cache = ReportCache()
@@ -0,0 +1,217 @@
+"""
+Génération des rapports lourds en arrière-plan.
+
+Une requête crée une tâche (table report_job) et rend la main immédiatement : le rapport est
+produit par un pool de REPORT_JOBS_WORKERS threads du worker qui a reçu la demande, pas par
+le worker de requête. Le client suit l'avancement (GET /reports/jobs/<id>) puis télécharge le
+fichier écrit dans REPORT_JOBS_DIR ; ce répertoire étant partagé, le suivi et le téléchargement
+peuvent être servis par n'importe quel worker.
+
+- Au plus REPORT_JOBS_MAX_PENDING tâches en attente ou en cours par worker : au-delà, la
+  demande est refusée (ReportQueueFull, 503) plutôt que mise en file sans limite.
+- Les fichiers sont supprimés avec leur tâche REPORT_JOBS_TTL secondes après la fin.
+- Une tâche sans avancement depuis REPORT_JOBS_STALE secondes (worker arrêté pendant la
+  génération) est marquée en échec.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from src.models import db
+from src.models.report_job import ReportJob
+from src.models.user import User
+from src.services.pdf_reports import (ALL_ITEMS_PDF_REPORT, all_items_pdf, all_items_pdf_name,
+                                      user_loans_pdf, user_loans_pdf_name)
+from src.services.report_cache import report_cache
+
+logger = logging.getLogger(__name__)
+
+# Écart minimal (points de pourcentage) entre deux enregistrements de l'avancement
+PROGRESS_STEP = 5
+
+
+class ReportQueueFull(Exception):
+    """Trop de tâches en attente dans ce worker"""
+
+
+# --- Rapports disponibles : fonction(params, progress) -> (octets, nom de fichier) ---
+
+def _all_items_report(params, progress):
+    # Même cache que /reports/all_items_pdf : pas de nouveau rendu si l'inventaire n'a pas changé
+    by_zone = bool(params.get('by_zone'))
+    key = report_cache.key(ALL_ITEMS_PDF_REPORT, {'by_zone': by_zone})
+    cached = report_cache.get(key)
+    if cached:
+        with cached:
+            return cached.read(), all_items_pdf_name()
+    data = all_items_pdf(by_zone=by_zone, progress=progress)
+    report_cache.put(key, data)
+    return data, all_items_pdf_name()
+
+
+def _user_loans_report(params, progress):
+    user = db.session.get(User, params.get('user_id'))
+    if not user:
+        raise ValueError('Utilisateur non trouvé')
+    return user_loans_pdf(user, by_zone=bool(params.get('by_zone')), progress=progress), user_loans_pdf_name(user)
+
+
+REPORT_KINDS = {
+    'all-items-pdf': _all_items_report,
+    'user-loans-pdf': _user_loans_report,
+}
+
+
+class ReportJobRunner:
+    """
+    Pool borné de génération de rapports (un par worker)
+    """
+
+    def __init__(self, workers=None, max_pending=None, directory=None, ttl=None, stale_after=None):
+        self.workers = workers or int(os.getenv('REPORT_JOBS_WORKERS', '2'))
+        self.max_pending = max_pending or int(os.getenv('REPORT_JOBS_MAX_PENDING', '10'))
+        self.directory = directory or os.getenv('REPORT_JOBS_DIR') \
+            or os.path.join(tempfile.gettempdir(), 'jpjr-report-jobs')
+        self.ttl = ttl if ttl is not None else float(os.getenv('REPORT_JOBS_TTL', '3600'))
+        self.stale_after = stale_after if stale_after is not None \
+            else float(os.getenv('REPORT_JOBS_STALE', '900'))
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = 0
+
+    def path(self, job_id):
+        """Chemin du fichier produit par une tâche"""
+        return os.path.join(self.directory, job_id)
+
+    # --- Soumission ---
+
+    def submit(self, app, kind, params, user_id):
+        """
+        Enregistre une tâche et la confie au pool
+
+        Raises:
+            ValueError: type de rapport inconnu
+            ReportQueueFull: trop de tâches en attente dans ce worker
+        """
+        if kind not in REPORT_KINDS:
+            raise ValueError(f"Type de rapport inconnu: {kind}")
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise ReportQueueFull()
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='report-job')
+
+        try:
+            job = ReportJob(id=uuid.uuid4().hex, kind=kind, params=json.dumps(params),
+                            user_id=user_id, status=ReportJob.PENDING)
+            db.session.add(job)
+            db.session.commit()
+            self._executor.submit(self._run, app, job.id)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        return job
+
+    # --- Exécution (threads du pool) ---
+
+    def _run(self, app, job_id):
+        try:
+            with app.app_context():
+                try:
+                    self._execute(job_id)
+                    self.purge_expired()
+                except Exception as e:
+                    logger.error(f"Erreur de la tâche de rapport {job_id}: {e}", exc_info=True)
+                finally:
+                    db.session.remove()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _execute(self, job_id):
+        job = db.session.get(ReportJob, job_id)
+        if job is None or job.status != ReportJob.PENDING:
+            return
+        kind, params = job.kind, json.loads(job.params)
+        db.session.commit()
+        self._update(job_id, status=ReportJob.RUNNING)
+
+        progress = self._progress_callback(job_id)
+        try:
+            data, file_name = REPORT_KINDS[kind](params, progress)
+            self._write(job_id, data)
+        except Exception as e:
+            logger.error(f"Échec de la tâche de rapport {job_id} ({kind}): {e}", exc_info=True)
+            db.session.rollback()
+            self._finish(job_id, status=ReportJob.FAILED, error=str(e))
+            return
+        self._finish(job_id, status=ReportJob.DONE, progress=100, file_name=file_name, file_size=len(data))
+
+    def _progress_callback(self, job_id):
+        last = [0]
+
+        def progress(fraction):
+            percent = min(99, int(fraction * 100))
+            if percent - last[0] >= PROGRESS_STEP:
+                last[0] = percent
+                self._update(job_id, progress=percent)
+        return progress
+
+    def _write(self, job_id, data):
+        os.makedirs(self.directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.directory, prefix=f'{job_id}.', suffix='.part',
+                                         delete=False) as f:
+            f.write(data)
+        os.replace(f.name, self.path(job_id))
+
+    def _finish(self, job_id, **values):
+        now = datetime.utcnow()
+        self._update(job_id, finished_at=now, expires_at=now + timedelta(seconds=self.ttl), **values)
+
+    @staticmethod
+    def _update(job_id, **values):
+        # Connexion dédiée : l'avancement est visible des autres workers sans valider la session
+        # de la tâche (qui garde les objets chargés pour le rendu)
+        with db.engine.begin() as conn:
+            conn.execute(update(ReportJob.__table__).where(ReportJob.__table__.c.id == job_id)
+                         .values(updated_at=datetime.utcnow(), **values))
+
+    # --- Suivi ---
+
+    def check_stale(self, job):
+        """Marque en échec une tâche restée sans avancement (worker arrêté) ; retourne True si c'est le cas"""
+        if job.status not in (ReportJob.PENDING, ReportJob.RUNNING):
+            return False
+        if datetime.utcnow() - job.updated_at < timedelta(seconds=self.stale_after):
+            return False
+        self._finish(job.id, status=ReportJob.FAILED, error='Génération interrompue')
+        db.session.refresh(job)
+        return True
+
+    def purge_expired(self):
+        """Supprime les tâches expirées et leurs fichiers"""
+        expired = db.session.execute(
+            select(ReportJob.id).where(ReportJob.expires_at < datetime.utcnow())
+        ).scalars().all()
+        if not expired:
+            return 0
+        for job_id in expired:
+            try:
+                os.remove(self.path(job_id))
+            except FileNotFoundError:
+                pass
+        db.session.query(ReportJob).filter(ReportJob.id.in_(expired)).delete(synchronize_session=False)
+        db.session.commit()
+        return len(expired)
+
+
+# Instance unique (par worker)
+report_jobs = ReportJobRunner()
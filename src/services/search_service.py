@@ -0,0 +1,92 @@
+"""
+Moteur de recherche des articles par sous-chaîne du nom.
+
+Le nom normalisé (minuscules, sans accents) est stocké dans Item.search_name et indexé :
+- PostgreSQL : index GIN trigramme (extension pg_trgm), classement par similarité
+- SQLite : table FTS5 'item_search' (tokenizer trigram) synchronisée par triggers, classement bm25
+(index installés par la migration 2).
+Si aucun index n'est disponible, la recherche retombe sur un LIKE sur search_name.
+"""
+import logging
+from sqlalchemy import case, column, func, literal_column, select, table, text
+from src.models import db
+from src.models.item import Item, normalize_search_text
+
+logger = logging.getLogger(__name__)
+
+# Table FTS5 (SQLite) : rowid = item.id, rank = score bm25
+item_search = table('item_search', column('rowid'), column('rank'))
+
+# Le tokenizer trigram de FTS5 ne sait pas chercher moins de 3 caractères
+FTS_MIN_LENGTH = 3
+
+# Backend retenu par moteur de base ('pg_trgm', 'fts5' ou 'like')
+_backends = {}
+
+
+def detect_backend(engine):
+    """Détermine le backend de recherche disponible dans la base"""
+    with engine.connect() as conn:
+        if engine.dialect.name == 'postgresql':
+            found = conn.execute(text(
+                "SELECT 1 FROM pg_indexes WHERE indexname = 'ix_item_search_name_trgm'"
+            )).first()
+            return 'pg_trgm' if found else 'like'
+        if engine.dialect.name == 'sqlite':
+            found = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'item_search'"
+            )).first()
+            return 'fts5' if found else 'like'
+    return 'like'
+
+
+def get_backend():
+    """Retourne le backend de recherche actif pour le moteur courant"""
+    engine = db.engine
+    if engine not in _backends:
+        _backends[engine] = detect_backend(engine)
+        logger.info(f"Moteur de recherche des articles: {_backends[engine]}")
+    return _backends[engine]
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_items(query, term, ranked=True):
+    """
+    Filtre une requête portant sur Item par sous-chaîne du nom (insensible à la casse et aux accents).
+
+    Args:
+        query: requête SQLAlchemy contenant Item
+        term (str): texte recherché
+        ranked (bool): trier par pertinence (sinon l'ordre de la requête est conservé)
+
+    Returns:
+        La requête filtrée (et triée si ranked=True)
+    """
+    normalized = normalize_search_text(term)
+    if not normalized:
+        return query
+
+    backend = get_backend()
+    escaped = _escape_like(normalized)
+    # Les noms qui commencent par le terme recherché passent en premier
+    prefix_first = case((Item.search_name.like(f'{escaped}%', escape='\\'), 0), else_=1)
+
+    if backend == 'fts5' and len(normalized) >= FTS_MIN_LENGTH:
+        phrase = '"' + normalized.replace('"', '""') + '"'
+        match = literal_column('item_search').op('MATCH')(phrase)
+        if ranked:
+            return query.join(item_search, item_search.c.rowid == Item.id) \
+                .filter(match) \
+                .order_by(prefix_first, item_search.c.rank, Item.name, Item.id)
+        return query.filter(Item.id.in_(select(item_search.c.rowid).where(match)))
+
+    query = query.filter(Item.search_name.like(f'%{escaped}%', escape='\\'))
+    if not ranked:
+        return query
+
+    if backend == 'pg_trgm':
+        return query.order_by(prefix_first, func.similarity(Item.search_name, normalized).desc(), Item.name, Item.id)
+    return query.order_by(prefix_first, Item.name, Item.id)
@@ -34,65 +34,43 @@ document.addEventListener('DOMContentLoaded', function() {
     initModals();
     initDeleteConfirmation();
     
-    // Ajouter des gestionnaires d'événements aux boutons dynamiquement ajoutés
-    document.addEventListener('click', function(event) {
-        // Délégation d'événements pour les boutons qui pourraient être ajoutés dynamiquement
-        if (event.target.closest('.view-zone-furniture')) {
-            const btn = event.target.closest('.view-zone-furniture');
-            const zoneId = btn.getAttribute('data-id');
-            const zoneName = btn.getAttribute('data-name');
-            loadFurnitureForZone(zoneId, zoneName);
-            event.preventDefault();
-        }
-    });
+    // Mises à jour en direct : une écriture sur les emplacements (dans cette page, un autre
+    // onglet ou par un autre administrateur) rafraîchit l'arborescence sans recharger la page
+    if (window.LiveEvents) {
+        LiveEvents.on('location', function() {
+            scheduleRefresh();
+        });
+    }
     
 });
 
 /**
  * Initialiser le panneau des zones et les événements associés
+ * (délégation : la liste des zones est redessinée à chaque rafraîchissement)
  */
 function initZonesPanel() {
     appLog.log('Initialisation du panneau des zones');
     
-    // Événements pour les zones
-    document.querySelectorAll('.view-zone-furniture').forEach(btn => {
-        btn.addEventListener('click', function(e) {
-            e.preventDefault(); // Empêcher le comportement par défaut
-            const zoneId = this.getAttribute('data-id');
-            const zoneName = this.getAttribute('data-name');
+    document.getElementById('zonesContainer').addEventListener('click', function(e) {
+        const btn = e.target.closest('button');
+        if (!btn) return;
+        e.preventDefault(); // Empêcher le comportement par défaut
+        
+        const zoneId = btn.getAttribute('data-id');
+        const zoneName = btn.getAttribute('data-name');
+        if (btn.classList.contains('view-zone-furniture')) {
             appLog.log('Chargement des meubles pour la zone:', zoneName);
             loadFurnitureForZone(zoneId, zoneName);
-        });
-    });
-
-    document.querySelectorAll('.edit-zone').forEach(btn => {
-        btn.addEventListener('click', function(e) {
-            e.preventDefault(); // Empêcher le comportement par défaut
-            const zoneId = this.getAttribute('data-id');
-            const zoneName = this.getAttribute('data-name');
+        } else if (btn.classList.contains('edit-zone')) {
             appLog.log('Ouverture modal d\'édition de zone:', zoneName);
             showZoneModal('edit', zoneId, zoneName);
-        });
-    });
-
-    document.querySelectorAll('.delete-zone, .delete-zone-tree').forEach(btn => {
-        btn.addEventListener('click', function(e) {
-            e.preventDefault(); // Empêcher le comportement par défaut
-            const zoneId = this.getAttribute('data-id');
-            const zoneName = this.getAttribute('data-name');
+        } else if (btn.classList.contains('delete-zone')) {
             appLog.log('Confirmation de suppression de zone:', zoneName);
             showDeleteConfirmation('zone', zoneId, zoneName);
-        });
-    });
-
-    document.querySelectorAll('.add-furniture, .add-furniture-tree').forEach(btn => {
-        btn.addEventListener('click', function(e) {
-            e.preventDefault(); // Empêcher le comportement par défaut
-            const zoneId = this.getAttribute('data-zone-id');
-            const zoneName = this.getAttribute('data-zone-name');
-            appLog.log('Ouverture modal d\'ajout de meuble pour la zone:', zoneName);
-            showFurnitureModal('add', null, zoneId, zoneName);
-        });
+        } else if (btn.classList.contains('add-furniture')) {
+            appLog.log('Ouverture modal d\'ajout de meuble pour la zone:', btn.getAttribute('data-zone-name'));
+            showFurnitureModal('add', null, btn.getAttribute('data-zone-id'), btn.getAttribute('data-zone-name'));
+        }
     });
 
     // Bouton d'ajout de zone
@@ -108,6 +86,170 @@ function initZonesPanel() {
     }
 }
 
+/**
+ * Rafraîchir la liste des zones, l'arborescence et les panneaux ouverts
+ * (regroupe les événements rapprochés en une seule requête)
+ */
+let refreshTimer = null;
+
+function scheduleRefresh(delay = 300) {
+    clearTimeout(refreshTimer);
+    refreshTimer = setTimeout(refreshLocations, delay);
+}
+
+function refreshLocations() {
+    // L'ETag de /tree évite de retransférer l'arborescence si rien n'a changé
+    return fetch('/api/location/tree')
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Erreur lors du chargement des emplacements');
+            }
+            return response.json();
+        })
+        .then(tree => {
+            renderZonesList(tree.zones);
+            renderLocationTree(tree.zones);
+            refreshOpenPanels(tree.zones);
+        })
+        .catch(error => {
+            notificationManager.error(error.message);
+        });
+}
+
+/**
+ * Redessiner la liste des zones
+ */
+function renderZonesList(zones) {
+    document.getElementById('zonesCount').textContent = zones.length;
+    const container = document.getElementById('zonesContainer');
+    if (zones.length === 0) {
+        container.innerHTML = '<div class="empty-message">Aucune zone définie</div>';
+        return;
+    }
+    
+    let html = '<div class="list-group list-group-flush" id="zonesList">';
+    zones.forEach(zone => {
+        html += `
+        <div class="list-group-item d-flex justify-content-between align-items-center zone-item" 
+             data-id="${zone.id}" data-name="${zone.name}">
+            <div>
+                <span class="fw-bold">${zone.name}</span>
+                <small class="text-muted d-block">${zone.furniture.length} meuble(s)</small>
+            </div>
+            <div class="btn-group">
+                <button class="btn btn-outline-primary btn-sm view-zone-furniture action-btn" 
+                        data-id="${zone.id}" data-name="${zone.name}" title="Voir les meubles">
+                    <i class="bi bi-eye"></i>
+                </button>
+                <button class="btn btn-outline-success btn-sm add-furniture action-btn" 
+                        data-zone-id="${zone.id}" data-zone-name="${zone.name}" title="Ajouter un meuble">
+                    <i class="bi bi-plus-lg"></i>
+                </button>
+                <button class="btn btn-outline-secondary btn-sm edit-zone action-btn" 
+                        data-id="${zone.id}" data-name="${zone.name}" title="Modifier la zone">
+                    <i class="bi bi-pencil"></i>
+                </button>
+                <button class="btn btn-outline-danger btn-sm delete-zone action-btn" 
+                        data-id="${zone.id}" data-name="${zone.name}" title="Supprimer la zone">
+                    <i class="bi bi-trash"></i>
+                </button>
+            </div>
+        </div>
+        `;
+    });
+    container.innerHTML = html + '</div>';
+}
+
+/**
+ * Redessiner la structure complète (zone > meuble > tiroir)
+ */
+function renderLocationTree(zones) {
+    const container = document.getElementById('locationTreeView');
+    if (zones.length === 0) {
+        container.innerHTML = '<div class="empty-message">Aucune structure définie</div>';
+        return;
+    }
+    
+    let html = '';
+    zones.forEach(zone => {
+        html += `
+        <div class="list-group-item zone-item d-flex justify-content-between align-items-center">
+            <span><i class="bi bi-geo-alt"></i> <strong>${zone.name}</strong></span>
+            <div>
+                <button class="btn btn-sm btn-outline-success action-btn add-furniture-tree" 
+                        data-zone-id="${zone.id}" data-zone-name="${zone.name}">
+                    <i class="bi bi-plus-lg"></i> Meuble
+                </button>
+                <button class="btn btn-sm btn-outline-danger action-btn delete-zone-tree" 
+                        data-id="${zone.id}" data-name="${zone.name}">
+                    <i class="bi bi-trash"></i>
+                </button>
+            </div>
+        </div>
+        `;
+        zone.furniture.forEach(furniture => {
+            html += `
+            <div class="list-group-item furniture-item d-flex justify-content-between align-items-center">
+                <span><i class="bi bi-cabinet"></i> ${furniture.name}</span>
+                <div>
+                    <button class="btn btn-sm btn-outline-danger action-btn add-drawer-tree" 
+                            data-furniture-id="${furniture.id}" data-furniture-name="${furniture.name}">
+                        <i class="bi bi-plus-lg"></i> Tiroir
+                    </button>
+                    <button class="btn btn-sm btn-outline-danger action-btn delete-furniture-tree" 
+                            data-id="${furniture.id}" data-name="${furniture.name}">
+                        <i class="bi bi-trash"></i>
+                    </button>
+                </div>
+            </div>
+            `;
+            furniture.drawers.forEach(drawer => {
+                html += `
+                <div class="list-group-item drawer-item d-flex justify-content-between align-items-center">
+                    <span><i class="bi bi-inbox"></i> ${drawer.name}</span>
+                    <button class="btn btn-sm btn-outline-danger action-btn delete-drawer-tree" 
+                            data-id="${drawer.id}" data-name="${drawer.name}">
+                        <i class="bi bi-trash"></i>
+                    </button>
+                </div>
+                `;
+            });
+        });
+    });
+    container.innerHTML = html;
+}
+
+/**
+ * Mettre à jour les panneaux meubles / tiroirs ouverts, ou les vider si leur zone ou leur
+ * meuble a été supprimé
+ */
+function refreshOpenPanels(zones) {
+    const zone = zones.find(z => String(z.id) === String(currentZoneId));
+    if (zone) {
+        document.getElementById('selectedZoneName').textContent = zone.name;
+        renderFurnitureList(zone.furniture, zone.id, zone.name);
+    } else if (currentZoneId !== null) {
+        currentZoneId = null;
+        document.getElementById('selectedZoneName').textContent = 'Sélectionnez une zone';
+        document.getElementById('furnitureContainer').innerHTML =
+            '<div class="empty-message">Sélectionnez une zone pour voir ses meubles</div>';
+    }
+    
+    let furniture = null;
+    zones.forEach(z => {
+        furniture = furniture || z.furniture.find(f => String(f.id) === String(currentFurnitureId));
+    });
+    if (furniture) {
+        document.getElementById('selectedFurnitureName').textContent = furniture.name;
+        renderDrawersList(furniture.drawers, furniture.id, furniture.name);
+    } else if (currentFurnitureId !== null) {
+        currentFurnitureId = null;
+        document.getElementById('selectedFurnitureName').textContent = 'Sélectionnez un meuble';
+        document.getElementById('drawerContainer').innerHTML =
+            '<div class="empty-message">Sélectionnez un meuble pour voir ses tiroirs</div>';
+    }
+}
+
 /**
  * Charger les meubles pour une zone spécifique
  */
@@ -357,30 +499,22 @@ function initModals() {
         saveDrawer();
     });
     
-    // Ajouter les événements aux boutons d'ajout de tiroirs dans la vue arborescente
-    document.querySelectorAll('.add-drawer-tree').forEach(btn => {
-        btn.addEventListener('click', function() {
-            const furnitureId = this.getAttribute('data-furniture-id');
-            const furnitureName = this.getAttribute('data-furniture-name');
-            showDrawerModal('add', null, furnitureId, furnitureName);
-        });
-    });
-    
-    // Ajouter les événements aux boutons de suppression dans la vue arborescente
-    document.querySelectorAll('.delete-furniture-tree').forEach(btn => {
-        btn.addEventListener('click', function() {
-            const furnitureId = this.getAttribute('data-id');
-            const furnitureName = this.getAttribute('data-name');
-            showDeleteConfirmation('furniture', furnitureId, furnitureName);
-        });
-    });
-    
-    document.querySelectorAll('.delete-drawer-tree').forEach(btn => {
-        btn.addEventListener('click', function() {
-            const drawerId = this.getAttribute('data-id');
-            const drawerName = this.getAttribute('data-name');
-            showDeleteConfirmation('drawer', drawerId, drawerName);
-        });
+    // Boutons de la vue arborescente (délégation : la vue est redessinée à chaque rafraîchissement)
+    document.getElementById('locationTreeView').addEventListener('click', function(e) {
+        const btn = e.target.closest('button');
+        if (!btn) return;
+        
+        if (btn.classList.contains('add-furniture-tree')) {
+            showFurnitureModal('add', null, btn.getAttribute('data-zone-id'), btn.getAttribute('data-zone-name'));
+        } else if (btn.classList.contains('delete-zone-tree')) {
+            showDeleteConfirmation('zone', btn.getAttribute('data-id'), btn.getAttribute('data-name'));
+        } else if (btn.classList.contains('add-drawer-tree')) {
+            showDrawerModal('add', null, btn.getAttribute('data-furniture-id'), btn.getAttribute('data-furniture-name'));
+        } else if (btn.classList.contains('delete-furniture-tree')) {
+            showDeleteConfirmation('furniture', btn.getAttribute('data-id'), btn.getAttribute('data-name'));
+        } else if (btn.classList.contains('delete-drawer-tree')) {
+            showDeleteConfirmation('drawer', btn.getAttribute('data-id'), btn.getAttribute('data-name'));
+        }
     });
 }
 
@@ -447,9 +581,7 @@ function deleteLocationItem(type, id) {
                 deleteModal.hide();
             }
             
-            setTimeout(() => {
-                window.location.reload();
-            }, 500);
+            refreshLocations();
         })
         .catch(error => {
             notificationManager.error(error.message || 'Erreur inconnue lors de la suppression.');
@@ -537,8 +669,7 @@ function saveZone() {
         const zoneModal = bootstrap.Modal.getInstance(document.getElementById('zoneModal'));
         zoneModal.hide();
         
-        // Recharger la page
-        setTimeout(() => window.location.reload(), 500);
+        refreshLocations();
     })
     .catch(error => {
         notificationManager.error(error.message);
@@ -554,7 +685,7 @@ function showFurnitureModal(mode, furnitureId = null, zoneId, zoneName) {
     // Mise à jour des champs
     document.getElementById('furnitureModalTitle').textContent = mode === 'add' ? 'Ajouter un meuble' : 'Modifier le meuble';
     document.getElementById('furnitureId').value = furnitureId || '';
-    document.getElementById('furnitureName').value = furnitureId ? document.querySelector(`.list-group-item[data-id="${furnitureId}"] .fw-bold`).textContent : '';
+    document.getElementById('furnitureName').value = furnitureId ? document.querySelector(`#furnitureContainer .list-group-item[data-id="${furnitureId}"] .fw-bold`).textContent : '';
     document.getElementById('furnitureDescription').value = '';
     document.getElementById('furnitureZoneId').value = zoneId;
     document.getElementById('furnitureZoneName').value = zoneName;
@@ -597,13 +728,8 @@ function saveFurniture() {
         const furnitureModal = bootstrap.Modal.getInstance(document.getElementById('furnitureModal'));
         furnitureModal.hide();
         
-        // Si nous sommes en train de visualiser la zone concernée, recharger juste les meubles
-        if (currentZoneId === zoneId) {
-            loadFurnitureForZone(zoneId, document.getElementById('furnitureZoneName').value);
-        } else {
-            // Sinon recharger la page
-            setTimeout(() => window.location.reload(), 500);
-        }
+        // Liste des zones, arborescence et panneau des meubles s'il est ouvert
+        refreshLocations();
     })
     .catch(error => {
         notificationManager.error(error.message);
@@ -619,7 +745,7 @@ function showDrawerModal(mode, drawerId = null, furnitureId, furnitureName) {
     // Mise à jour des champs
     document.getElementById('drawerModalTitle').textContent = mode === 'add' ? 'Ajouter un tiroir/niveau' : 'Modifier le tiroir/niveau';
     document.getElementById('drawerId').value = drawerId || '';
-    document.getElementById('drawerName').value = drawerId ? document.querySelector(`.list-group-item[data-id="${drawerId}"] .fw-bold`).textContent : '';
+    document.getElementById('drawerName').value = drawerId ? document.querySelector(`#drawerContainer .list-group-item[data-id="${drawerId}"] .fw-bold`).textContent : '';
     document.getElementById('drawerDescription').value = '';
     document.getElementById('drawerFurnitureId').value = furnitureId;
     document.getElementById('drawerFurnitureName').value = furnitureName;
@@ -662,13 +788,8 @@ function saveDrawer() {
         const drawerModal = bootstrap.Modal.getInstance(document.getElementById('drawerModal'));
         drawerModal.hide();
         
-        // Si nous sommes en train de visualiser le meuble concerné, recharger juste les tiroirs
-        if (currentFurnitureId === furnitureId) {
-            loadDrawersForFurniture(furnitureId, document.getElementById('drawerFurnitureName').value);
-        } else {
-            // Sinon recharger la page
-            setTimeout(() => window.location.reload(), 500);
-        }
+        // Liste des zones, arborescence et panneau des tiroirs s'il est ouvert
+        refreshLocations();
     })
     .catch(error => {
         notificationManager.error(error.message);
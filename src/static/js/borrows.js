@@ -24,14 +24,20 @@ window.loadBorrows = async function() {
         // Vider la liste actuelle
         borrowsList.innerHTML = '<p class="text-center">Chargement des emprunts...</p>';
         
-        // Récupérer les emprunts actifs
-        const response = await fetch('/api/loans?active_only=true');
-        if (!response.ok) {
-            const errorData = await response.json();
-            throw new Error(errorData.error || 'Erreur HTTP ' + response.status);
+        // Récupérer les emprunts actifs (toutes les pages, par échéance)
+        const data = { loans: [] };
+        for (let page = 1; ; page++) {
+            const response = await fetch(`/api/loans?active_only=true&sort=due_date&per_page=200&page=${page}`);
+            if (!response.ok) {
+                const errorData = await response.json();
+                throw new Error(errorData.error || 'Erreur HTTP ' + response.status);
+            }
+            const pageData = await response.json();
+            data.loans.push(...pageData.loans);
+            if (!pageData.has_more) {
+                break;
+            }
         }
-        
-        const data = await response.json();
         appLog.log('Emprunts reçus (format brut):', data);
         
         // Vider la liste une fois les données reçues
@@ -117,6 +123,48 @@ window.loadBorrows = async function() {
     }
 }
 
+// Retourner un ou plusieurs emprunts en une seule requête
+async function returnLoans(loanIds) {
+    const response = await fetch('/api/loans/return-batch', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ loan_ids: loanIds })
+    });
+    
+    const data = await response.json();
+    if (!response.ok) {
+        throw new Error(data.error || 'Erreur lors du retour des articles');
+    }
+    if (!data.returned_count) {
+        throw new Error(data.errors.length ? data.errors[0].error : 'Aucun article retourné');
+    }
+    return data;
+}
+
+// Fonction pour retourner tous les emprunts affichés
+window.handleReturnAll = async function(button) {
+    const loanIds = Array.from(document.querySelectorAll('#borrowsList .return-item'))
+        .map(returnButton => parseInt(returnButton.dataset.borrowId, 10));
+    if (!loanIds.length) {
+        return;
+    }
+    if (!confirm(`Retourner les ${loanIds.length} article(s) emprunté(s) ?`)) {
+        return;
+    }
+    
+    try {
+        button.disabled = true;
+        const data = await returnLoans(loanIds);
+        notificationManager.success(`${data.returned_count} article(s) retourné(s) avec succès`);
+        loadBorrows();
+    } catch (error) {
+        appLog.error('Erreur:', error);
+        notificationManager.error(error.message || 'Erreur lors du retour des articles');
+    } finally {
+        button.disabled = false;
+    }
+}
+
 // Fonction pour gérer le retour d'un article
 window.handleReturn = async function(borrowId, button) {
     // Si le bouton est déjà en mode confirmation, procéder au retour
@@ -125,14 +173,7 @@ window.handleReturn = async function(borrowId, button) {
             button.disabled = true;
             button.innerHTML = '<i class="bi bi-hourglass-split"></i> Traitement...';
             
-            const response = await fetch(`/api/loans/${borrowId}/return`, {
-                method: 'POST'
-            });
-            
-            if (!response.ok) {
-                const errorData = await response.json();
-                throw new Error(errorData.error || 'Erreur lors du retour de l\'article');
-            }
+            await returnLoans([parseInt(borrowId, 10)]);
             
             // Retour réussi
             notificationManager.success('Article retourné avec succès');
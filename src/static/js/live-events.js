@@ -0,0 +1,63 @@
+/**
+ * Flux des changements d'inventaire en direct (Server-Sent Events, /api/events)
+ * Une seule connexion par page ; les modules s'abonnent par sujet :
+ *
+ *     LiveEvents.on('stock', data => { ... });     // {item_id, stock} ou {action: 'imported', item_ids}
+ *     LiveEvents.on('loan', data => { ... });      // {action, loan_id, item_id, user_id, quantity}
+ *     LiveEvents.on('alert', data => { ... });     // {action, item_id, type}
+ *     LiveEvents.on('location', data => { ... });  // {action, kind, id}
+ *
+ * Le navigateur se reconnecte automatiquement et rejoue les événements manqués (Last-Event-ID).
+ */
+window.LiveEvents = (function() {
+    const handlers = {};
+    let source = null;
+
+    function connect() {
+        if (source || typeof EventSource === 'undefined') {
+            return;
+        }
+        source = new EventSource('/api/events');
+        source.onerror = function() {
+            appLog.warn('Flux d\'événements interrompu, reconnexion automatique...');
+        };
+        Object.keys(handlers).forEach(listen);
+    }
+
+    function listen(topic) {
+        source.addEventListener(topic, function(event) {
+            let data;
+            try {
+                data = JSON.parse(event.data);
+            } catch (error) {
+                appLog.error('Événement invalide:', event.data);
+                return;
+            }
+            handlers[topic].forEach(handler => handler(data));
+        });
+    }
+
+    return {
+        /** Les mises à jour en direct sont-elles disponibles dans ce navigateur ? */
+        supported: typeof EventSource !== 'undefined',
+
+        /** Identifiant de l'utilisateur connecté (null si inconnu) */
+        userId: document.body && document.body.dataset.userId ? parseInt(document.body.dataset.userId, 10) : null,
+
+        /**
+         * Enregistre un gestionnaire pour un sujet et ouvre la connexion si nécessaire
+         * @param {string} topic - stock, loan, alert ou location
+         * @param {Function} handler - appelé avec les données de l'événement
+         */
+        on(topic, handler) {
+            if (!handlers[topic]) {
+                handlers[topic] = [];
+                if (source) {
+                    listen(topic);
+                }
+            }
+            handlers[topic].push(handler);
+            connect();
+        }
+    };
+})();
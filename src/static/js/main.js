@@ -15,6 +15,9 @@ document.addEventListener('DOMContentLoaded', async function() {
     let allItems = [];
     let tempItems = [];
     
+    // Taille des pages demandées à /api/items
+    const ITEMS_PAGE_SIZE = 50;
+    
     // Initialiser le datepicker avec la localisation française
     if (flatpickr) {
         try {
@@ -28,14 +31,39 @@ document.addEventListener('DOMContentLoaded', async function() {
         }
     }
     
-    // Charger la liste complète des articles conventionnels
+    // Récupérer une page de /api/items (pagination par curseur)
+    async function fetchItemsPage(params, cursor = null) {
+        const query = new URLSearchParams(params);
+        query.set('limit', String(ITEMS_PAGE_SIZE));
+        if (cursor) query.set('cursor', cursor);
+        
+        const response = await fetch(`/api/items?${query.toString()}`);
+        if (!response.ok) throw new Error('Erreur lors du chargement des articles');
+        
+        const data = await response.json();
+        return {
+            items: Array.isArray(data) ? data : data.items || [],
+            nextCursor: data.next_cursor || null
+        };
+    }
+    
+    // Ajouter des articles au cache local sans doublons
+    function mergeItems(target, items) {
+        const knownIds = new Set(target.map(item => item.id));
+        items.forEach(item => {
+            if (!knownIds.has(item.id)) {
+                target.push(item);
+                knownIds.add(item.id);
+            }
+        });
+    }
+    
+    // Charger la première page des articles conventionnels ; la suite est
+    // récupérée à la demande (recherche, défilement des suggestions)
     async function loadItems() {
         try {
-            const response = await fetch('/api/items');
-            if (!response.ok) throw new Error('Erreur lors du chargement des articles conventionnels');
-            
-            const data = await response.json();
-            allItems = Array.isArray(data) ? data : data.items || [];
+            const page = await fetchItemsPage({ is_temporary: 'false' });
+            allItems = page.items;
             appLog.log('Articles disponibles:', allItems);
             
             return allItems;
@@ -45,14 +73,11 @@ document.addEventListener('DOMContentLoaded', async function() {
         }
     }
     
-    // Charger la liste des articles temporaires
+    // Charger la première page des articles temporaires
     async function loadTempItems() {
         try {
-            const response = await fetch('/api/items?is_temporary=true');
-            if (!response.ok) throw new Error('Erreur lors du chargement des articles temporaires');
-            
-            const data = await response.json();
-            tempItems = Array.isArray(data) ? data : data.items || [];
+            const page = await fetchItemsPage({ is_temporary: 'true' });
+            tempItems = page.items;
             appLog.log('Articles temporaires disponibles:', tempItems);
             
             return tempItems;
@@ -66,12 +91,18 @@ document.addEventListener('DOMContentLoaded', async function() {
     async function loadBorrows() {
         try {
             appLog.log('Chargement des emprunts...');
-            const response = await fetch('/api/loans?active_only=true');
-            if (!response.ok) {
-                throw new Error('Erreur lors du chargement des emprunts');
+            const loans = [];
+            for (let page = 1; ; page++) {
+                const response = await fetch(`/api/loans?active_only=true&sort=due_date&per_page=200&page=${page}`);
+                if (!response.ok) {
+                    throw new Error('Erreur lors du chargement des emprunts');
+                }
+                const data = await response.json();
+                loans.push(...data.loans);
+                if (!data.has_more) {
+                    break;
+                }
             }
-            
-            const loans = await response.json();
             appLog.log('Emprunts chargés:', loans);
             
             const borrowsList = document.getElementById('borrowsList');
@@ -246,16 +277,18 @@ document.addEventListener('DOMContentLoaded', async function() {
                 // Désactiver le bouton pendant le traitement
                 button.disabled = true;
                 
-                const response = await fetch(`/api/loans/${borrowId}/return`, {
+                const response = await fetch('/api/loans/return-batch', {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json'
-                    }
+                    },
+                    body: JSON.stringify({ loan_ids: [parseInt(borrowId, 10)] })
                 });
                 
-                if (!response.ok) {
-                    const error = await response.json();
-                    throw new Error(error.error || 'Erreur lors du retour de l\'article');
+                const result = await response.json();
+                if (!response.ok || !result.returned_count) {
+                    const message = result.error || (result.errors && result.errors.length ? result.errors[0].error : null);
+                    throw new Error(message || 'Erreur lors du retour de l\'article');
                 }
                 
                 // Recharger la liste des emprunts
@@ -317,94 +350,127 @@ document.addEventListener('DOMContentLoaded', async function() {
             }
         });
         
+        // Construire une suggestion cliquable pour un article
+        function renderSuggestion(item, inputValue, suggestionsContainer) {
+            const suggestionItem = $('<div class="suggestion-item"></div>');
+            
+            const regex = new RegExp(`(${inputValue.replace(/[-\/\\^$*+?.()|[\]{}]/g, '\\$&')})`, 'gi');
+            const highlightedName = item.name.replace(regex, '<strong>$1</strong>');
+            
+            let locationText = '';
+            if (item.is_temporary) {
+                locationText = '<small class="text-muted d-block">Article temporaire</small>';
+            } else if (item.location && (item.location.zone_name || item.location.furniture_name || item.location.drawer_name)) {
+                const parts = [];
+                if (item.location.zone_name) parts.push(`Zone: ${item.location.zone_name}`);
+                if (item.location.furniture_name) parts.push(`Meuble: ${item.location.furniture_name}`);
+                if (item.location.drawer_name) parts.push(`Tiroir: ${item.location.drawer_name}`);
+                locationText = `<small class="text-muted d-block">${parts.join(' | ')}</small>`;
+            } else if (item.zone_name || item.furniture_name || item.drawer_name) { // Fallback if not nested
+                const parts = [];
+                if (item.zone_name) parts.push(`Zone: ${item.zone_name}`);
+                if (item.furniture_name) parts.push(`Meuble: ${item.furniture_name}`);
+                if (item.drawer_name) parts.push(`Tiroir: ${item.drawer_name}`);
+                locationText = `<small class="text-muted d-block">${parts.join(' | ')}</small>`;
+            }
+
+            suggestionItem.html(`
+                <div class="suggestion-item-name">${highlightedName}</div>
+                ${locationText}
+            `);
+
+            suggestionItem.on('click', function() {
+                $('#itemName').val(item.name);
+                suggestionsContainer.addClass('d-none').empty();
+                
+                $('#isTemporary').prop('checked', item.is_temporary === true).trigger('change');
+
+                if (!item.is_temporary && item.zone_id) {
+                    $('#itemZone').val(item.zone_id);
+                    $('#itemZone').prop('disabled', true);
+                    $('#itemFurniture').prop('disabled', true);
+                    $('#itemDrawer').prop('disabled', true);
+                    
+                    $.ajax({
+                        url: `/api/location/furniture?zone_id=${item.zone_id}`,
+                        method: 'GET',
+                        success: function(furniture) {
+                            const furnitureSelect = $('#itemFurniture');
+                            furnitureSelect.empty().append('<option value="">Sélectionnez un meuble</option>');
+                            $.each(furniture, function(i, f) {
+                                furnitureSelect.append(`<option value="${f.id}" ${f.id == item.furniture_id ? 'selected' : ''}>${f.name}</option>`);
+                            });
+                            if (item.furniture_id) {
+                                $.ajax({
+                                    url: `/api/location/drawers?furniture_id=${item.furniture_id}`,
+                                    method: 'GET',
+                                    success: function(drawers) {
+                                        const drawerSelect = $('#itemDrawer');
+                                        drawerSelect.empty().append('<option value="">Sélectionnez un tiroir/niveau</option>');
+                                        $.each(drawers, function(i, d) {
+                                            drawerSelect.append(`<option value="${d.id}" ${d.id == item.drawer_id ? 'selected' : ''}>${d.name}</option>`);
+                                        });
+                                    },
+                                    error: function(error) { appLog.error('Erreur chargement tiroirs:', error); }
+                                });
+                            }
+                        },
+                        error: function(error) { appLog.error('Erreur chargement meubles:', error); }
+                    });
+                }
+            });
+            suggestionsContainer.append(suggestionItem);
+        }
+        
+        // Recherche côté serveur : première page à la saisie, pages suivantes
+        // au défilement de la liste de suggestions
+        const suggestionSearch = { term: '', nextCursor: null, loading: false, timer: null };
+        
+        async function loadSuggestions(suggestionsContainer, append) {
+            const term = suggestionSearch.term;
+            suggestionSearch.loading = true;
+            try {
+                const page = await fetchItemsPage(
+                    { is_temporary: 'false', search: term },
+                    append ? suggestionSearch.nextCursor : null
+                );
+                // Réponse obsolète : l'utilisateur a modifié sa saisie entre-temps
+                if (term !== suggestionSearch.term) return;
+                
+                suggestionSearch.nextCursor = page.nextCursor;
+                mergeItems(allItems, page.items);
+                
+                if (!append) suggestionsContainer.empty();
+                page.items.forEach(item => renderSuggestion(item, term, suggestionsContainer));
+                suggestionsContainer.toggleClass('d-none', suggestionsContainer.children().length === 0);
+            } catch (error) {
+                appLog.error('Erreur lors de la recherche d\'articles:', error);
+            } finally {
+                suggestionSearch.loading = false;
+            }
+        }
+        
         // Autocomplete pour le nom de l'article
         $('#itemName').on('input', function() {
             const inputValue = $(this).val().trim().toLowerCase();
             const suggestionsContainer = $(this).closest('.item-search-container').find('.suggestions-list');
             
+            clearTimeout(suggestionSearch.timer);
+            suggestionSearch.term = inputValue;
+            suggestionSearch.nextCursor = null;
+            
             if (inputValue.length < 2) {
                 suggestionsContainer.addClass('d-none').empty();
                 return;
             }
             
-            // Filtrer les articles correspondants
-            const filteredItems = allItems.filter(item => !item.is_temporary && item.name.toLowerCase().includes(inputValue));
-            
-            if (filteredItems.length > 0) {
-                suggestionsContainer.removeClass('d-none').empty();
-                
-                filteredItems.forEach(item => {
-                    const suggestionItem = $('<div class="suggestion-item"></div>');
-                    
-                    const regex = new RegExp(`(${inputValue.replace(/[-\/\\^$*+?.()|[\]{}]/g, '\\$&')})`, 'gi');
-                    const highlightedName = item.name.replace(regex, '<strong>$1</strong>');
-                    
-                    let locationText = '';
-                    if (item.is_temporary) {
-                        locationText = '<small class="text-muted d-block">Article temporaire</small>';
-                    } else if (item.location && (item.location.zone_name || item.location.furniture_name || item.location.drawer_name)) {
-                        const parts = [];
-                        if (item.location.zone_name) parts.push(`Zone: ${item.location.zone_name}`);
-                        if (item.location.furniture_name) parts.push(`Meuble: ${item.location.furniture_name}`);
-                        if (item.location.drawer_name) parts.push(`Tiroir: ${item.location.drawer_name}`);
-                        locationText = `<small class="text-muted d-block">${parts.join(' | ')}</small>`;
-                    } else if (item.zone_name || item.furniture_name || item.drawer_name) { // Fallback if not nested
-                        const parts = [];
-                        if (item.zone_name) parts.push(`Zone: ${item.zone_name}`);
-                        if (item.furniture_name) parts.push(`Meuble: ${item.furniture_name}`);
-                        if (item.drawer_name) parts.push(`Tiroir: ${item.drawer_name}`);
-                        locationText = `<small class="text-muted d-block">${parts.join(' | ')}</small>`;
-                    }
-
-                    suggestionItem.html(`
-                        <div class="suggestion-item-name">${highlightedName}</div>
-                        ${locationText}
-                    `);
-
-                    suggestionItem.on('click', function() {
-                        $('#itemName').val(item.name);
-                        suggestionsContainer.addClass('d-none').empty();
-                        
-                        $('#isTemporary').prop('checked', item.is_temporary === true).trigger('change');
-
-                        if (!item.is_temporary && item.zone_id) {
-                            $('#itemZone').val(item.zone_id);
-                            $('#itemZone').prop('disabled', true);
-                            $('#itemFurniture').prop('disabled', true);
-                            $('#itemDrawer').prop('disabled', true);
-                            
-                            $.ajax({
-                                url: `/api/location/furniture?zone_id=${item.zone_id}`,
-                                method: 'GET',
-                                success: function(furniture) {
-                                    const furnitureSelect = $('#itemFurniture');
-                                    furnitureSelect.empty().append('<option value="">Sélectionnez un meuble</option>');
-                                    $.each(furniture, function(i, f) {
-                                        furnitureSelect.append(`<option value="${f.id}" ${f.id == item.furniture_id ? 'selected' : ''}>${f.name}</option>`);
-                                    });
-                                    if (item.furniture_id) {
-                                        $.ajax({
-                                            url: `/api/location/drawers?furniture_id=${item.furniture_id}`,
-                                            method: 'GET',
-                                            success: function(drawers) {
-                                                const drawerSelect = $('#itemDrawer');
-                                                drawerSelect.empty().append('<option value="">Sélectionnez un tiroir/niveau</option>');
-                                                $.each(drawers, function(i, d) {
-                                                    drawerSelect.append(`<option value="${d.id}" ${d.id == item.drawer_id ? 'selected' : ''}>${d.name}</option>`);
-                                                });
-                                            },
-                                            error: function(error) { appLog.error('Erreur chargement tiroirs:', error); }
-                                        });
-                                    }
-                                },
-                                error: function(error) { appLog.error('Erreur chargement meubles:', error); }
-                            });
-                        }
-                    });
-                    suggestionsContainer.append(suggestionItem);
-                });
-            } else {
-                suggestionsContainer.addClass('d-none').empty();
+            suggestionSearch.timer = setTimeout(() => loadSuggestions(suggestionsContainer, false), 200);
+        });
+        
+        $('#itemName').closest('.item-search-container').find('.suggestions-list').on('scroll', function() {
+            if (!suggestionSearch.nextCursor || suggestionSearch.loading) return;
+            if (this.scrollTop + this.clientHeight >= this.scrollHeight - 20) {
+                loadSuggestions($(this), true);
             }
         });
         
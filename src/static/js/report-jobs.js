@@ -0,0 +1,96 @@
+/**
+ * Génération des rapports en arrière-plan (/reports/jobs)
+ *
+ * Un lien ou un formulaire portant data-report-job="<type>" lance une tâche au lieu de générer
+ * le rapport pendant la requête ; l'avancement est affiché dans le bouton, puis le fichier est
+ * téléchargé. Pour les emprunts d'un utilisateur, le formulaire contient le champ user_id.
+ * Sans JavaScript, le lien ou le formulaire d'origine génère le rapport directement.
+ *
+ *     <a href="/reports/all_items_pdf" data-report-job="all-items-pdf">...</a>
+ *     <form action="/reports/generate_pdf" method="post" data-report-job="user-loans-pdf">...</form>
+ */
+(function() {
+    const POLL_INTERVAL = 1000;
+
+    function setBusy(button, busy, label) {
+        if (!button) {
+            return;
+        }
+        if (busy) {
+            if (button.dataset.originalLabel === undefined) {
+                button.dataset.originalLabel = button.innerHTML;
+            }
+            button.classList.add('disabled');
+            button.setAttribute('aria-disabled', 'true');
+            button.innerHTML = '<span class="spinner-border spinner-border-sm me-1" role="status"></span> ' + label;
+        } else {
+            button.classList.remove('disabled');
+            button.removeAttribute('aria-disabled');
+            if (button.dataset.originalLabel !== undefined) {
+                button.innerHTML = button.dataset.originalLabel;
+                delete button.dataset.originalLabel;
+            }
+        }
+    }
+
+    function poll(job, button) {
+        return fetch(job.status_url, { credentials: 'same-origin' })
+            .then(response => response.json().then(data => ({ ok: response.ok, data })))
+            .then(({ ok, data }) => {
+                if (!ok) {
+                    throw new Error(data.error || 'Suivi du rapport impossible');
+                }
+                const current = data.job;
+                if (current.status === 'done') {
+                    setBusy(button, false);
+                    window.location.href = current.download_url;
+                } else if (current.status === 'failed') {
+                    throw new Error(current.error || 'La génération du rapport a échoué');
+                } else {
+                    setBusy(button, true, `Génération... ${current.progress} %`);
+                    setTimeout(() => poll(current, button).catch(error => fail(error, button)), POLL_INTERVAL);
+                }
+            });
+    }
+
+    function fail(error, button) {
+        appLog.error('Rapport en arrière-plan:', error);
+        setBusy(button, false);
+        alert('Erreur: ' + error.message);
+    }
+
+    function start(type, body, button) {
+        if (button && button.getAttribute('aria-disabled') === 'true') {
+            return;
+        }
+        setBusy(button, true, 'Génération...');
+        body.append('type', type);
+        fetch('/reports/jobs', { method: 'POST', body, credentials: 'same-origin' })
+            .then(response => response.json().then(data => ({ ok: response.ok, data })))
+            .then(({ ok, data }) => {
+                if (!ok) {
+                    throw new Error(data.error || 'Impossible de lancer la génération du rapport');
+                }
+                return poll(data.job, button);
+            })
+            .catch(error => fail(error, button));
+    }
+
+    document.addEventListener('click', function(event) {
+        const link = event.target.closest('a[data-report-job]');
+        if (!link) {
+            return;
+        }
+        event.preventDefault();
+        start(link.dataset.reportJob, new FormData(), link);
+    });
+
+    document.addEventListener('submit', function(event) {
+        const form = event.target.closest('form[data-report-job]');
+        if (!form) {
+            return;
+        }
+        event.preventDefault();
+        start(form.dataset.reportJob, new FormData(form), form.querySelector('[type="submit"]'));
+    });
+})();
@@ -842,6 +842,15 @@ class InventoryVoiceRecognition extends BaseVoiceRecognition {
             appLog.log('Données de localisation chargées lors de l\'initialisation');
         });
         
+        // Recharger l'arborescence quand un emplacement est créé, renommé ou supprimé
+        if (window.LiveEvents) {
+            let reloadTimer = null;
+            LiveEvents.on('location', () => {
+                clearTimeout(reloadTimer);
+                reloadTimer = setTimeout(() => this.loadLocationData(), 500);
+            });
+        }
+        
         // Propriétés spécifiques à l'inventaire
         this.locations = {
             zones: [],
@@ -866,31 +875,42 @@ class InventoryVoiceRecognition extends BaseVoiceRecognition {
         try {
             appLog.log('Début du chargement des données de localisation...');
             
-            // Récupérer les données de zone
-            const zonesResponse = await fetch('/api/location/zones');
-            if (zonesResponse.ok) {
-                this.locations.zones = await zonesResponse.json();
-                appLog.log(`${this.locations.zones.length} zones chargées`);
-            } else {
-                appLog.error('Erreur lors du chargement des zones:', zonesResponse.status);
-            }
-            
-            // Récupérer les données de meuble
-            const furnitureResponse = await fetch('/api/location/furniture?all=true');
-            if (furnitureResponse.ok) {
-                this.locations.furniture = await furnitureResponse.json();
-                appLog.log(`${this.locations.furniture.length} meubles chargés`);
-            } else {
-                appLog.error('Erreur lors du chargement des meubles:', furnitureResponse.status);
-            }
-            
-            // Récupérer les données de tiroir
-            const drawersResponse = await fetch('/api/location/drawers?all=true');
-            if (drawersResponse.ok) {
-                this.locations.drawers = await drawersResponse.json();
-                appLog.log(`${this.locations.drawers.length} tiroirs chargés`);
+            // Récupérer toute l'arborescence en une requête (revalidée par ETag, 304 si inchangée)
+            const treeResponse = await fetch('/api/location/tree');
+            if (treeResponse.ok) {
+                const tree = await treeResponse.json();
+                const zones = [];
+                const furniture = [];
+                const drawers = [];
+                tree.zones.forEach(zone => {
+                    zones.push({ id: zone.id, name: zone.name, description: zone.description });
+                    zone.furniture.forEach(f => {
+                        furniture.push({
+                            id: f.id,
+                            name: f.name,
+                            description: f.description,
+                            zone_id: zone.id,
+                            zone_name: zone.name
+                        });
+                        f.drawers.forEach(drawer => {
+                            drawers.push({
+                                id: drawer.id,
+                                name: drawer.name,
+                                description: drawer.description,
+                                furniture_id: f.id,
+                                furniture_name: f.name,
+                                zone_id: zone.id,
+                                zone_name: zone.name
+                            });
+                        });
+                    });
+                });
+                this.locations.zones = zones;
+                this.locations.furniture = furniture;
+                this.locations.drawers = drawers;
+                appLog.log(`${zones.length} zones, ${furniture.length} meubles et ${drawers.length} tiroirs chargés`);
             } else {
-                appLog.error('Erreur lors du chargement des tiroirs:', drawersResponse.status);
+                appLog.error('Erreur lors du chargement des emplacements:', treeResponse.status);
             }
             
             appLog.log('Données de localisation chargées avec succès:', this.locations);
@@ -1219,6 +1239,14 @@ class InventoryVoiceRecognition extends BaseVoiceRecognition {
         })
         .then(data => {
             notificationManager.success(`${data.added_count} article(s) ajouté(s) avec succès.`);
+            // Articles non ajoutés (statut par article dans data.items)
+            if (data.duplicate_count) {
+                notificationManager.warning(`${data.duplicate_count} article(s) déjà présent(s) à cet emplacement, non ajouté(s).`);
+            }
+            if (data.invalid_count) {
+                const invalid = (data.items || []).filter(item => item.status === 'invalid');
+                notificationManager.warning(`${data.invalid_count} article(s) non ajouté(s) : ${invalid.map(item => `${item.name || 'Sans nom'} (${item.error})`).join(', ')}`);
+            }
             // Appeler le callback onSuccess si défini
             if (this.onSuccessCallback) {
                 this.onSuccessCallback(data);
@@ -0,0 +1,54 @@
+"""
+Configuration commune des tests : base SQLite temporaire (fichier) et jeu de données minimal.
+
+DATABASE_URL doit être défini avant l'import de src.app, qui crée le moteur à l'import.
+"""
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+_DB_DIR = tempfile.mkdtemp(prefix='jpjr-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.app import app as flask_app  # noqa: E402
+from src import migrations  # noqa: E402
+from src.models import db, Zone, Furniture, Drawer  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        migrations.upgrade(db.engine)
+    return flask_app
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
+        db.session.remove()
+
+
+def unique_name(prefix):
+    """Nom unique d'une exécution à l'autre (la base est partagée entre les tests)"""
+    return f"{prefix} {uuid.uuid4().hex[:8]}"
+
+
+@pytest.fixture
+def location(app_context):
+    """Crée une zone, un meuble et un tiroir ; retourne (zone_id, furniture_id, drawer_id)"""
+    zone = Zone(name=unique_name('Zone'))
+    db.session.add(zone)
+    db.session.flush()
+    furniture = Furniture(name=unique_name('Meuble'), zone_id=zone.id)
+    db.session.add(furniture)
+    db.session.flush()
+    drawer = Drawer(name=unique_name('Tiroir'), furniture_id=furniture.id)
+    db.session.add(drawer)
+    db.session.commit()
+    return zone.id, furniture.id, drawer.id
@@ -0,0 +1,49 @@
+"""
+Index d'autocomplétion : reconstruit sur le compteur `item_names` (noms et emplacements des articles),
+pas sur `inventory` qui progresse à chaque emprunt, retour ou mouvement de stock.
+"""
+from sqlalchemy import update
+
+from conftest import unique_name
+from src.models import db, Item
+from src.models.data_version import DataVersion
+from src.services.autocomplete_index import AutocompleteIndex
+
+
+def _versions():
+    return DataVersion.get(DataVersion.INVENTORY), DataVersion.get(DataVersion.ITEM_NAMES)
+
+
+def _bump_from_other_worker(name):
+    # Commit d'un autre worker : absent des écritures locales de ce processus
+    db.session.execute(update(DataVersion).where(DataVersion.name == name)
+                       .values(version=DataVersion.version + 1))
+    db.session.commit()
+
+
+def test_item_names_counter_ignores_stock_changes(location):
+    zone_id, furniture_id, drawer_id = location
+    item = Item(name=unique_name('Compteur'), zone_id=zone_id, furniture_id=furniture_id,
+                drawer_id=drawer_id, stock=5)
+    db.session.add(item)
+    db.session.commit()
+
+    inventory, item_names = _versions()
+    item.stock = 2
+    db.session.commit()
+    assert _versions() == (inventory + 1, item_names)
+
+    item.name = unique_name('Renommé')
+    db.session.commit()
+    assert _versions() == (inventory + 2, item_names + 1)
+
+
+def test_rebuild_only_when_item_names_change(app_context):
+    index = AutocompleteIndex(check_interval=0)
+    index.rebuild()
+
+    _bump_from_other_worker(DataVersion.INVENTORY)
+    assert not index._is_stale()
+
+    _bump_from_other_worker(DataVersion.ITEM_NAMES)
+    assert index._is_stale()
@@ -0,0 +1,60 @@
+"""
+Curseur du hub d'événements : les identifiants visibles hors d'ordre ne sont pas sautés.
+"""
+from src.services import event_hub as event_hub_module
+from src.services.event_hub import Event, EventHub
+
+
+def _events(*ids):
+    return [Event(event_id, 'stock', '{}') for event_id in ids]
+
+
+def _dispatch_ready(hub, events):
+    ready = hub._contiguous(events)
+    if ready:
+        hub._cursor = ready[-1].id
+    return [event.id for event in ready]
+
+
+def test_gap_holds_back_later_events_until_filled():
+    hub = EventHub(gap_timeout=60)
+    hub._cursor = 10
+
+    # 12 est validé avant 11 : 12 est retenu
+    assert _dispatch_ready(hub, _events(12)) == []
+    # 11 devient visible : les deux partent, dans l'ordre
+    assert _dispatch_ready(hub, _events(11, 12, 13)) == [11, 12, 13]
+    assert hub._held == {}
+
+
+def test_gap_is_abandoned_after_timeout(monkeypatch):
+    hub = EventHub(gap_timeout=5)
+    hub._cursor = 10
+    now = [1000.0]
+    monkeypatch.setattr(event_hub_module.time, 'monotonic', lambda: now[0])
+
+    assert _dispatch_ready(hub, _events(12, 13)) == []
+    now[0] += 4
+    assert _dispatch_ready(hub, _events(12, 13)) == []
+    # 11 appartenait à une transaction annulée : abandon après le délai
+    now[0] += 2
+    assert _dispatch_ready(hub, _events(12, 13, 15)) == [12, 13]
+    assert hub._cursor == 13
+    # Nouveau trou (14) : délai compté depuis la première lecture de 15
+    assert _dispatch_ready(hub, _events(15)) == []
+    now[0] += 5
+    assert _dispatch_ready(hub, _events(15)) == [15]
+
+
+def test_replay_stops_at_cursor(app_context):
+    from src.models import db
+    from src.services.event_hub import publish, STOCK
+
+    hub = EventHub()
+    start = hub.latest_id()
+    for stock in range(3):
+        publish(STOCK, item_id=1, stock=stock)
+    db.session.commit()
+
+    replay = hub.events_since(start, until=start + 2)
+    assert [event.id for event in replay] == [start + 1, start + 2]
@@ -0,0 +1,63 @@
+"""
+Import en masse : doublons (même nom au même emplacement) écartés et signalés ; les articles
+importés sont relus par identifiants (GET /api/items?ids=), comme le fait le tableau de bord.
+"""
+import io
+
+import pytest
+
+from conftest import unique_name
+from src.models import db, Item, User
+from src.services.item_import import import_items
+
+
+@pytest.mark.parametrize('dry_run', [False, True])
+def test_import_reports_duplicates(location, dry_run):
+    zone_id, furniture_id, drawer_id = location
+    existing = unique_name('Existant')
+    db.session.add(Item(name=existing, zone_id=zone_id, furniture_id=furniture_id, drawer_id=drawer_id))
+    db.session.commit()
+    new_name = unique_name('Importé')
+    temporary_name = unique_name('Temporaire')
+    ids = f'{zone_id},{furniture_id},{drawer_id}'
+    body = '\n'.join([
+        'name,zone_id,furniture_id,drawer_id,is_temporary',
+        f'{new_name},{ids},',
+        f'{existing},{ids},',
+        f'{temporary_name},,,,oui',
+        f'{temporary_name},,,,oui',
+        # Répétition dans un autre bloc (blocs de 2 lignes)
+        f'{new_name},{ids},',
+    ]).encode()
+
+    report = import_items(io.BytesIO(body), 'csv', dry_run=dry_run, chunk_size=2)
+
+    assert report.total == 5
+    assert report.imported == 3
+    assert [(error.line, error.error) for error in report.errors] == [
+        (3, f"Un article nommé '{existing}' existe déjà à cet emplacement."),
+        (6, 'Article présent plusieurs fois dans le fichier (ligne 2)'),
+    ]
+    expected = 0 if dry_run else 1
+    assert Item.query.filter_by(name=new_name).count() == expected
+    assert Item.query.filter_by(name=temporary_name).count() == 2 * expected
+
+
+def test_imported_items_listed_by_ids(app, location):
+    zone_id, furniture_id, drawer_id = location
+    names = [unique_name('Lot') for _ in range(3)]
+    items = [Item(name=name, zone_id=zone_id, furniture_id=furniture_id, drawer_id=drawer_id, stock=2)
+             for name in names]
+    user = User(name=unique_name('Utilisateur'))
+    db.session.add_all(items + [user])
+    db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['user_id'] = user.id
+
+    ids = ','.join(str(item.id) for item in items[:2])
+    response = client.get(f'/api/items?ids={ids}&fields=id,name,stock,location_info')
+
+    assert response.status_code == 200
+    assert sorted(item['name'] for item in response.get_json()['items']) == sorted(names[:2])
+    assert client.get('/api/items?ids=1,x').status_code == 400
@@ -0,0 +1,156 @@
+"""
+Le chargement des vues article doit émettre un nombre de requêtes indépendant du nombre d'articles,
+dans load_item_views() / get_item_view() comme dans les routes qui les utilisent.
+"""
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from conftest import unique_name
+from src.models import db, Borrow, Drawer, Furniture, Item, User, Zone
+from src.services.item_views import get_item_view, load_item_views
+
+# Requêtes d'une recherche : les articles et leurs vues (emplacements et emprunts) en une requête
+SEARCH_STATEMENTS = 1
+# Requêtes du détail d'un article : sa vue en une requête
+ITEM_STATEMENTS = 1
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def _create_items(count, word):
+    """
+    Articles dont le nom contient `word`, répartis sur deux zones et quatre tiroirs, un sur trois
+    emprunté (emprunt en cours) et un article temporaire ; retourne leurs ids
+    """
+    user = User(name=unique_name('Emprunteur'))
+    db.session.add(user)
+    drawers = []
+    for _ in range(2):
+        zone = Zone(name=unique_name('Zone'))
+        db.session.add(zone)
+        db.session.flush()
+        for _ in range(2):
+            furniture = Furniture(name=unique_name('Meuble'), zone_id=zone.id)
+            db.session.add(furniture)
+            db.session.flush()
+            drawer = Drawer(name=unique_name('Tiroir'), furniture_id=furniture.id)
+            db.session.add(drawer)
+            db.session.flush()
+            drawers.append((zone.id, furniture.id, drawer.id))
+
+    items = [Item(name=f'{word} temporaire', is_temporary=True, stock=1)]
+    for index in range(count - 1):
+        zone_id, furniture_id, drawer_id = drawers[index % len(drawers)]
+        items.append(Item(name=f'{word} {index}', zone_id=zone_id, furniture_id=furniture_id,
+                          drawer_id=drawer_id, stock=3))
+    db.session.add_all(items)
+    db.session.flush()
+    for item in items[1::3]:
+        db.session.add(Borrow(user_id=user.id, item_id=item.id, quantity=1,
+                              expected_return_date=datetime.utcnow() + timedelta(days=7)))
+        # Compteurs dénormalisés tenus à jour par les routes d'emprunt
+        item.active_loan_count = 1
+        item.borrowed_quantity = 1
+    db.session.commit()
+    return [item.id for item in items]
+
+
+def _client(app):
+    user = User(name=unique_name('Utilisateur'))
+    db.session.add(user)
+    db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['user_id'] = user.id
+    return client
+
+
+def _request_statements(client, url):
+    db.session.remove()
+    with count_statements() as statements:
+        response = client.get(url)
+    assert response.status_code == 200
+    return response.get_json(), len(statements)
+
+
+def _read_views(views):
+    # Toutes les propriétés utilisées par les templates et l'API
+    return [(view.zone_name, view.furniture_name, view.drawer_name, view.is_borrowed,
+             view.active_loan_count, view.borrowed_quantity, view.location_info) for view in views]
+
+
+def _count_for(item_ids):
+    db.session.expire_all()
+    with count_statements() as statements:
+        views = load_item_views(db.session.query(Item).filter(Item.id.in_(item_ids)).order_by(Item.id))
+        values = _read_views(views)
+    assert len(values) == len(item_ids)
+    return len(statements)
+
+
+def test_load_item_views_statement_count_is_constant(app_context):
+    small = _create_items(3, unique_name('Petit'))
+    large = _create_items(40, unique_name('Grand'))
+
+    assert _count_for(small) == _count_for(large)
+    assert _count_for(large) == 1
+
+
+@pytest.mark.parametrize('count', [1, 25])
+def test_get_item_view_statement_count_is_constant(app_context, count):
+    item_ids = _create_items(count, unique_name('Article'))
+
+    db.session.expire_all()
+    with count_statements() as statements:
+        for item_id in item_ids:
+            _read_views([get_item_view(item_id)])
+
+    assert len(statements) == count
+
+
+def test_get_item_view_missing_item(app_context):
+    assert get_item_view(-1) is None
+
+
+def test_search_items_route_statement_count(app, app_context):
+    word = f'recherche{uuid.uuid4().hex[:8]}'
+    item_ids = _create_items(20, word)
+    client = _client(app)
+    # Première requête : détection du moteur de recherche, mise en cache ensuite
+    client.get(f'/api/search-items?q={word}')
+
+    body, statements = _request_statements(client, f'/api/search-items?q={word}')
+
+    assert sorted(item['id'] for item in body['items']) == sorted(item_ids)
+    assert sum(item['is_borrowed'] for item in body['items']) == len(item_ids[1::3])
+    assert all(item['zone_name'] for item in body['items'] if not item['is_temporary'])
+    assert statements == SEARCH_STATEMENTS
+
+
+def test_get_item_route_statement_count(app, app_context):
+    item_ids = _create_items(20, unique_name('Détail'))
+    client = _client(app)
+
+    counts = set()
+    for item_id in item_ids:
+        body, statements = _request_statements(client, f'/api/items/{item_id}')
+        assert body['item']['id'] == item_id
+        counts.add(statements)
+
+    assert counts == {ITEM_STATEMENTS}
@@ -0,0 +1,64 @@
+"""
+Emprunts simultanés sur un même article (base SQLite fichier partagée par plusieurs threads).
+"""
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from conftest import unique_name
+from src.models import db, Borrow, Item, User
+
+STARTING_STOCK = 7
+THREADS = 6
+REQUESTS_PER_THREAD = 3
+
+
+def test_concurrent_loans_never_oversell(app, location):
+    zone_id, furniture_id, drawer_id = location
+    item = Item(name=unique_name('Article'), zone_id=zone_id, furniture_id=furniture_id, drawer_id=drawer_id,
+                stock=STARTING_STOCK)
+    user = User(name=unique_name('Utilisateur'))
+    db.session.add_all([item, user])
+    db.session.commit()
+    item_id, user_id = item.id, user.id
+    return_date = (datetime.utcnow() + timedelta(days=2)).isoformat()
+    statuses = []
+    failures = []
+    start = threading.Barrier(THREADS)
+
+    def borrow():
+        client = app.test_client()
+        with client.session_transaction() as flask_session:
+            flask_session['user_id'] = user_id
+        start.wait()
+        for _ in range(REQUESTS_PER_THREAD):
+            response = client.post('/api/loans/create-with-quantities', json={
+                'items': [{'id': item_id, 'quantity': 1}],
+                'return_date': return_date
+            })
+            if response.status_code != 200:
+                failures.append(response.status_code)
+                continue
+            statuses.extend(loan for loan in response.get_json()['loans'])
+
+    threads = [threading.Thread(target=borrow) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert failures == []
+    successes = [loan for loan in statuses if loan['status'] == 'success']
+    errors = [loan for loan in statuses if loan['status'] == 'error']
+    assert len(successes) == STARTING_STOCK
+    assert len(errors) == THREADS * REQUESTS_PER_THREAD - STARTING_STOCK
+    assert all(loan['error'].startswith('Stock insuffisant') for loan in errors)
+
+    db.session.expire_all()
+    item = db.session.get(Item, item_id)
+    reserved = db.session.query(func.sum(Borrow.quantity)) \
+        .filter(Borrow.item_id == item_id, Borrow.return_date.is_(None)).scalar()
+    assert item.stock == 0
+    assert item.stock + reserved == STARTING_STOCK
+    assert item.borrowed_quantity == reserved
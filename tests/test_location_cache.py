@@ -0,0 +1,36 @@
+"""
+Validation des emplacements par le cache en mémoire.
+"""
+from conftest import unique_name
+from src.models import db, Zone, Furniture, Drawer
+from src.services.location_cache import location_cache
+
+
+def test_validate_accepts_consistent_location(location):
+    assert location_cache.validate(*location) is None
+
+
+def test_validate_rejects_unknown_ids(location):
+    zone_id, furniture_id, drawer_id = location
+    assert 'zone' in location_cache.validate(-1, furniture_id, drawer_id)
+    assert 'meuble' in location_cache.validate(zone_id, -1, drawer_id)
+    assert 'tiroir' in location_cache.validate(zone_id, furniture_id, -1)
+
+
+def test_validate_rejects_mismatched_hierarchy(location):
+    zone_id, furniture_id, drawer_id = location
+    other_zone = Zone(name=unique_name('Autre zone'))
+    db.session.add(other_zone)
+    db.session.flush()
+    other_furniture = Furniture(name=unique_name('Autre meuble'), zone_id=other_zone.id)
+    db.session.add(other_furniture)
+    db.session.flush()
+    other_drawer = Drawer(name=unique_name('Autre tiroir'), furniture_id=other_furniture.id)
+    db.session.add(other_drawer)
+    db.session.commit()
+
+    # Tiroir d'un autre meuble
+    assert location_cache.validate(zone_id, furniture_id, other_drawer.id) is not None
+    # Meuble d'une autre zone
+    assert location_cache.validate(other_zone.id, furniture_id, drawer_id) is not None
+    assert location_cache.validate(other_zone.id, other_furniture.id, other_drawer.id) is None
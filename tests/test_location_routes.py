@@ -0,0 +1,47 @@
+"""
+Modification des emplacements : droits administrateur et propagation aux articles.
+"""
+import pytest
+
+from conftest import unique_name
+from src.models import db, Item, User
+
+
+def _user(is_admin):
+    user = User(name=unique_name('Utilisateur'), is_admin=is_admin)
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def _client(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['user_id'] = user_id
+    return client
+
+
+@pytest.mark.parametrize('path', ['/api/location/zones/{zone}', '/api/location/furniture/{furniture}',
+                                  '/api/location/drawers/{drawer}'])
+def test_update_requires_admin(app, location, path):
+    zone_id, furniture_id, drawer_id = location
+    url = path.format(zone=zone_id, furniture=furniture_id, drawer=drawer_id)
+
+    assert app.test_client().put(url, json={'name': 'X'}).status_code == 401
+    assert _client(app, _user(is_admin=False)).put(url, json={'name': 'X'}).status_code == 403
+
+
+def test_rename_zone_bumps_item_versions(app, location):
+    zone_id, furniture_id, drawer_id = location
+    item = Item(name=unique_name('Article'), zone_id=zone_id, furniture_id=furniture_id, drawer_id=drawer_id)
+    db.session.add(item)
+    db.session.commit()
+    item_id, version = item.id, item.version_id
+
+    response = _client(app, _user(is_admin=True)).put(f'/api/location/zones/{zone_id}', json={'name': 'Renommée'})
+    assert response.status_code == 200
+
+    db.session.expire_all()
+    item = db.session.get(Item, item_id)
+    assert item.version_id > version
+    assert item.location_path.startswith('Renommée')
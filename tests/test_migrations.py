@@ -0,0 +1,92 @@
+"""
+Migrations figées : rejouées sur une base vide, elles produisent le schéma des modèles courants ;
+une version intermédiaire produit toujours le même schéma, quels que soient les modèles, et les
+migrations suivantes remplissent les colonnes ajoutées à partir des données existantes.
+"""
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from src import migrations
+from src.models import db
+
+
+def _columns(inspector, table_name):
+    return {column['name']: column['nullable'] for column in inspector.get_columns(table_name)}
+
+
+def _indexes(inspector, table_name):
+    return {(index['name'], tuple(index['column_names']), bool(index['unique']))
+            for index in inspector.get_indexes(table_name)}
+
+
+def _unique_constraints(inspector, table_name):
+    return {tuple(constraint['column_names']) for constraint in inspector.get_unique_constraints(table_name)}
+
+
+@pytest.fixture
+def engines(tmp_path):
+    migrated = create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    models = create_engine(f"sqlite:///{tmp_path / 'models.db'}")
+    yield migrated, models
+    migrated.dispose()
+    models.dispose()
+
+
+def test_migrations_produce_model_schema(engines):
+    migrated, models = engines
+    migrations.upgrade(migrated)
+    db.metadata.create_all(bind=models)
+
+    migrated_schema, model_schema = inspect(migrated), inspect(models)
+    for table_name in db.metadata.tables:
+        assert _columns(migrated_schema, table_name) == _columns(model_schema, table_name), table_name
+        # Les migrations ajoutent des index absents des modèles (migrations 3, 4, 7)
+        assert _indexes(model_schema, table_name) <= _indexes(migrated_schema, table_name), table_name
+        assert _unique_constraints(migrated_schema, table_name) == _unique_constraints(model_schema, table_name)
+
+
+def test_upgrade_from_initial_schema(engines):
+    migrated, _ = engines
+    migrations.upgrade(migrated, target=1)
+
+    schema = inspect(migrated)
+    # Schéma initial : ni les colonnes ni les tables ajoutées par les migrations suivantes
+    assert 'search_name' not in _columns(schema, 'item')
+    assert 'version_id' not in _columns(schema, 'item')
+    assert not schema.has_table('data_version')
+    assert not _indexes(schema, 'notification')
+
+    with migrated.begin() as conn:
+        conn.execute(text("INSERT INTO zone (id, name) VALUES (1, 'Atelier')"))
+        conn.execute(text("INSERT INTO furniture (id, name, zone_id) VALUES (1, 'Armoire', 1)"))
+        conn.execute(text(
+            "INSERT INTO item (id, name, stock, is_temporary, zone_id, furniture_id) VALUES "
+            "(1, 'Clé  Plate', 3, 0, 1, 1), (2, 'Câble', 1, 1, NULL, NULL)"
+        ))
+        conn.execute(text(
+            "INSERT INTO borrow (user_id, item_id, quantity, borrow_date, expected_return_date) "
+            "VALUES (1, 1, 2, '2026-10-01', '2026-10-30')"
+        ))
+        conn.execute(text(
+            "INSERT INTO notification (message, type, item_id, is_active) VALUES "
+            "('Stock bas', 'warning', 1, 1), ('Stock bas', 'warning', 1, 1)"
+        ))
+
+    migrations.upgrade(migrated)
+    with migrated.connect() as conn:
+        items = conn.execute(text(
+            "SELECT search_name, active_loan_count, borrowed_quantity, location_path, zone FROM item ORDER BY id"
+        )).fetchall()
+        movements = conn.execute(text("SELECT item_id, delta, reason FROM stock_movement ORDER BY item_id")).fetchall()
+        active_alerts = conn.execute(text("SELECT count(*) FROM notification WHERE is_active = 1")).scalar()
+        found = conn.execute(text("SELECT rowid FROM item_search WHERE item_search MATCH 'cle'")).fetchall()
+        names = {row[0] for row in conn.execute(text("SELECT name FROM data_version"))}
+
+    assert [tuple(item) for item in items] == [
+        ('cle plate', 1, 2, 'Atelier > Armoire > Non spécifié', 'Atelier'),
+        ('cable', 0, 0, 'Article temporaire (sans emplacement)', None),
+    ]
+    assert [tuple(movement) for movement in movements] == [(1, 3, 'initial'), (2, 1, 'initial')]
+    assert active_alerts == 1
+    assert [row[0] for row in found] == [1]
+    assert names == {'locations', 'inventory', 'item_names'}
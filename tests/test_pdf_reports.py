@@ -0,0 +1,44 @@
+"""
+Rendu des PDF : le pool de processus produit le même document que le rendu dans le processus courant,
+et les fragments n'utilisent que des polices déclarées dans le document.
+"""
+import re
+import zlib
+
+from reportlab import rl_config
+
+from src.services import pdf_reports
+
+ROWS = [(str(index), f'Vis ąę 中文 {index}', 'Atelier > Armoire > T1', 'Permanent', '18/10/26')
+        for index in range(300)]
+SECTIONS = [f'Zone {index // 100}' for index in range(300)]
+
+
+def _render():
+    return pdf_reports.render_table('Liste', 'Test', pdf_reports.ITEM_COLUMNS, ROWS, sections=SECTIONS)
+
+
+def test_parallel_rendering_matches_serial(monkeypatch):
+    # Document reproductible (pas de date de création ni d'identifiant aléatoire)
+    monkeypatch.setattr(rl_config, 'invariant', 1)
+    monkeypatch.setattr(pdf_reports, 'PROCESSES', 1)
+    serial = _render()
+
+    monkeypatch.setattr(pdf_reports, 'PROCESSES', 2)
+    monkeypatch.setattr(pdf_reports, 'PARALLEL_MIN_ROWS', 1)
+    monkeypatch.setattr(pdf_reports, 'CHUNK_ROWS', 50)
+    try:
+        parallel = _render()
+    finally:
+        pdf_reports.shutdown_render_pool()
+
+    assert parallel == serial
+
+
+def test_fragments_only_use_declared_fonts():
+    data = _render()
+    used = set()
+    for stream in re.findall(rb'stream\r?\n(.*?)endstream', data, re.S):
+        used |= set(re.findall(rb'/(F\d+) [\d.]+ Tf', zlib.decompress(stream.strip())))
+    declared = set(re.findall(rb'/(F\d+) \d+ 0 R', data))
+    assert used and used <= declared
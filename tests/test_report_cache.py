@@ -0,0 +1,24 @@
+"""
+Cache disque des rapports : lecture d'une entrée évincée entre sa recherche et son envoi.
+"""
+import os
+
+from src.services.report_cache import ReportCache
+
+
+def test_get_returns_open_file_that_survives_eviction(tmp_path):
+    cache = ReportCache(directory=str(tmp_path), max_bytes=10)
+    cache.put('a', b'123456')
+
+    cached = cache.get('a')
+    assert cached is not None
+    with cached:
+        # Une autre entrée fait dépasser la taille maximale : 'a', la plus ancienne, est évincée
+        os.utime(cached.name, (0, 0))
+        cache.put('b', b'789012')
+        assert cache.get('a') is None
+        assert cached.read() == b'123456'
+
+
+def test_get_missing_key(tmp_path):
+    assert ReportCache(directory=str(tmp_path)).get('absent') is None
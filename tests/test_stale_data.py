@@ -0,0 +1,113 @@
+"""
+Conflits de version d'un article (StaleDataError) traduits en 409 par l'application.
+"""
+import pytest
+from sqlalchemy import update
+
+from conftest import unique_name
+from src.models import db, Item, User
+
+
+def _admin_client(app):
+    admin = User(name=unique_name('Administrateur'), is_admin=True)
+    db.session.add(admin)
+    db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['user_id'] = admin.id
+    return client
+
+
+def test_stale_stock_update_returns_conflict(app, location, monkeypatch):
+    zone_id, furniture_id, drawer_id = location
+    item = Item(name=unique_name('Article'), zone_id=zone_id, furniture_id=furniture_id, drawer_id=drawer_id, stock=4)
+    db.session.add(item)
+    db.session.commit()
+    item_id = item.id
+    client = _admin_client(app)
+
+    # Écriture concurrente entre la lecture de l'article par la route et son UPDATE
+    original_get = db.session.get
+
+    def get_then_concurrent_write(model, ident, *args, **kwargs):
+        obj = original_get(model, ident, *args, **kwargs)
+        if model is Item and ident == item_id:
+            with db.engine.begin() as connection:
+                connection.execute(update(Item).where(Item.id == item_id)
+                                   .values(stock=9, version_id=Item.version_id + 1))
+        return obj
+
+    monkeypatch.setattr(db.session, 'get', get_then_concurrent_write)
+    response = client.post(f'/admin/items/{item_id}/update-stock', json={'stock': 2})
+    monkeypatch.undo()
+
+    assert response.status_code == 409
+    body = response.get_json()
+    assert body['success'] is False
+    assert body['current']['stock'] == 9
+
+    db.session.expire_all()
+    assert db.session.get(Item, item_id).stock == 9
+
+
+def _item(location, stock=4):
+    zone_id, furniture_id, drawer_id = location
+    item = Item(name=unique_name('Article'), zone_id=zone_id, furniture_id=furniture_id, drawer_id=drawer_id,
+                stock=stock)
+    db.session.add(item)
+    db.session.commit()
+    return item
+
+
+@pytest.mark.parametrize('body', [{'stock': 'beaucoup'}, {'stock': '3', 'version': 'v2'}, {'stock': None},
+                                  {'stock': True}, {'stock': -1}])
+def test_invalid_stock_update_returns_bad_request(app, location, body):
+    item = _item(location)
+
+    response = _admin_client(app).post(f'/admin/items/{item.id}/update-stock', json=body)
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_stale_delete_from_fetch_returns_json(app, location, monkeypatch):
+    item = _item(location)
+    item_id = item.id
+    client = _admin_client(app)
+
+    def concurrent_write(*args, **kwargs):
+        with db.engine.begin() as connection:
+            connection.execute(update(Item).where(Item.id == item_id).values(version_id=Item.version_id + 1))
+        return original_commit(*args, **kwargs)
+
+    original_commit = db.session.commit
+    monkeypatch.setattr(db.session, 'commit', concurrent_write)
+    # Appel fetch() sans corps JSON ni en-tête particulier
+    response = client.post(f'/admin/items/delete/{item_id}')
+    monkeypatch.undo()
+
+    assert response.status_code == 409
+    assert response.get_json()['success'] is False
+
+
+def test_edit_form_with_stale_version_is_refused(app, location):
+    item = _item(location)
+    zone_id, furniture_id, drawer_id = location
+    form = {'name': 'Nouveau nom', 'zone_id': zone_id, 'furniture_id': furniture_id, 'drawer_id': drawer_id,
+            'version': item.version_id}
+    # Modification par un autre administrateur après l'affichage du formulaire
+    item.stock = 5
+    db.session.commit()
+
+    client = _admin_client(app)
+
+    response = client.post(f'/admin/edit-item/{item.id}', data=form)
+    assert response.status_code == 302
+    db.session.expire_all()
+    assert db.session.get(Item, item.id).name != 'Nouveau nom'
+
+    # Formulaire rechargé : version courante
+    response = client.post(f'/admin/edit-item/{item.id}', data=dict(form, version=item.version_id))
+    assert response.status_code == 302
+    db.session.expire_all()
+    assert db.session.get(Item, item.id).name == 'Nouveau nom'